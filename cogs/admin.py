@@ -6,10 +6,10 @@ import psutil
 import os
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
-from config import COLORS, EMOJIS, user_has_permission, is_module_enabled, get_server_config, update_server_config, DEFAULT_SERVER_CONFIG
+from config import COLORS, EMOJIS, user_has_permission, DEFAULT_SERVER_CONFIG
 from utils.helpers import create_embed, format_number, format_duration
-from utils.database import get_global_stats, backup_database, cleanup_old_data, get_leaderboard
-from replit import db
+from utils.storage import db
+from utils.async_db import get_global_stats, update_global_stats, backup_database, cleanup_old_data, get_user_count, is_module_enabled, get_server_config, update_server_config, db_get, db_set
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +42,7 @@ class ConfigView(discord.ui.View):
         self.config['enabled_modules'][module] = not current_status
         
         # Update database
-        update_server_config(self.guild_id, self.config)
+        await update_server_config(self.guild_id, self.config)
         
         status = "enabled" if not current_status else "disabled"
         await interaction.response.send_message(f"✅ {module.replace('_', ' ').title()} module {status}!", ephemeral=True)
@@ -98,10 +98,10 @@ class AdminCog(commands.Cog):
     @commands.has_permissions(manage_guild=True)
     async def server_config(self, ctx, setting: str = None, *, value: str = None):
         """Configure server settings."""
-        if not is_module_enabled("admin", ctx.guild.id):
+        if not await is_module_enabled("admin", ctx.guild.id):
             return
             
-        config = get_server_config(ctx.guild.id)
+        config = await get_server_config(ctx.guild.id)
         
         if setting is None:
             # Show current configuration with interactive view
@@ -159,7 +159,7 @@ class AdminCog(commands.Cog):
                 return
                 
             config['prefix'] = value
-            update_server_config(ctx.guild.id, config)
+            await update_server_config(ctx.guild.id, config)
             
             embed = create_embed(
                 "✅ Prefix Updated",
@@ -174,7 +174,7 @@ class AdminCog(commands.Cog):
                 return
                 
             config['currency_name'] = value
-            update_server_config(ctx.guild.id, config)
+            await update_server_config(ctx.guild.id, config)
             
             embed = create_embed(
                 "✅ Currency Updated",
@@ -186,7 +186,7 @@ class AdminCog(commands.Cog):
         elif setting == "ai_channels":
             if value == "reset":
                 config['ai_enabled_channels'] = []
-                update_server_config(ctx.guild.id, config)
+                await update_server_config(ctx.guild.id, config)
                 await ctx.send("✅ AI enabled in all channels.")
                 return
                 
@@ -200,7 +200,7 @@ class AdminCog(commands.Cog):
                     action = "added to"
                     
                 config['ai_enabled_channels'] = current_channels
-                update_server_config(ctx.guild.id, config)
+                await update_server_config(ctx.guild.id, config)
                 
                 await ctx.send(f"✅ {ctx.channel.mention} {action} AI-enabled channels.")
                 return
@@ -211,7 +211,7 @@ class AdminCog(commands.Cog):
             automod = config.get('auto_moderation', {})
             automod['enabled'] = not automod.get('enabled', False)
             config['auto_moderation'] = automod
-            update_server_config(ctx.guild.id, config)
+            await update_server_config(ctx.guild.id, config)
             
             status = "enabled" if automod['enabled'] else "disabled"
             embed = create_embed(
@@ -233,7 +233,7 @@ class AdminCog(commands.Cog):
     @commands.has_permissions(manage_guild=True)
     async def stats_command(self, ctx):
         """View comprehensive bot statistics."""
-        if not is_module_enabled("admin", ctx.guild.id):
+        if not await is_module_enabled("admin", ctx.guild.id):
             return
             
         try:
@@ -248,7 +248,7 @@ class AdminCog(commands.Cog):
             user_count = len(self.bot.users)
             
             # Get database stats
-            global_stats = get_global_stats()
+            global_stats = await get_global_stats()
             
             embed = discord.Embed(
                 title="📊 Bot Statistics",
@@ -284,11 +284,8 @@ class AdminCog(commands.Cog):
             
             # Guild-specific stats
             try:
-                users_db = db.get('users', {})
-                guild_users = 0
-                for user_id, user_data in users_db.items():
-                    # Count users who have been active in this guild
-                    guild_users += 1  # Simplified for now
+                # Count users who have been active in this guild
+                guild_users = await get_user_count()  # Simplified for now
                     
                 embed.add_field(
                     name=f"🏰 {ctx.guild.name}",
@@ -318,11 +315,11 @@ class AdminCog(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def create_backup(self, ctx):
         """Create a database backup."""
-        if not is_module_enabled("admin", ctx.guild.id):
+        if not await is_module_enabled("admin", ctx.guild.id):
             return
             
         try:
-            if backup_database():
+            if await backup_database():
                 embed = create_embed(
                     "✅ Backup Created",
                     "Database backup has been created successfully.",
@@ -350,7 +347,7 @@ class AdminCog(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def cleanup_data(self, ctx, days: int = 30):
         """Clean up old inactive user data."""
-        if not is_module_enabled("admin", ctx.guild.id):
+        if not await is_module_enabled("admin", ctx.guild.id):
             return
             
         if days < 7:
@@ -383,7 +380,7 @@ class AdminCog(commands.Cog):
                 reaction, user = await self.bot.wait_for('reaction_add', timeout=30.0, check=check)
                 
                 if str(reaction.emoji) == "✅":
-                    if cleanup_old_data(days):
+                    if await cleanup_old_data(days):
                         embed = create_embed(
                             "✅ Cleanup Complete",
                             f"Cleaned up inactive user data older than {days} days.",
@@ -490,7 +487,7 @@ class AdminCog(commands.Cog):
     async def maintenance_mode(self, ctx, mode: str = None):
         """Toggle maintenance mode for the bot."""
         try:
-            current_mode = db.get('maintenance_mode', False)
+            current_mode = await db_get('maintenance_mode', False)
             
             if mode is None:
                 status = "enabled" if current_mode else "disabled"
@@ -498,14 +495,14 @@ class AdminCog(commands.Cog):
                 return
                 
             if mode.lower() in ['on', 'enable', 'true']:
-                db['maintenance_mode'] = True
+                await db_set('maintenance_mode', True)
                 embed = create_embed(
                     "🔧 Maintenance Mode Enabled",
                     "Bot is now in maintenance mode. Most commands will be disabled.",
                     COLORS['warning']
                 )
             elif mode.lower() in ['off', 'disable', 'false']:
-                db['maintenance_mode'] = False
+                await db_set('maintenance_mode', False)
                 embed = create_embed(
                     "✅ Maintenance Mode Disabled",
                     "Bot is now operational. All commands are available.",
@@ -722,8 +719,7 @@ class AdminCog(commands.Cog):
         """Track command usage."""
         try:
             # Update global stats
-            from utils.database import update_global_stats
-            update_global_stats('total_commands', 1)
+            await update_global_stats('total_commands', 1)
         except Exception as e:
             logger.error(f"Error tracking command usage: {e}")
 
@@ -732,8 +728,7 @@ class AdminCog(commands.Cog):
         """Handle bot joining new guild."""
         try:
             # Update global stats
-            from utils.database import update_global_stats
-            update_global_stats('total_guilds', 1)
+            await update_global_stats('total_guilds', 1)
             
             logger.info(f"Bot joined new guild: {guild.name} ({guild.id})")
         except Exception as e:
@@ -744,8 +739,7 @@ class AdminCog(commands.Cog):
         """Handle bot leaving guild."""
         try:
             # Update global stats
-            from utils.database import update_global_stats
-            update_global_stats('total_guilds', -1)
+            await update_global_stats('total_guilds', -1)
             
             logger.info(f"Bot left guild: {guild.name} ({guild.id})")
         except Exception as e:
@@ -1,60 +1,124 @@
 import discord
 from discord.ext import commands
-import os
 import asyncio
+import time
 import logging
-from datetime import datetime, timedelta
-from replit import db
+from contextlib import aclosing
+from datetime import datetime
 from config import is_ai_enabled_in_channel, is_channel_allowed, is_module_enabled, get_server_config
-from utils.helpers import create_embed
-from config import COLORS
-import json
+from utils.helpers import create_embed, split_message
+from config import COLORS, AI_CONFIG, API_CONFIG, PERFORMANCE_CONFIG
+from utils.message_pipeline import message_pipeline, MessageContext, AI_STAGE
+from utils.conversation_log import conversation_log
+from utils.conversation_cache import conversation_cache
+from utils.async_db import db_executor, run_db, get_server_config_entry
+from utils.ai_client import ai_client, AIClientError
+from utils.response_cache import response_cache
+from utils.prompt_builder import prompt_builder
+from utils.conversation_summarizer import conversation_summarizer
+from utils.rate_limit import QuotaLimiter
+from utils.metrics import register_metrics, unregister_metrics
+from utils.text_normalizer import looks_like_command
 
 logger = logging.getLogger(__name__)
 
+UNAVAILABLE_RESPONSE = "I'm sorry, but my AI capabilities are currently unavailable. Please check if the GEMINI_API_KEY is properly configured."
+ERROR_RESPONSE = "I'm having trouble processing that right now. Please try again later!"
+INTERRUPTED_MARKER = "*(response interrupted)*"
+# Sent instead of calling the API when a quota bucket is empty
+QUOTA_RESPONSES = {
+    'user': "You're chatting a bit fast! Give me {seconds} seconds to catch my breath.",
+    'guild': "This server has reached its AI limit for the moment. Try again in {seconds} seconds.",
+    'global': "I'm very busy right now. Please try again in {seconds} seconds."
+}
+
+class StreamingReply:
+    """Posts a response while it streams in, editing at most once per interval."""
+
+    def __init__(self, channel, edit_interval: float):
+        self.channel = channel
+        self.edit_interval = edit_interval
+        self.text = ""
+        self._messages = []  # (sent message, content it currently shows)
+        self._last_render = 0.0
+
+    async def add(self, piece: str):
+        """Append streamed text; the first piece is posted immediately."""
+        self.text += piece
+        if not self._messages or time.monotonic() - self._last_render >= self.edit_interval:
+            await self._render()
+
+    async def finish(self) -> str:
+        """Bring the posted messages up to date with the full text."""
+        await self._render()
+        return self.text
+
+    async def interrupt(self):
+        """Mark the posted text as cut off."""
+        self.text += f"\n\n{INTERRUPTED_MARKER}"
+        await self._render()
+
+    async def _render(self):
+        for index, chunk in enumerate(split_message(self.text)):
+            if index < len(self._messages):
+                message, shown = self._messages[index]
+                if shown != chunk:
+                    self._messages[index] = (await message.edit(content=chunk), chunk)
+            else:
+                self._messages.append((await self.channel.send(chunk), chunk))
+        self._last_render = time.monotonic()
+
 class AIChatbotCog(commands.Cog):
     """AI Chatbot functionality using Google Gemini."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.conversation_history = {}  # guild_id -> channel_id -> messages
-        self.active_conversations = {}  # guild_id -> channel_id -> last_message_time
         self.conversation_timeout = 300  # 5 minutes timeout
-        self.user_conversation_context = {}  # user_id -> last_context
+        self.log_flush_task = None
+        # Per-user, per-guild and global AI request quotas
+        self.quota = QuotaLimiter(
+            user_limit=API_CONFIG['user_rate_limit_requests'],
+            guild_limit=API_CONFIG['guild_rate_limit_requests'],
+            global_limit=API_CONFIG['rate_limit_requests'],
+            period=API_CONFIG['rate_limit_window'],
+            max_keys=PERFORMANCE_CONFIG['rate_tracker_max_keys']
+        )
         self.setup_gemini()
 
+    async def cog_load(self):
+        message_pipeline.add_stage('ai_chatbot', self.ai_stage, AI_STAGE)
+        register_metrics('ai_quota', self.quota.get_metrics)
+        self.log_flush_task = asyncio.create_task(
+            conversation_log.run_flush_loop(AI_CONFIG['log_flush_interval'], db_executor)
+        )
+
+    async def cog_unload(self):
+        message_pipeline.remove_stage('ai_chatbot')
+        unregister_metrics('ai_quota')
+        if self.log_flush_task:
+            self.log_flush_task.cancel()
+        conversation_summarizer.cancel_all()
+        # Persist anything appended since the last flush
+        await run_db(conversation_log.flush)
+
     def setup_gemini(self):
         """Setup Google Gemini API."""
-        try:
-            import google.generativeai as genai
-            
-            api_key = os.getenv('GEMINI_API_KEY')
-            if not api_key:
-                logger.error("GEMINI_API_KEY not found in environment variables!")
-                self.gemini_available = False
-                return
+        ai_client.setup(API_CONFIG['gemini_api_key'])
 
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
-            self.gemini_available = True
-            logger.info("Google Gemini API initialized successfully")
-        except ImportError:
-            logger.error("google-generativeai package not installed!")
-            self.gemini_available = False
-        except Exception as e:
-            logger.error(f"Failed to initialize Gemini API: {e}")
-            self.gemini_available = False
+    @property
+    def gemini_available(self):
+        return ai_client.available
 
     def get_conversation_key(self, guild_id, channel_id):
         """Get unique conversation key."""
         return f"{guild_id}_{channel_id}"
 
-    def add_to_conversation_history(self, guild_id, channel_id, role, content, user_id=None):
+    async def add_to_conversation_history(self, guild_id, channel_id, role, content, user_id=None):
         """Add message to conversation history."""
         key = self.get_conversation_key(guild_id, channel_id)
 
-        if key not in self.conversation_history:
-            self.conversation_history[key] = []
+        # Load persisted history first so it isn't shadowed by this message
+        await self.get_conversation_history(key)
 
         # Add message to history
         message_data = {
@@ -64,81 +128,50 @@ class AIChatbotCog(commands.Cog):
             'user_id': str(user_id) if user_id else None
         }
 
-        self.conversation_history[key].append(message_data)
+        conversation_cache.append(key, message_data)
 
-        # Keep only last 20 messages for better memory
-        if len(self.conversation_history[key]) > 20:
-            self.conversation_history[key] = self.conversation_history[key][-20:]
+        # Queue a single log append; the flush task writes it off the event loop
+        conversation_log.append(key, message_data)
 
-        # Save to database for persistence
-        self.save_conversation_to_db(key)
+        # Summarize older history once the channel goes quiet after this exchange
+        if role == 'assistant' and AI_CONFIG['summarize_history']:
+            conversation_summarizer.schedule(key)
 
-    def save_conversation_to_db(self, conversation_key):
-        """Save conversation to database."""
-        try:
-            # Convert datetime objects to strings for JSON serialization
-            conversation_data = []
-            for msg in self.conversation_history.get(conversation_key, []):
-                msg_copy = msg.copy()
-                msg_copy['timestamp'] = msg_copy['timestamp'].isoformat()
-                conversation_data.append(msg_copy)
-            
-            db[f"conversation_{conversation_key}"] = conversation_data
-        except Exception as e:
-            logger.error(f"Error saving conversation to DB: {e}")
+    async def get_conversation_history(self, conversation_key):
+        """Get a channel's recent messages, loading them from the database on a cache miss."""
+        messages = conversation_cache.get(conversation_key)
+        if messages is not None:
+            return messages
 
-    def load_conversation_from_db(self, conversation_key):
-        """Load conversation from database."""
         try:
-            conversation_data = db.get(f"conversation_{conversation_key}", [])
-            
-            # Convert timestamp strings back to datetime objects
-            for msg in conversation_data:
-                msg['timestamp'] = datetime.fromisoformat(msg['timestamp'])
-            
-            self.conversation_history[conversation_key] = conversation_data
+            messages = await run_db(conversation_log.load, conversation_key)
+            summary = None
+            if AI_CONFIG['summarize_history']:
+                summary = await run_db(conversation_summarizer.load, conversation_key)
         except Exception as e:
             logger.error(f"Error loading conversation from DB: {e}")
-
-    def build_conversation_context(self, guild_id, channel_id, user_id=None):
-        """Build conversation context for Gemini."""
-        key = self.get_conversation_key(guild_id, channel_id)
-
-        # Load from database if not in memory
-        if key not in self.conversation_history:
-            self.load_conversation_from_db(key)
-
-        if key not in self.conversation_history:
             return []
+        # Keeps the existing entry if another task loaded it while this one waited
+        return conversation_cache.put(conversation_key, messages, summary)
 
-        # Filter out old messages (older than 2 hours for better memory)
-        cutoff_time = datetime.now() - timedelta(hours=2)
-        recent_messages = [
-            msg for msg in self.conversation_history[key]
-            if msg['timestamp'] > cutoff_time
-        ]
-
-        # Update history with filtered messages
-        self.conversation_history[key] = recent_messages
-
-        # Build context for Gemini - focus on recent conversation
-        context = []
-        for msg in recent_messages[-10:]:  # Last 10 messages
-            if msg['role'] == 'user':
-                context.append(f"User: {msg['content']}")
-            else:
-                context.append(f"Assistant: {msg['content']}")
+    def check_quota(self, user_id, guild_id=None):
+        """Take one AI request from the caller's quotas; returns a canned reply if any is exhausted."""
+        exhausted = self.quota.acquire(user_id, guild_id)
+        if exhausted is None:
+            return None
+        scope, retry_after = exhausted
+        return QUOTA_RESPONSES[scope].format(seconds=max(1, round(retry_after)))
 
-        return context
+    def should_respond(self, msg_ctx: MessageContext):
+        """Cheap check for whether a guild message is addressed to the bot.
 
-    def should_respond_to_message(self, message):
-        """Check if bot should respond to this message."""
-        # Don't respond to bots or own messages
-        if message.author.bot:
-            return False
+        Runs before any config or history lookups, so most chatter is rejected
+        with a prefix check and a mention check.
+        """
+        message = msg_ctx.message
 
         # Don't respond to commands
-        if message.content.startswith(('$', '!', '?', '.', '/')):
+        if looks_like_command(msg_ctx.content):
             return False
 
         # Check if bot is mentioned
@@ -151,110 +184,135 @@ class AIChatbotCog(commands.Cog):
             message.reference.resolved.author == self.bot.user):
             return True
 
-        # Check for direct messages
-        if isinstance(message.channel, discord.DMChannel):
-            return True
+        # Check for an active conversation the user recently took part in
+        key = self.get_conversation_key(msg_ctx.guild_id, message.channel.id)
+        return conversation_cache.is_recent_participant(key, str(message.author.id), self.conversation_timeout)
 
-        # Check for active conversation continuation
-        key = self.get_conversation_key(message.guild.id, message.channel.id)
-        current_time = datetime.now()
-
-        # If there's an active conversation
-        if key in self.active_conversations:
-            last_message_time = self.active_conversations[key]
-            time_diff = (current_time - last_message_time).total_seconds()
-
-            # If within timeout and user was recently chatting with bot
-            if time_diff <= self.conversation_timeout:
-                if key in self.conversation_history:
-                    recent_history = self.conversation_history[key]
-                    user_id = str(message.author.id)
-
-                    # Check if user was in recent conversation (last 5 messages)
-                    for msg in recent_history[-5:]:
-                        if msg.get('user_id') == user_id:
-                            return True
-            else:
-                # Conversation timed out, remove from active conversations
-                del self.active_conversations[key]
+    async def build_prompt(self, message_content, guild_id, channel_id, user_id=None):
+        """Build the full Gemini prompt and its response cache key."""
+        # Get custom prompt or use default; the cached entry avoids copying the config
+        config_entry = await get_server_config_entry(guild_id)
+        custom_prompt = config_entry['config'].get('ai_custom_prompt', '')
+
+        # Expired messages are already dropped by the conversation cache
+        key = self.get_conversation_key(guild_id, channel_id)
+        history = await self.get_conversation_history(key)
+
+        # Pack the running summary and as much recent history as fits the token budget
+        full_prompt, context = prompt_builder.build(
+            guild_id, custom_prompt, history, message_content,
+            summary=conversation_cache.get_summary(key)
+        )
 
-        return False
+        cache_key = response_cache.make_key(message_content, custom_prompt, context)
+        return full_prompt, cache_key
 
     async def generate_ai_response(self, message_content, guild_id, channel_id, user_id=None):
         """Generate AI response using Gemini."""
         if not self.gemini_available:
-            return "I'm sorry, but my AI capabilities are currently unavailable. Please check if the GEMINI_API_KEY is properly configured."
+            return UNAVAILABLE_RESPONSE
 
         try:
-            # Get custom prompt or use default
-            server_config = get_server_config(guild_id)
-            custom_prompt = server_config.get('ai_custom_prompt', '')
-
-            # Create system prompt
-            if custom_prompt:
-                system_prompt = f"""{custom_prompt}
+            full_prompt, cache_key = await self.build_prompt(message_content, guild_id, channel_id, user_id)
 
-Important: Keep responses SHORT (1-2 sentences max), casual, and engaging. Don't be overly verbose."""
-            else:
-                system_prompt = """You are Epic-Maki, a friendly Discord bot for an RPG server. Be conversational and helpful.
-
-Key traits:
-- Keep responses SHORT (1-2 sentences max)
-- Be casual, warm, and engaging
-- Ask brief follow-up questions occasionally
-- Stay positive and encouraging
-- Chat naturally about any topic
-- Reference RPG/gaming themes when appropriate
-- Remember context from recent messages
-
-Goal: Be a fun, memorable chat companion without being wordy."""
-
-            # Build conversation context
-            context = self.build_conversation_context(guild_id, channel_id, user_id)
-
-            # Create full prompt with context
-            if context:
-                context_text = "\n".join(context[-5:])  # Use last 5 messages
-                full_prompt = f"{system_prompt}\n\nRecent conversation:\n{context_text}\n\nUser: {message_content}"
-            else:
-                full_prompt = f"{system_prompt}\n\nUser: {message_content}"
-
-            # Generate response
-            response = await asyncio.get_event_loop().run_in_executor(
-                None, 
-                lambda: self.model.generate_content(full_prompt)
+            # Reuse a recent or in-flight answer to the same prompt.
+            # DMs pass guild 0 and share only the global limit.
+            return await response_cache.get_or_create(
+                cache_key,
+                lambda: ai_client.generate(full_prompt, guild_id)
             )
 
-            return response.text
-
         except Exception as e:
             logger.error(f"Error generating AI response: {e}")
-            return "I'm having trouble processing that right now. Please try again later!"
+            return ERROR_RESPONSE
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Listen for messages and respond with AI when appropriate."""
-        # Skip if not in guild (unless DM)
-        if not message.guild and not isinstance(message.channel, discord.DMChannel):
-            return
+    async def send_ai_response(self, channel, message_content, guild_id, channel_id, user_id=None):
+        """Generate a response and post it, streaming it in when enabled. Returns the response text."""
+        if not AI_CONFIG['stream_responses'] or not self.gemini_available:
+            response = await self.generate_ai_response(message_content, guild_id, channel_id, user_id)
+            for chunk in split_message(response):
+                await channel.send(chunk)
+            return response
+
+        try:
+            full_prompt, cache_key = await self.build_prompt(message_content, guild_id, channel_id, user_id)
+        except Exception as e:
+            logger.error(f"Error building AI prompt: {e}")
+            await channel.send(ERROR_RESPONSE)
+            return ERROR_RESPONSE
+
+        # A cached or in-flight identical request is sent whole rather than re-streamed
+        found = response_cache.lookup(cache_key)
+        if found is not None:
+            try:
+                response = found if isinstance(found, str) else await asyncio.shield(found)
+            except (Exception, asyncio.CancelledError) as e:
+                logger.error(f"Error generating AI response: {e!r}")
+                response = ERROR_RESPONSE
+            for chunk in split_message(response):
+                await channel.send(chunk)
+            return response
+
+        result = response_cache.begin(cache_key)
+        reply = StreamingReply(channel, AI_CONFIG['stream_edit_interval'])
+        try:
+            # aclosing releases the client's request slot as soon as we stop reading,
+            # e.g. when sending an edit fails, instead of whenever the generator is collected
+            async with aclosing(ai_client.stream(full_prompt, guild_id)) as pieces:
+                async for piece in pieces:
+                    await reply.add(piece)
+            response = await reply.finish()
+            if not response.strip():
+                raise AIClientError("Gemini returned an empty response")
+            result.set_result(response)
+            return response
+        except Exception as e:
+            logger.error(f"Error streaming AI response: {e}")
+            result.set_exception(e)
+            # Discord itself may be what failed, so reporting the error must not raise
+            try:
+                if reply.text.strip():
+                    # Keep whatever was already posted, flagged as incomplete
+                    await reply.interrupt()
+                else:
+                    await channel.send(ERROR_RESPONSE)
+            except Exception as e:
+                logger.error(f"Error reporting interrupted AI response: {e}")
+            # Partial text is not a reply; history records the failure like other errors
+            return ERROR_RESPONSE
+        finally:
+            # Release coalesced waiters if this task was cancelled mid-stream
+            if not result.done():
+                result.cancel()
+
+    async def ai_stage(self, msg_ctx: MessageContext):
+        """Message pipeline stage that responds with AI when appropriate."""
+        message = msg_ctx.message
 
         # For DMs, always respond
-        if isinstance(message.channel, discord.DMChannel):
-            if message.author.bot:
+        if msg_ctx.is_dm:
+            # DMs skip every guild check, so the user and global quotas still apply
+            quota_reply = self.check_quota(message.author.id)
+            if quota_reply:
+                await message.channel.send(quota_reply)
                 return
-            
+
             # Generate response for DM
             async with message.channel.typing():
-                response = await self.generate_ai_response(
+                await self.send_ai_response(
+                    message.channel,
                     message.content, 
                     0,  # No guild for DMs
                     message.channel.id,
                     message.author.id
                 )
-                await message.channel.send(response)
             return
 
-        # Check if module is enabled
+        # Reject messages not meant for the bot before touching config
+        if not self.should_respond(msg_ctx):
+            return
+
+        # Config was loaded by the pipeline, so these checks are cache lookups
         if not is_module_enabled("ai_chatbot", message.guild.id):
             return
 
@@ -266,27 +324,17 @@ Goal: Be a fun, memorable chat companion without being wordy."""
         if not is_ai_enabled_in_channel(message.channel.id, message.guild.id):
             return
 
-        # Check if we should respond
-        if not self.should_respond_to_message(message):
-            return
-
-        # Clean the message content for AI processing
-        clean_content = message.content
+        # Mentions (the bot's included) are stripped once per message by the pipeline;
+        # if nothing is left, use a default greeting
+        clean_content = msg_ctx.clean_content or "Hello!"
 
-        # Remove bot mentions from the message
-        if self.bot.user.mentioned_in(message):
-            clean_content = message.content.replace(f'<@{self.bot.user.id}>', '').replace(f'<@!{self.bot.user.id}>', '').strip()
-
-        # Remove other user mentions to avoid confusion
-        import re
-        clean_content = re.sub(r'<@!?\d+>', '', clean_content).strip()
-
-        # If message is empty after cleaning, use a default greeting
-        if not clean_content:
-            clean_content = "Hello!"
+        quota_reply = self.check_quota(message.author.id, message.guild.id)
+        if quota_reply:
+            await message.reply(quota_reply, mention_author=False)
+            return
 
         # Add user message to history
-        self.add_to_conversation_history(
+        await self.add_to_conversation_history(
             message.guild.id, 
             message.channel.id, 
             'user', 
@@ -296,39 +344,26 @@ Goal: Be a fun, memorable chat companion without being wordy."""
 
         # Update active conversation timestamp
         key = self.get_conversation_key(message.guild.id, message.channel.id)
-        self.active_conversations[key] = datetime.now()
+        conversation_cache.mark_active(key)
 
-        # Show typing indicator
+        # Show typing indicator until the response starts arriving
         async with message.channel.typing():
-            # Generate response
-            response = await self.generate_ai_response(
+            # Generate and post the response, split to Discord's message limit
+            response = await self.send_ai_response(
+                message.channel,
                 clean_content, 
                 message.guild.id, 
                 message.channel.id,
                 message.author.id
             )
 
-            # Split response if too long
-            if len(response) > 2000:
-                chunks = [response[i:i+2000] for i in range(0, len(response), 2000)]
-                for chunk in chunks:
-                    await message.channel.send(chunk)
-                # Add last chunk to history
-                self.add_to_conversation_history(
-                    message.guild.id, 
-                    message.channel.id, 
-                    'assistant', 
-                    chunks[-1]
-                )
-            else:
-                await message.channel.send(response)
-                # Add response to history
-                self.add_to_conversation_history(
-                    message.guild.id, 
-                    message.channel.id, 
-                    'assistant', 
-                    response
-                )
+        # Add response to history
+        await self.add_to_conversation_history(
+            message.guild.id, 
+            message.channel.id, 
+            'assistant', 
+            response
+        )
 
     @commands.command(name='chat', help='Start a conversation with the AI')
     async def chat_command(self, ctx, *, message: str):
@@ -345,8 +380,13 @@ Goal: Be a fun, memorable chat companion without being wordy."""
             await ctx.send(embed=embed)
             return
 
+        quota_reply = self.check_quota(ctx.author.id, ctx.guild.id)
+        if quota_reply:
+            await ctx.send(quota_reply)
+            return
+
         # Add user message to history
-        self.add_to_conversation_history(
+        await self.add_to_conversation_history(
             ctx.guild.id, 
             ctx.channel.id, 
             'user', 
@@ -375,7 +415,7 @@ Goal: Be a fun, memorable chat companion without being wordy."""
             await ctx.send(embed=embed)
 
             # Add response to history
-            self.add_to_conversation_history(
+            await self.add_to_conversation_history(
                 ctx.guild.id, 
                 ctx.channel.id, 
                 'assistant', 
@@ -390,16 +430,13 @@ Goal: Be a fun, memorable chat companion without being wordy."""
             
         key = self.get_conversation_key(ctx.guild.id, ctx.channel.id)
 
-        if key in self.conversation_history:
-            del self.conversation_history[key]
-
-        if key in self.active_conversations:
-            del self.active_conversations[key]
+        conversation_cache.discard(key)
+        conversation_summarizer.cancel(key)
 
         # Clear from database
         try:
-            if f"conversation_{key}" in db:
-                del db[f"conversation_{key}"]
+            await run_db(conversation_log.clear, key)
+            await run_db(conversation_summarizer.delete, key)
         except Exception as e:
             logger.error(f"Error clearing conversation from DB: {e}")
 
@@ -437,15 +474,27 @@ Goal: Be a fun, memorable chat companion without being wordy."""
         
         # Show conversation stats
         key = self.get_conversation_key(ctx.guild.id, ctx.channel.id)
-        conversation_count = len(self.conversation_history.get(key, []))
+        conversation_count = len(conversation_cache.peek(key) or [])
         
         embed.add_field(
             name="💬 Conversation Stats",
             value=f"Messages in history: {conversation_count}\n"
-                  f"Active conversations: {len(self.active_conversations)}",
+                  f"Active conversations: {conversation_cache.active_count(self.conversation_timeout)}",
             inline=False
         )
         
+        # Show remaining request quota
+        remaining = self.quota.remaining(ctx.author.id, ctx.guild.id)
+        window = API_CONFIG['rate_limit_window']
+        embed.add_field(
+            name="⏳ Request Quota",
+            value=f"You: {remaining['user']}/{API_CONFIG['user_rate_limit_requests']}\n"
+                  f"This server: {remaining['guild']}/{API_CONFIG['guild_rate_limit_requests']}\n"
+                  f"Bot-wide: {remaining['global']}/{API_CONFIG['rate_limit_requests']}\n"
+                  f"Refills over {window} seconds",
+            inline=False
+        )
+
         # Show AI settings
         server_config = get_server_config(ctx.guild.id)
         custom_prompt = server_config.get('ai_custom_prompt', 'None')
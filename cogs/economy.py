@@ -1,13 +1,14 @@
 import discord
 from discord.ext import commands
 import random
-from datetime import datetime, timedelta
-from replit import db
-from utils.database import get_user_data, update_user_data, ensure_user_exists, get_user_rpg_data, update_user_rpg_data
-from utils.helpers import create_embed, format_number, level_up_player, get_random_work_job, get_time_until_next_use, format_time_remaining
+from datetime import timedelta
+from utils.async_db import ensure_user_exists, get_player_profile, save_player_profile, is_module_enabled
+from utils.helpers import create_embed, format_number, level_up_player, get_random_work_job, format_time_remaining, now_epoch, seconds_since
+from utils.cooldowns import cooldowns
 from utils.constants import SHOP_ITEMS, ITEMS, RPG_CONSTANTS, DAILY_REWARDS
+from utils.catalog import catalog
 from utils.rng_system import roll_with_luck, generate_loot_with_luck
-from config import COLORS, EMOJIS, is_module_enabled
+from config import COLORS, EMOJIS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,37 +35,36 @@ class EconomyCog(commands.Cog):
         self.user_investments = {}  # user_id -> investments
         
     @commands.command(name='work', help='Work to earn coins')
-    @commands.cooldown(1, RPG_CONSTANTS['work_cooldown'], commands.BucketType.user)
     async def work(self, ctx):
         """Work to earn coins."""
-        if not is_module_enabled("economy", ctx.guild.id):
+        if not await is_module_enabled("economy", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
+        cooldown_pending = False
         try:
-            player_data = get_user_rpg_data(user_id)
+            player = await get_player_profile(user_id)
             
-            if not player_data:
+            if not player:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
             
-            # Check cooldown
-            last_work = player_data.get('last_work')
-            if last_work:
-                cooldown_remaining = get_time_until_next_use(last_work, RPG_CONSTANTS['work_cooldown'])
-                if cooldown_remaining > 0:
-                    embed = create_embed(
-                        "⏰ Work Cooldown",
-                        f"You can work again in {format_time_remaining(cooldown_remaining)}",
-                        COLORS['warning']
-                    )
-                    await ctx.send(embed=embed)
-                    return
+            # Check and start cooldown
+            cooldown_remaining = await cooldowns.try_start(user_id, 'work')
+            if cooldown_remaining > 0:
+                embed = create_embed(
+                    "⏰ Work Cooldown",
+                    f"You can work again in {format_time_remaining(cooldown_remaining)}",
+                    COLORS['warning']
+                )
+                await ctx.send(embed=embed)
+                return
+            cooldown_pending = True
             
             # Get random job
             job = get_random_work_job()
@@ -81,7 +81,7 @@ class EconomyCog(commands.Cog):
             xp_earned = loot['xp']
             
             # Level bonus
-            level_bonus = int(coins_earned * 0.1 * player_data['level'])
+            level_bonus = int(coins_earned * 0.1 * player.level)
             coins_earned += level_bonus
             
             # Weekend bonus
@@ -92,30 +92,29 @@ class EconomyCog(commands.Cog):
                 xp_earned = int(xp_earned * weekend_multiplier)
             
             # Update player data
-            player_data['coins'] += coins_earned
-            player_data['xp'] += xp_earned
-            player_data['last_work'] = datetime.now().isoformat()
-            player_data['work_count'] = player_data.get('work_count', 0) + 1
+            player.coins += coins_earned
+            player.xp += xp_earned
+            player.last_work = now_epoch()
+            player.work_count += 1
             
             # Update stats
-            if 'stats' not in player_data:
-                player_data['stats'] = {}
-            player_data['stats']['total_coins_earned'] = player_data['stats'].get('total_coins_earned', 0) + coins_earned
-            player_data['stats']['total_xp_earned'] = player_data['stats'].get('total_xp_earned', 0) + xp_earned
+            player.stats.total_coins_earned += coins_earned
+            player.stats.total_xp_earned += xp_earned
             
             # Check for level up
-            level_up_msg = level_up_player(player_data)
+            level_up_msg = level_up_player(player)
             
             # Random event check
             if roll_with_luck(user_id, 0.1):  # 10% chance
                 bonus_coins = random.randint(20, 100)
-                player_data['coins'] += bonus_coins
+                player.coins += bonus_coins
                 bonus_msg = f"\n🎲 Lucky bonus: +{bonus_coins} coins!"
             else:
                 bonus_msg = ""
                 
             # Save data
-            update_user_rpg_data(user_id, player_data)
+            await save_player_profile(user_id, player)
+            cooldown_pending = False
             
             description = (
                 f"You worked as a **{job['name']}** and earned:\n"
@@ -127,7 +126,7 @@ class EconomyCog(commands.Cog):
             if weekend_multiplier > 1:
                 description += f"\n🎊 Weekend bonus applied! ({weekend_multiplier}x)"
             
-            description += f"\n\nTotal coins: {format_number(player_data['coins'])}"
+            description += f"\n\nTotal coins: {format_number(player.coins)}"
             
             embed = create_embed(
                 f"💼 Work Complete!",
@@ -141,67 +140,60 @@ class EconomyCog(commands.Cog):
             await ctx.send(embed=embed)
         except Exception as e:
             logger.error(f"Error in work command for {user_id}: {e}")
+            # Give the cooldown back if the reward was never saved
+            if cooldown_pending:
+                cooldowns.reset(user_id, 'work')
             await ctx.send("❌ An error occurred while working. Please try again.")
         
     @commands.command(name='daily', help='Claim your daily reward')
-    @commands.cooldown(1, RPG_CONSTANTS['daily_cooldown'], commands.BucketType.user)
     async def daily_reward(self, ctx):
         """Claim daily reward."""
-        if not is_module_enabled("economy", ctx.guild.id):
+        if not await is_module_enabled("economy", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
+        cooldown_pending = False
         try:
-            player_data = get_user_rpg_data(user_id)
+            player = await get_player_profile(user_id)
             
-            if not player_data:
+            if not player:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
             
-            # Check cooldown
-            last_daily = player_data.get('last_daily')
-            if last_daily:
-                cooldown_remaining = get_time_until_next_use(last_daily, RPG_CONSTANTS['daily_cooldown'])
-                if cooldown_remaining > 0:
-                    embed = create_embed(
-                        "⏰ Daily Cooldown",
-                        f"You can claim your daily reward in {format_time_remaining(cooldown_remaining)}",
-                        COLORS['warning']
-                    )
-                    await ctx.send(embed=embed)
-                    return
+            # Check and start cooldown
+            cooldown_remaining = await cooldowns.try_start(user_id, 'daily')
+            if cooldown_remaining > 0:
+                embed = create_embed(
+                    "⏰ Daily Cooldown",
+                    f"You can claim your daily reward in {format_time_remaining(cooldown_remaining)}",
+                    COLORS['warning']
+                )
+                await ctx.send(embed=embed)
+                return
+            cooldown_pending = True
+            last_daily = player.last_daily
             
             # Calculate streak
-            daily_streak = player_data.get('daily_streak', 0)
-            last_daily_dt = None
-            
-            if last_daily:
-                try:
-                    last_daily_dt = datetime.fromisoformat(last_daily)
-                    # Check if it's been exactly 1 day (with some tolerance)
-                    time_diff = datetime.now() - last_daily_dt
-                    if time_diff.days == 1:
-                        daily_streak += 1
-                    elif time_diff.days > 1:
-                        daily_streak = 1  # Reset streak
-                    else:
-                        daily_streak = 1  # First claim
-                except:
-                    daily_streak = 1
+            daily_streak = player.daily_streak
+            since_last_daily = seconds_since(last_daily)
+            
+            # Check if it's been exactly 1 day (with some tolerance)
+            if since_last_daily is not None and since_last_daily // 86400 == 1:
+                daily_streak += 1
             else:
-                daily_streak = 1
+                daily_streak = 1  # First claim or streak broken
             
             # Cap streak at max
             daily_streak = min(daily_streak, DAILY_REWARDS['max_streak'])
             
             # Calculate rewards
             base_reward = DAILY_REWARDS['base']
-            level_bonus = player_data['level'] * DAILY_REWARDS['level_multiplier']
+            level_bonus = player.level * DAILY_REWARDS['level_multiplier']
             streak_bonus = (daily_streak - 1) * DAILY_REWARDS['streak_bonus']
             
             total_reward = base_reward + level_bonus + streak_bonus
@@ -218,17 +210,16 @@ class EconomyCog(commands.Cog):
                 bonus_text = f"\n🎲 Lucky bonus: +{bonus_amount} coins!"
                 
             # Update player data
-            player_data['coins'] += final_reward
-            player_data['last_daily'] = datetime.now().isoformat()
-            player_data['daily_streak'] = daily_streak
+            player.coins += final_reward
+            player.last_daily = now_epoch()
+            player.daily_streak = daily_streak
             
             # Update stats
-            if 'stats' not in player_data:
-                player_data['stats'] = {}
-            player_data['stats']['total_coins_earned'] = player_data['stats'].get('total_coins_earned', 0) + final_reward
+            player.stats.total_coins_earned += final_reward
             
             # Save data
-            update_user_rpg_data(user_id, player_data)
+            await save_player_profile(user_id, player)
+            cooldown_pending = False
             
             embed = create_embed(
                 "🎁 Daily Reward Claimed!",
@@ -236,7 +227,7 @@ class EconomyCog(commands.Cog):
                 f"Base reward: {base_reward}\n"
                 f"Level bonus: {level_bonus}\n"
                 f"Streak bonus: {streak_bonus} (Day {daily_streak}){bonus_text}\n\n"
-                f"Total coins: {format_number(player_data['coins'])}",
+                f"Total coins: {format_number(player.coins)}",
                 COLORS['warning']
             )
             
@@ -250,12 +241,15 @@ class EconomyCog(commands.Cog):
             await ctx.send(embed=embed)
         except Exception as e:
             logger.error(f"Error in daily command for {user_id}: {e}")
+            # Give the cooldown back if the reward was never saved
+            if cooldown_pending:
+                cooldowns.reset(user_id, 'daily')
             await ctx.send("❌ An error occurred while claiming daily reward. Please try again.")
         
     @commands.command(name='shop', help='View the item shop')
     async def shop(self, ctx):
         """Display the item shop."""
-        if not is_module_enabled("economy", ctx.guild.id):
+        if not await is_module_enabled("economy", ctx.guild.id):
             return
             
         try:
@@ -309,46 +303,32 @@ class EconomyCog(commands.Cog):
     @commands.command(name='buy', help='Buy an item from the shop')
     async def buy_item(self, ctx, *, item_name: str):
         """Buy an item from the shop."""
-        if not is_module_enabled("economy", ctx.guild.id):
+        if not await is_module_enabled("economy", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
         try:
-            player_data = get_user_rpg_data(user_id)
+            player = await get_player_profile(user_id)
             
-            if not player_data:
+            if not player:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
             
             # Find item in shop
-            found_item = None
-            item_category = None
-            
-            for category, items in SHOP_ITEMS.items():
-                for shop_item, item_data in items.items():
-                    if shop_item.lower() == item_name.lower():
-                        found_item = shop_item
-                        item_category = category
-                        break
-                if found_item:
-                    break
+            found_item = catalog.shop.get(item_name)
                     
             if not found_item:
                 # Suggest similar items
-                suggestions = []
-                for category, items in SHOP_ITEMS.items():
-                    for shop_item in items.keys():
-                        if item_name.lower() in shop_item.lower():
-                            suggestions.append(shop_item)
+                suggestions = catalog.shop.suggest(item_name, limit=5)
                 
                 suggestion_text = ""
                 if suggestions:
-                    suggestion_text = f"\n\n**Did you mean:**\n" + "\n".join(f"• {item}" for item in suggestions[:5])
+                    suggestion_text = f"\n\n**Did you mean:**\n" + "\n".join(f"• {item}" for item in suggestions)
                 
                 embed = create_embed(
                     "❌ Item Not Found",
@@ -358,7 +338,7 @@ class EconomyCog(commands.Cog):
                 await ctx.send(embed=embed)
                 return
                 
-            item_data = SHOP_ITEMS[item_category][found_item]
+            item_data = catalog.item_data(found_item)
             price = item_data['price']
             
             # Apply guild discount if applicable
@@ -368,21 +348,21 @@ class EconomyCog(commands.Cog):
             final_price = int(price * (1 - discount))
             
             # Check if player has enough coins
-            if player_data['coins'] < final_price:
+            if player.coins < final_price:
                 embed = create_embed(
                     "❌ Insufficient Funds",
-                    f"You need {format_number(final_price)} coins but only have {format_number(player_data['coins'])}.\n"
-                    f"You need {format_number(final_price - player_data['coins'])} more coins!",
+                    f"You need {format_number(final_price)} coins but only have {format_number(player.coins)}.\n"
+                    f"You need {format_number(final_price - player.coins)} more coins!",
                     COLORS['error']
                 )
                 await ctx.send(embed=embed)
                 return
                 
             # Check inventory space
-            if len(player_data.get('inventory', [])) >= RPG_CONSTANTS['max_inventory_size']:
+            if not player.inventory.has_room(found_item, RPG_CONSTANTS['max_inventory_size']):
                 embed = create_embed(
                     "❌ Inventory Full",
-                    f"Your inventory is full! ({RPG_CONSTANTS['max_inventory_size']} items max)\n"
+                    f"Your inventory is full! ({RPG_CONSTANTS['max_inventory_size']} different items max)\n"
                     f"Sell some items first with `$sell <item>`",
                     COLORS['error']
                 )
@@ -390,13 +370,11 @@ class EconomyCog(commands.Cog):
                 return
                 
             # Process purchase
-            player_data['coins'] -= final_price
-            if 'inventory' not in player_data:
-                player_data['inventory'] = []
-            player_data['inventory'].append(found_item)
+            player.coins -= final_price
+            player.inventory.add(found_item)
             
             # Save data
-            update_user_rpg_data(user_id, player_data)
+            await save_player_profile(user_id, player)
             
             # Create purchase embed
             rarity = item_data.get('rarity', 'common')
@@ -419,7 +397,7 @@ class EconomyCog(commands.Cog):
             
             embed.add_field(
                 name="💳 Account Balance",
-                value=f"Remaining coins: {format_number(player_data['coins'])}",
+                value=f"Remaining coins: {format_number(player.coins)}",
                 inline=False
             )
             
@@ -449,39 +427,24 @@ class EconomyCog(commands.Cog):
     @commands.command(name='sell', help='Sell items from your inventory')
     async def sell_item(self, ctx, *, item_name: str):
         """Sell an item from inventory."""
-        if not is_module_enabled("economy", ctx.guild.id):
+        if not await is_module_enabled("economy", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
         try:
-            player_data = get_user_rpg_data(user_id)
+            player = await get_player_profile(user_id)
             
-            if not player_data:
+            if not player:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
             
-            # Check if item is in inventory
-            if 'inventory' not in player_data:
-                player_data['inventory'] = []
-                
             # Find exact or partial match
-            found_item = None
-            for item in player_data['inventory']:
-                if item.lower() == item_name.lower():
-                    found_item = item
-                    break
-            
-            if not found_item:
-                # Try partial match
-                for item in player_data['inventory']:
-                    if item_name.lower() in item.lower():
-                        found_item = item
-                        break
+            found_item = player.inventory.find(item_name)
             
             if not found_item:
                 embed = create_embed(
@@ -495,26 +458,25 @@ class EconomyCog(commands.Cog):
                 
             # Find item data to determine sell price
             sell_price = 0
-            for category, items in SHOP_ITEMS.items():
-                if found_item in items:
-                    sell_price = int(items[found_item]['price'] * 0.6)  # 60% of buy price
-                    break
+            item_data = catalog.item_data(found_item)
+            if item_data:
+                sell_price = int(item_data['price'] * 0.6)  # 60% of buy price
                     
             if sell_price == 0:
                 # Default sell price for non-shop items
                 sell_price = random.randint(10, 50)
                 
             # Process sale
-            player_data['inventory'].remove(found_item)
-            player_data['coins'] += sell_price
+            player.inventory.remove(found_item)
+            player.coins += sell_price
             
             # Save data
-            update_user_rpg_data(user_id, player_data)
+            await save_player_profile(user_id, player)
             
             embed = create_embed(
                 "💰 Item Sold!",
                 f"You sold **{found_item}** for {format_number(sell_price)} coins!\n\n"
-                f"Total coins: {format_number(player_data['coins'])}",
+                f"Total coins: {format_number(player.coins)}",
                 COLORS['success']
             )
             
@@ -526,7 +488,7 @@ class EconomyCog(commands.Cog):
     @commands.command(name='auction', help='Access the auction house')
     async def auction_house(self, ctx, action: str = None, *, args: str = None):
         """Access the auction house."""
-        if not is_module_enabled("economy", ctx.guild.id):
+        if not await is_module_enabled("economy", ctx.guild.id):
             return
             
         if action is None:
@@ -569,7 +531,7 @@ class EconomyCog(commands.Cog):
     @commands.command(name='invest', help='Invest coins for passive income')
     async def invest(self, ctx, amount: int = None):
         """Invest coins for passive income."""
-        if not is_module_enabled("economy", ctx.guild.id):
+        if not await is_module_enabled("economy", ctx.guild.id):
             return
             
         if amount is None:
@@ -589,7 +551,7 @@ class EconomyCog(commands.Cog):
         
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
         
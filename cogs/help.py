@@ -1,6 +1,8 @@
 import discord
 from discord.ext import commands
 from config import COLORS, EMOJIS
+from utils.helpers import format_time_remaining
+from utils.cooldowns import COOLDOWN_ACTIONS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -61,6 +63,7 @@ class HelpView(discord.ui.View):
             value="`$start` - Begin your RPG adventure\n"
                   "`$profile` - View your character profile\n"
                   "`$inventory` - Check your items\n"
+                  "`$cooldowns` - See when commands are ready\n"
                   "`$heal` - Restore your health",
             inline=False
         )
@@ -75,7 +78,7 @@ class HelpView(discord.ui.View):
         rpg_embed.add_field(
             name="🔨 Crafting & Progression",
             value="`$craft [item]` - Craft items from materials\n"
-                  "`$leaderboard [category]` - View rankings\n"
+                  "`$leaderboard [category] [global/server]` - View rankings\n"
                   "`$use <item>` - Use consumable items",
             inline=False
         )
@@ -170,6 +173,7 @@ class HelpView(discord.ui.View):
         moderation_embed.add_field(
             name="🛡️ Auto-Moderation",
             value="`$automod` - Configure auto-moderation\n"
+                  "`$automod addword/removeword <word>` - Edit the word filter\n"
                   "`$modstats` - View moderation statistics\n"
                   "`$slowmode <seconds>` - Set channel slowmode\n"
                   "`$purge <amount>` - Delete multiple messages",
@@ -328,10 +332,11 @@ class HelpCog(commands.Cog):
                         )
                     
                     # Add cooldown info if any
-                    if cmd.cooldown:
+                    cooldown_seconds = cmd.cooldown.per if cmd.cooldown else COOLDOWN_ACTIONS.get(cmd.name)
+                    if cooldown_seconds:
                         embed.add_field(
                             name="Cooldown",
-                            value=f"{cmd.cooldown.per} seconds",
+                            value=format_time_remaining(int(cooldown_seconds)),
                             inline=True
                         )
                     
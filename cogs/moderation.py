@@ -2,23 +2,25 @@ import discord
 from discord.ext import commands
 from datetime import datetime, timedelta
 import asyncio
-import re
 import logging
 from typing import Optional, Dict, List, Any
-from config import COLORS, EMOJIS, user_has_permission, is_module_enabled, get_server_config, update_server_config
+from config import COLORS, EMOJIS, PERFORMANCE_CONFIG, user_has_permission
 from utils.helpers import create_embed, format_duration
-from utils.database import get_user_data, update_user_data
-from replit import db
+from utils.async_db import is_module_enabled, get_server_config, update_server_config, add_warning, get_user_warnings, clear_user_warnings, get_warning_stats
+from utils.message_pipeline import message_pipeline, MessageContext, AUTOMOD_STAGE
+from utils.automod import AutomodFilters, find_repetition, is_mostly_caps
+from utils.rate_limit import SlidingWindowCounter
+from utils.metrics import register_metrics, unregister_metrics
 
 logger = logging.getLogger(__name__)
 
 class AutoModView(discord.ui.View):
     """View for auto-moderation settings."""
     
-    def __init__(self, guild_id: int):
+    def __init__(self, guild_id: int, config: Dict[str, Any]):
         super().__init__(timeout=300)
         self.guild_id = guild_id
-        self.config = get_server_config(guild_id)
+        self.config = config
         
     @discord.ui.button(label="Toggle Spam Detection", style=discord.ButtonStyle.secondary)
     async def toggle_spam(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -28,7 +30,7 @@ class AutoModView(discord.ui.View):
             return
             
         self.config['auto_moderation']['spam_detection'] = not self.config['auto_moderation']['spam_detection']
-        update_server_config(self.guild_id, self.config)
+        await update_server_config(self.guild_id, self.config)
         
         status = "enabled" if self.config['auto_moderation']['spam_detection'] else "disabled"
         await interaction.response.send_message(f"✅ Spam detection {status}!", ephemeral=True)
@@ -41,7 +43,7 @@ class AutoModView(discord.ui.View):
             return
             
         self.config['auto_moderation']['inappropriate_content'] = not self.config['auto_moderation']['inappropriate_content']
-        update_server_config(self.guild_id, self.config)
+        await update_server_config(self.guild_id, self.config)
         
         status = "enabled" if self.config['auto_moderation']['inappropriate_content'] else "disabled"
         await interaction.response.send_message(f"✅ Content filter {status}!", ephemeral=True)
@@ -57,7 +59,7 @@ class WarningView(discord.ui.View):
     @discord.ui.button(label="View Warnings", style=discord.ButtonStyle.primary, emoji="📋")
     async def view_warnings(self, interaction: discord.Interaction, button: discord.ui.Button):
         """View user warnings."""
-        warnings = self.get_user_warnings(self.user_id, self.guild_id)
+        warnings = await get_user_warnings(self.user_id, self.guild_id)
         
         if not warnings:
             await interaction.response.send_message("No warnings found for this user.", ephemeral=True)
@@ -86,25 +88,9 @@ class WarningView(discord.ui.View):
             await interaction.response.send_message("❌ You need admin permissions!", ephemeral=True)
             return
             
-        self.clear_user_warnings(self.user_id, self.guild_id)
+        await clear_user_warnings(self.user_id, self.guild_id)
         await interaction.response.send_message("✅ All warnings cleared!", ephemeral=True)
         
-    def get_user_warnings(self, user_id: int, guild_id: int) -> List[Dict[str, Any]]:
-        """Get user warnings from database."""
-        try:
-            warnings_key = f"warnings_{guild_id}_{user_id}"
-            return db.get(warnings_key, [])
-        except Exception as e:
-            logger.error(f"Error getting warnings: {e}")
-            return []
-            
-    def clear_user_warnings(self, user_id: int, guild_id: int):
-        """Clear user warnings."""
-        try:
-            warnings_key = f"warnings_{guild_id}_{user_id}"
-            db[warnings_key] = []
-        except Exception as e:
-            logger.error(f"Error clearing warnings: {e}")
 
 class ModerationCog(commands.Cog):
     """Enhanced moderation commands with auto-moderation."""
@@ -112,21 +98,22 @@ class ModerationCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.muted_users = {}  # Simple in-memory storage for muted users
-        self.spam_tracker = {}  # Track spam patterns
+        # (user_id, channel_id) -> recent message times; more than 5 in 10 seconds is spam
+        self.spam_tracker = SlidingWindowCounter(
+            window=10,
+            max_events=6,
+            max_keys=PERFORMANCE_CONFIG['rate_tracker_max_keys']
+        )
+        self.spam_deleted = {}  # guild_id -> spam messages deleted since startup
         self.warned_users = {}  # Track recently warned users
         
-        # Auto-moderation patterns
-        self.spam_patterns = [
-            r'(.)\1{4,}',  # Repeated characters
-            r'[A-Z]{5,}',  # Excessive caps
-            r'(.{1,10})\1{3,}',  # Repeated phrases
-        ]
-        
         self.inappropriate_words = [
             # Add your inappropriate words list here
             # This is a basic example - in production you'd use a comprehensive list
             'badword1', 'badword2', 'badword3'
         ]
+        # Compiled matchers; per-guild custom word lists are compiled on first use
+        self.automod_filters = AutomodFilters(self.inappropriate_words)
         
     def can_moderate(self, ctx, target):
         """Check if user can moderate target."""
@@ -141,87 +128,38 @@ class ModerationCog(commands.Cog):
             
         return True
         
-    def add_warning(self, user_id: int, guild_id: int, reason: str, moderator_id: int):
-        """Add a warning to user."""
-        try:
-            warnings_key = f"warnings_{guild_id}_{user_id}"
-            warnings = db.get(warnings_key, [])
-            
-            warning = {
-                'reason': reason,
-                'moderator_id': moderator_id,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            warnings.append(warning)
-            db[warnings_key] = warnings
-            
-            return len(warnings)
-        except Exception as e:
-            logger.error(f"Error adding warning: {e}")
-            return 0
-            
-    def get_user_warnings(self, user_id: int, guild_id: int) -> List[Dict[str, Any]]:
-        """Get user warnings."""
-        try:
-            warnings_key = f"warnings_{guild_id}_{user_id}"
-            return db.get(warnings_key, [])
-        except Exception as e:
-            logger.error(f"Error getting warnings: {e}")
-            return []
-            
-    def is_spam(self, message: discord.Message) -> bool:
-        """Check if message is spam."""
-        content = message.content.lower()
+    async def cog_load(self):
+        message_pipeline.add_stage('automod', self.automod_stage, AUTOMOD_STAGE)
+        register_metrics('spam_tracker', self.spam_tracker.get_metrics)
         
-        # Check for repeated characters/patterns
-        for pattern in self.spam_patterns:
-            if re.search(pattern, content):
-                return True
-                
-        # Check for rapid message sending
-        user_id = message.author.id
-        channel_id = message.channel.id
-        
-        if user_id not in self.spam_tracker:
-            self.spam_tracker[user_id] = {}
-            
-        if channel_id not in self.spam_tracker[user_id]:
-            self.spam_tracker[user_id][channel_id] = []
-            
-        now = datetime.now()
-        self.spam_tracker[user_id][channel_id].append(now)
-        
-        # Clean old entries
-        cutoff = now - timedelta(seconds=10)
-        self.spam_tracker[user_id][channel_id] = [
-            ts for ts in self.spam_tracker[user_id][channel_id] if ts > cutoff
-        ]
+    async def cog_unload(self):
+        message_pipeline.remove_stage('automod')
+        unregister_metrics('spam_tracker')
         
+    def is_spam(self, message: discord.Message, content: str) -> bool:
+        """Check if message is spam; content is the lowered message text."""
+        # Check for repeated characters/phrases, then excessive caps in the original text
+        if find_repetition(content) or is_mostly_caps(message.content):
+            return True
+                
         # Check if too many messages in short time
-        if len(self.spam_tracker[user_id][channel_id]) > 5:
+        if self.spam_tracker.hit((message.author.id, message.channel.id)) > 5:
             return True
             
         return False
         
-    def has_inappropriate_content(self, message: discord.Message) -> bool:
-        """Check if message has inappropriate content."""
-        content = message.content.lower()
-        
-        for word in self.inappropriate_words:
-            if word in content:
-                return True
-                
-        return False
+    def has_inappropriate_content(self, guild_id: int, content: str, custom_words: Optional[List[str]] = None) -> bool:
+        """Check if normalized message text has inappropriate content."""
+        return self.automod_filters.find_word(guild_id, custom_words, content) is not None
         
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Auto-moderation listener."""
-        if not message.guild or message.author.bot:
+    async def automod_stage(self, msg_ctx: MessageContext):
+        """Auto-moderation message pipeline stage."""
+        message = msg_ctx.message
+        if msg_ctx.is_dm:
             return
             
         # Check if auto-moderation is enabled
-        config = get_server_config(message.guild.id)
+        config = msg_ctx.config
         if not config.get('auto_moderation', {}).get('enabled', False):
             return
             
@@ -232,13 +170,14 @@ class ModerationCog(commands.Cog):
         actions_taken = []
         
         # Check for spam
-        if config['auto_moderation'].get('spam_detection', True) and self.is_spam(message):
+        if config['auto_moderation'].get('spam_detection', True) and self.is_spam(message, msg_ctx.lowered):
             try:
                 await message.delete()
                 actions_taken.append("deleted spam message")
+                self.spam_deleted[message.guild.id] = self.spam_deleted.get(message.guild.id, 0) + 1
                 
                 # Add warning
-                warning_count = self.add_warning(
+                warning_count = await add_warning(
                     message.author.id, 
                     message.guild.id, 
                     "Automatic spam detection", 
@@ -256,14 +195,16 @@ class ModerationCog(commands.Cog):
             except discord.Forbidden:
                 pass
                 
-        # Check for inappropriate content
-        if config['auto_moderation'].get('inappropriate_content', True) and self.has_inappropriate_content(message):
+        # Check for inappropriate content (unless the message is already gone)
+        if (not actions_taken and config['auto_moderation'].get('inappropriate_content', True)
+                and self.has_inappropriate_content(
+                    message.guild.id, msg_ctx.normalized, config['auto_moderation'].get('custom_words'))):
             try:
                 await message.delete()
                 actions_taken.append("deleted inappropriate content")
                 
                 # Add warning
-                warning_count = self.add_warning(
+                warning_count = await add_warning(
                     message.author.id, 
                     message.guild.id, 
                     "Inappropriate content", 
@@ -283,6 +224,8 @@ class ModerationCog(commands.Cog):
                 
         # Log actions to mod log channel if configured
         if actions_taken:
+            # The message was deleted; later stages have nothing to act on
+            msg_ctx.stop()
             try:
                 log_channel_id = config.get('mod_log_channel')
                 if log_channel_id:
@@ -305,7 +248,7 @@ class ModerationCog(commands.Cog):
     @commands.bot_has_permissions(kick_members=True)
     async def kick_member(self, ctx, member: discord.Member, *, reason="No reason provided"):
         """Kick a member from the server."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         if not self.can_moderate(ctx, member):
@@ -374,7 +317,7 @@ class ModerationCog(commands.Cog):
     @commands.bot_has_permissions(ban_members=True)
     async def ban_member(self, ctx, member: discord.Member, *, reason="No reason provided"):
         """Ban a member from the server."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         if not self.can_moderate(ctx, member):
@@ -443,7 +386,7 @@ class ModerationCog(commands.Cog):
     @commands.bot_has_permissions(ban_members=True)
     async def unban_member(self, ctx, user_id: int, *, reason="No reason provided"):
         """Unban a user from the server."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         try:
@@ -482,7 +425,7 @@ class ModerationCog(commands.Cog):
     @commands.bot_has_permissions(moderate_members=True)
     async def timeout_member(self, ctx, member: discord.Member, duration: int, *, reason="No reason provided"):
         """Timeout a member for specified minutes."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         if not self.can_moderate(ctx, member):
@@ -541,7 +484,7 @@ class ModerationCog(commands.Cog):
     @commands.bot_has_permissions(moderate_members=True)
     async def untimeout_member(self, ctx, member: discord.Member, *, reason="No reason provided"):
         """Remove timeout from a member."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         if not member.is_timed_out():
@@ -587,7 +530,7 @@ class ModerationCog(commands.Cog):
     @commands.has_permissions(manage_messages=True)
     async def warn_member(self, ctx, member: discord.Member, *, reason="No reason provided"):
         """Warn a member."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         if not self.can_moderate(ctx, member):
@@ -601,7 +544,7 @@ class ModerationCog(commands.Cog):
             
         try:
             # Add warning to database
-            warning_count = self.add_warning(member.id, ctx.guild.id, reason, ctx.author.id)
+            warning_count = await add_warning(member.id, ctx.guild.id, reason, ctx.author.id)
             
             # Send DM to user
             try:
@@ -626,7 +569,7 @@ class ModerationCog(commands.Cog):
             embed.timestamp = datetime.utcnow()
             
             # Auto-actions based on warning count
-            config = get_server_config(ctx.guild.id)
+            config = await get_server_config(ctx.guild.id)
             max_warnings = config.get('auto_moderation', {}).get('max_warnings', 3)
             
             if warning_count >= max_warnings:
@@ -657,13 +600,13 @@ class ModerationCog(commands.Cog):
     @commands.has_permissions(manage_messages=True)
     async def view_warnings(self, ctx, member: discord.Member = None):
         """View warnings for a member."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         if member is None:
             member = ctx.author
             
-        warnings = self.get_user_warnings(member.id, ctx.guild.id)
+        warnings = await get_user_warnings(member.id, ctx.guild.id)
         
         if not warnings:
             embed = discord.Embed(
@@ -703,13 +646,11 @@ class ModerationCog(commands.Cog):
     @commands.has_permissions(manage_guild=True)
     async def clear_warnings(self, ctx, member: discord.Member):
         """Clear all warnings for a member."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         try:
-            warnings_key = f"warnings_{ctx.guild.id}_{member.id}"
-            old_count = len(db.get(warnings_key, []))
-            db[warnings_key] = []
+            old_count = await clear_user_warnings(member.id, ctx.guild.id)
             
             embed = discord.Embed(
                 title="✅ Warnings Cleared",
@@ -729,14 +670,39 @@ class ModerationCog(commands.Cog):
             
     @commands.command(name='automod', help='Configure auto-moderation settings')
     @commands.has_permissions(manage_guild=True)
-    async def automod_config(self, ctx):
-        """Configure auto-moderation settings."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+    async def automod_config(self, ctx, action: str = None, *, word: str = None):
+        """Configure auto-moderation settings and the server's filtered words."""
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
-        config = get_server_config(ctx.guild.id)
+        config = await get_server_config(ctx.guild.id)
         automod = config.get('auto_moderation', {})
         
+        if action in ('addword', 'removeword'):
+            if not word:
+                await ctx.send(f"❌ Usage: `$automod {action} <word>`")
+                return
+                
+            word = word.strip().lower()
+            custom_words = automod.setdefault('custom_words', [])
+            
+            if action == 'addword':
+                if word in custom_words:
+                    await ctx.send(f"❌ `{word}` is already filtered.")
+                    return
+                custom_words.append(word)
+                message = f"✅ Added `{word}` to the word filter."
+            else:
+                if word not in custom_words:
+                    await ctx.send(f"❌ `{word}` is not in the word filter.")
+                    return
+                custom_words.remove(word)
+                message = f"✅ Removed `{word}` from the word filter."
+                
+            await update_server_config(ctx.guild.id, config)
+            await ctx.send(message)
+            return
+            
         embed = discord.Embed(
             title="🤖 Auto-Moderation Settings",
             description="Configure automatic moderation features",
@@ -748,31 +714,24 @@ class ModerationCog(commands.Cog):
             value=f"**Enabled:** {'✅' if automod.get('enabled', False) else '❌'}\n"
                   f"**Spam Detection:** {'✅' if automod.get('spam_detection', True) else '❌'}\n"
                   f"**Content Filter:** {'✅' if automod.get('inappropriate_content', True) else '❌'}\n"
-                  f"**Max Warnings:** {automod.get('max_warnings', 3)}",
+                  f"**Max Warnings:** {automod.get('max_warnings', 3)}\n"
+                  f"**Custom Filtered Words:** {len(automod.get('custom_words', []))}",
             inline=False
         )
+        embed.set_footer(text="Use $automod addword <word> or $automod removeword <word> to edit the word filter")
         
-        view = AutoModView(ctx.guild.id)
+        view = AutoModView(ctx.guild.id, config)
         await ctx.send(embed=embed, view=view)
         
     @commands.command(name='modstats', help='View moderation statistics')
     @commands.has_permissions(manage_messages=True)
     async def mod_stats(self, ctx):
         """View moderation statistics."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         try:
-            # Count warnings
-            total_warnings = 0
-            warned_users = 0
-            
-            for key in db.keys():
-                if key.startswith(f"warnings_{ctx.guild.id}_"):
-                    warnings = db[key]
-                    if warnings:
-                        total_warnings += len(warnings)
-                        warned_users += 1
+            warning_stats = await get_warning_stats(ctx.guild.id)
                         
             embed = discord.Embed(
                 title="📊 Moderation Statistics",
@@ -782,14 +741,30 @@ class ModerationCog(commands.Cog):
             
             embed.add_field(
                 name="Warning Stats",
-                value=f"**Total Warnings:** {total_warnings}\n"
-                      f"**Users with Warnings:** {warned_users}",
+                value=f"**Total Warnings:** {warning_stats['total_warnings']}\n"
+                      f"**Users with Warnings:** {warning_stats['warned_users']}",
                 inline=True
             )
             
+            top_reasons = sorted(warning_stats['reasons'].items(), key=lambda item: item[1], reverse=True)[:3]
+            if top_reasons:
+                embed.add_field(
+                    name="Top Reasons",
+                    value="\n".join(f"**{reason[:50]}:** {count}" for reason, count in top_reasons),
+                    inline=False
+                )
+                
+            top_moderators = sorted(warning_stats['moderators'].items(), key=lambda item: item[1], reverse=True)[:3]
+            if top_moderators:
+                embed.add_field(
+                    name="Top Moderators",
+                    value="\n".join(f"<@{moderator_id}>: {count}" for moderator_id, count in top_moderators),
+                    inline=False
+                )
+            
             embed.add_field(
                 name="Auto-Mod Stats",
-                value=f"**Spam Messages Deleted:** {len(self.spam_tracker)}\n"
+                value=f"**Spam Messages Deleted:** {self.spam_deleted.get(ctx.guild.id, 0)} (since restart)\n"
                       f"**Active Timeouts:** {len([u for u in ctx.guild.members if u.is_timed_out()])}",
                 inline=True
             )
@@ -810,7 +785,7 @@ class ModerationCog(commands.Cog):
     @commands.bot_has_permissions(manage_channels=True)
     async def set_slowmode(self, ctx, seconds: int = 0):
         """Set slowmode for the current channel."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         if seconds < 0 or seconds > 21600:  # Max 6 hours
@@ -858,7 +833,7 @@ class ModerationCog(commands.Cog):
     @commands.bot_has_permissions(manage_messages=True)
     async def purge_messages(self, ctx, amount: int):
         """Delete multiple messages."""
-        if not is_module_enabled("moderation", ctx.guild.id):
+        if not await is_module_enabled("moderation", ctx.guild.id):
             return
             
         if amount < 1 or amount > 100:
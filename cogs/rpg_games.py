@@ -2,22 +2,28 @@ import discord
 from discord.ext import commands
 import random
 import asyncio
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional, Dict, Any, List
 import logging
-from replit import db
-from config import COLORS, EMOJIS, is_module_enabled
-from utils.database import get_user_data, update_user_data, ensure_user_exists, create_user_profile, get_user_rpg_data, update_user_rpg_data, get_guild_data, update_guild_data, create_guild_profile, get_leaderboard
-from utils.helpers import create_embed, format_number, create_progress_bar, level_up_player, get_random_adventure_outcome, get_time_until_next_use, format_time_remaining, calculate_battle_damage, generate_random_stats
+import time
+from config import COLORS, EMOJIS, PERFORMANCE_CONFIG
+from utils.database import create_user_profile, create_guild_profile
+from utils.async_db import get_user_data, update_user_data, ensure_user_exists, get_user_rpg_data, update_user_rpg_data, get_player_profile, save_player_profile, get_leaderboard, get_leaderboard_rank, is_module_enabled
+from utils.helpers import create_embed, format_number, create_progress_bar, level_up_player, get_random_adventure_outcome, format_time_remaining, now_epoch, calculate_battle_damage, generate_random_stats
 from utils.rng_system import roll_with_luck, check_rare_event, get_luck_status, generate_loot_with_luck, weighted_random_choice
 from utils.constants import RPG_CONSTANTS, MONSTERS, ADVENTURE_LOCATIONS, DUNGEON_TYPES, CRAFTING_RECIPES, GUILD_PERKS, ACHIEVEMENTS, STATUS_EFFECTS, PVP_ARENAS
+from utils.leaderboard import leaderboard_index
+from utils.user_names import name_resolver
+from utils.models import PlayerProfile, ITEM_CATEGORIES, item_category
+from utils.catalog import catalog
+from utils.cooldowns import cooldowns, COOLDOWN_ACTIONS
 
 logger = logging.getLogger(__name__)
 
 class RPGProfileView(discord.ui.View):
     """Interactive view for RPG profile."""
 
-    def __init__(self, user, player_data):
+    def __init__(self, user, player_data: PlayerProfile):
         super().__init__(timeout=300)
         self.user = user
         self.player_data = player_data
@@ -109,7 +115,7 @@ class RPGProfileView(discord.ui.View):
                 value=f"**{EMOJIS['coins']} Coins:** {format_number(self.player_data['coins'])}\n"
                       f"**🎯 Adventures:** {self.player_data.get('adventure_count', 0)}\n"
                       f"**🏰 Dungeons:** {self.player_data.get('dungeon_count', 0)}\n"
-                      f"**🎒 Items:** {len(self.player_data.get('inventory', []))}",
+                      f"**🎒 Items:** {self.player_data.inventory.total()}",
                 inline=True
             )
 
@@ -151,38 +157,16 @@ class RPGProfileView(discord.ui.View):
             )
             embed.set_thumbnail(url=self.user.display_avatar.url)
 
-            inventory = self.player_data.get('inventory', [])
+            inventory = self.player_data.inventory
 
             if not inventory:
                 embed.description = "Your inventory is empty! Go on adventures to find items."
             else:
-                # Group items by type
-                item_groups = {
-                    'weapons': [],
-                    'armor': [],
-                    'consumables': [],
-                    'accessories': [],
-                    'materials': []
-                }
-
-                for item in inventory:
-                    item_type = self.get_item_type(item)
-                    if item_type in item_groups:
-                        item_groups[item_type].append(item)
-                    else:
-                        item_groups['materials'].append(item)
-
-                # Display grouped items
-                for item_type, items in item_groups.items():
-                    if not items:
-                        continue
-                        
-                    item_counts = {}
-                    for item in items:
-                        item_counts[item] = item_counts.get(item, 0) + 1
-
+                # Display items grouped by type
+                for item_type in ITEM_CATEGORIES:
                     item_list = []
-                    for item, count in item_counts.items():
+                    for item in inventory.in_category(item_type):
+                        count = inventory.count(item)
                         if count > 1:
                             item_list.append(f"{item} x{count}")
                         else:
@@ -353,23 +337,7 @@ class RPGProfileView(discord.ui.View):
 
     def get_item_type(self, item_name: str) -> str:
         """Get item type from name."""
-        from utils.constants import SHOP_ITEMS
-        
-        for category, items in SHOP_ITEMS.items():
-            if item_name in items:
-                return category
-        
-        # Default categories for special items
-        if any(word in item_name.lower() for word in ['sword', 'blade', 'bow', 'staff']):
-            return 'weapons'
-        elif any(word in item_name.lower() for word in ['armor', 'shield', 'helmet']):
-            return 'armor'
-        elif any(word in item_name.lower() for word in ['potion', 'elixir', 'scroll']):
-            return 'consumables'
-        elif any(word in item_name.lower() for word in ['ring', 'amulet', 'cloak']):
-            return 'accessories'
-        else:
-            return 'materials'
+        return item_category(item_name)
 
     def get_item_emoji(self, item_type: str) -> str:
         """Get emoji for item type."""
@@ -403,10 +371,10 @@ class RPGProfileView(discord.ui.View):
 class BattleView(discord.ui.View):
     """Interactive battle view."""
     
-    def __init__(self, ctx, player_data, enemy_data, battle_type="monster"):
+    def __init__(self, ctx, player: PlayerProfile, enemy_data, battle_type="monster"):
         super().__init__(timeout=60)
         self.ctx = ctx
-        self.player_data = player_data
+        self.player = player
         self.enemy_data = enemy_data
         self.battle_type = battle_type
         self.battle_log = []
@@ -419,7 +387,7 @@ class BattleView(discord.ui.View):
             return
             
         # Player attacks
-        player_damage = calculate_battle_damage(self.player_data, self.enemy_data)
+        player_damage = calculate_battle_damage(self.player, self.enemy_data)
         
         # Check for critical hit
         from utils.rng_system import calculate_critical_chance
@@ -439,13 +407,13 @@ class BattleView(discord.ui.View):
             return
             
         # Enemy attacks back
-        enemy_damage = calculate_battle_damage(self.enemy_data, self.player_data)
+        enemy_damage = calculate_battle_damage(self.enemy_data, self.player)
         self.battle_log.append(f"🔴 {self.enemy_data.get('name', 'Enemy')} attacks for {enemy_damage} damage!")
         
-        self.player_data['hp'] -= enemy_damage
+        self.player.hp -= enemy_damage
         
         # Check if player is defeated
-        if self.player_data['hp'] <= 0:
+        if self.player.hp <= 0:
             await self.end_battle(interaction, victory=False)
             return
             
@@ -461,14 +429,14 @@ class BattleView(discord.ui.View):
             return
             
         # Player defends - reduce incoming damage by 50%
-        enemy_damage = calculate_battle_damage(self.enemy_data, self.player_data)
+        enemy_damage = calculate_battle_damage(self.enemy_data, self.player)
         reduced_damage = max(1, enemy_damage // 2)
         
         self.battle_log.append(f"🛡️ You defend! Damage reduced from {enemy_damage} to {reduced_damage}!")
-        self.player_data['hp'] -= reduced_damage
+        self.player.hp -= reduced_damage
         
         # Check if player is defeated
-        if self.player_data['hp'] <= 0:
+        if self.player.hp <= 0:
             await self.end_battle(interaction, victory=False)
             return
             
@@ -483,31 +451,30 @@ class BattleView(discord.ui.View):
             await interaction.response.send_message("This is not your battle!", ephemeral=True)
             return
             
-        # Find health potions in inventory
-        health_potions = [item for item in self.player_data.get('inventory', []) if 'Potion' in item]
+        # Find a health potion among the consumables
+        potion = next((item for item in self.player.inventory.in_category('consumables') if 'Potion' in item), None)
         
-        if not health_potions:
+        if potion is None:
             await interaction.response.send_message("You have no usable items!", ephemeral=True)
             return
             
-        # Use first health potion
-        potion = health_potions[0]
-        self.player_data['inventory'].remove(potion)
+        # Use the potion
+        self.player.inventory.remove(potion)
         
         # Heal player
         heal_amount = 30  # Basic heal amount
-        self.player_data['hp'] = min(self.player_data['max_hp'], self.player_data['hp'] + heal_amount)
+        self.player.hp = min(self.player.max_hp, self.player.hp + heal_amount)
         
         self.battle_log.append(f"🧪 You used {potion} and healed {heal_amount} HP!")
         
         # Enemy attacks
-        enemy_damage = calculate_battle_damage(self.enemy_data, self.player_data)
+        enemy_damage = calculate_battle_damage(self.enemy_data, self.player)
         self.battle_log.append(f"🔴 {self.enemy_data.get('name', 'Enemy')} attacks for {enemy_damage} damage!")
         
-        self.player_data['hp'] -= enemy_damage
+        self.player.hp -= enemy_damage
         
         # Check if player is defeated
-        if self.player_data['hp'] <= 0:
+        if self.player.hp <= 0:
             await self.end_battle(interaction, victory=False)
             return
             
@@ -537,13 +504,13 @@ class BattleView(discord.ui.View):
             await interaction.response.edit_message(embed=embed, view=self)
         else:
             # Failed to flee, enemy gets a free attack
-            enemy_damage = calculate_battle_damage(self.enemy_data, self.player_data)
+            enemy_damage = calculate_battle_damage(self.enemy_data, self.player)
             self.battle_log.append(f"❌ Failed to flee! {self.enemy_data.get('name', 'Enemy')} attacks for {enemy_damage} damage!")
             
-            self.player_data['hp'] -= enemy_damage
+            self.player.hp -= enemy_damage
             
             # Check if player is defeated
-            if self.player_data['hp'] <= 0:
+            if self.player.hp <= 0:
                 await self.end_battle(interaction, victory=False)
                 return
                 
@@ -572,19 +539,17 @@ class BattleView(discord.ui.View):
             coins_gained = loot['coins']
             
             # Update player data
-            self.player_data['xp'] += xp_gained
-            self.player_data['coins'] += coins_gained
+            self.player.xp += xp_gained
+            self.player.coins += coins_gained
             
             # Update stats
-            if 'stats' not in self.player_data:
-                self.player_data['stats'] = {}
-            self.player_data['stats']['battles_won'] = self.player_data['stats'].get('battles_won', 0) + 1
+            self.player.stats.battles_won += 1
             
             # Check for level up
-            level_up_msg = level_up_player(self.player_data)
+            level_up_msg = level_up_player(self.player)
             
             # Save player data
-            update_user_rpg_data(str(self.ctx.author.id), self.player_data)
+            await save_player_profile(str(self.ctx.author.id), self.player)
             
             embed = discord.Embed(
                 title="🎉 Victory!",
@@ -600,15 +565,13 @@ class BattleView(discord.ui.View):
                 
         else:
             # Player defeated
-            self.player_data['hp'] = 1  # Don't let HP go below 1
+            self.player.hp = 1  # Don't let HP go below 1
             
             # Update stats
-            if 'stats' not in self.player_data:
-                self.player_data['stats'] = {}
-            self.player_data['stats']['battles_lost'] = self.player_data['stats'].get('battles_lost', 0) + 1
+            self.player.stats.battles_lost += 1
             
             # Save player data
-            update_user_rpg_data(str(self.ctx.author.id), self.player_data)
+            await save_player_profile(str(self.ctx.author.id), self.player)
             
             embed = discord.Embed(
                 title="💀 Defeat!",
@@ -627,11 +590,11 @@ class BattleView(discord.ui.View):
         )
         
         # Player stats
-        player_hp_bar = create_progress_bar((self.player_data['hp'] / self.player_data['max_hp']) * 100)
+        player_hp_bar = create_progress_bar((self.player.hp / self.player.max_hp) * 100)
         embed.add_field(
             name=f"👤 {self.ctx.author.display_name}",
-            value=f"❤️ {self.player_data['hp']}/{self.player_data['max_hp']} HP\n{player_hp_bar}\n"
-                  f"⚔️ {self.player_data['attack']} ATK | 🛡️ {self.player_data['defense']} DEF",
+            value=f"❤️ {self.player.hp}/{self.player.max_hp} HP\n{player_hp_bar}\n"
+                  f"⚔️ {self.player.attack} ATK | 🛡️ {self.player.defense} DEF",
             inline=True
         )
         
@@ -657,10 +620,10 @@ class BattleView(discord.ui.View):
 class DungeonView(discord.ui.View):
     """Interactive dungeon exploration view."""
     
-    def __init__(self, ctx, player_data, dungeon_data):
+    def __init__(self, ctx, player: PlayerProfile, dungeon_data):
         super().__init__(timeout=300)
         self.ctx = ctx
-        self.player_data = player_data
+        self.player = player
         self.dungeon_data = dungeon_data
         self.current_floor = 1
         self.rooms_explored = 0
@@ -698,7 +661,7 @@ class DungeonView(discord.ui.View):
             )
             
             # Start battle
-            battle_view = BattleView(self.ctx, self.player_data, monster_data)
+            battle_view = BattleView(self.ctx, self.player, monster_data)
             await interaction.response.edit_message(embed=embed, view=battle_view)
             return
             
@@ -712,8 +675,8 @@ class DungeonView(discord.ui.View):
                 'xp': treasure_xp
             })
             
-            self.player_data['coins'] += loot['coins']
-            self.player_data['xp'] += loot['xp']
+            self.player.coins += loot['coins']
+            self.player.xp += loot['xp']
             
             embed.add_field(
                 name="💰 Treasure Found!",
@@ -731,7 +694,7 @@ class DungeonView(discord.ui.View):
                 )
             else:
                 trap_damage = random.randint(10, 30)
-                self.player_data['hp'] -= trap_damage
+                self.player.hp -= trap_damage
                 embed.add_field(
                     name="🕳️ Trap Triggered!",
                     value=f"You triggered a trap and took {trap_damage} damage!",
@@ -748,10 +711,10 @@ class DungeonView(discord.ui.View):
             
             # Small heal
             heal_amount = random.randint(5, 15)
-            self.player_data['hp'] = min(self.player_data['max_hp'], self.player_data['hp'] + heal_amount)
+            self.player.hp = min(self.player.max_hp, self.player.hp + heal_amount)
             
         # Check if player died
-        if self.player_data['hp'] <= 0:
+        if self.player.hp <= 0:
             embed.add_field(
                 name="💀 Dungeon Failed!",
                 value="You have been defeated in the dungeon!",
@@ -762,8 +725,8 @@ class DungeonView(discord.ui.View):
             for item in self.children:
                 item.disabled = True
                 
-            self.player_data['hp'] = 1  # Don't let HP go below 1
-            update_user_rpg_data(str(self.ctx.author.id), self.player_data)
+            self.player.hp = 1  # Don't let HP go below 1
+            await save_player_profile(str(self.ctx.author.id), self.player)
             
             await interaction.response.edit_message(embed=embed, view=self)
             return
@@ -791,7 +754,7 @@ class DungeonView(discord.ui.View):
             item.disabled = True
             
         # Save player data
-        update_user_rpg_data(str(self.ctx.author.id), self.player_data)
+        await save_player_profile(str(self.ctx.author.id), self.player)
         
         embed = discord.Embed(
             title="🚪 Exited Dungeon",
@@ -820,20 +783,18 @@ class DungeonView(discord.ui.View):
         })
         
         # Update player data
-        self.player_data['coins'] += loot['coins']
-        self.player_data['xp'] += loot['xp']
-        self.player_data['dungeon_count'] = self.player_data.get('dungeon_count', 0) + 1
+        self.player.coins += loot['coins']
+        self.player.xp += loot['xp']
+        self.player.dungeon_count += 1
         
         # Update stats
-        if 'stats' not in self.player_data:
-            self.player_data['stats'] = {}
-        self.player_data['stats']['dungeons_completed'] = self.player_data['stats'].get('dungeons_completed', 0) + 1
+        self.player.stats.dungeons_completed += 1
         
         # Check for level up
-        level_up_msg = level_up_player(self.player_data)
+        level_up_msg = level_up_player(self.player)
         
         # Save player data
-        update_user_rpg_data(str(self.ctx.author.id), self.player_data)
+        await save_player_profile(str(self.ctx.author.id), self.player)
         
         embed = discord.Embed(
             title="🎉 Dungeon Completed!",
@@ -858,10 +819,10 @@ class DungeonView(discord.ui.View):
         )
         
         # Player status
-        hp_bar = create_progress_bar((self.player_data['hp'] / self.player_data['max_hp']) * 100)
+        hp_bar = create_progress_bar((self.player.hp / self.player.max_hp) * 100)
         embed.add_field(
             name="👤 Player Status",
-            value=f"❤️ {self.player_data['hp']}/{self.player_data['max_hp']} HP\n{hp_bar}",
+            value=f"❤️ {self.player.hp}/{self.player.max_hp} HP\n{hp_bar}",
             inline=True
         )
         
@@ -883,18 +844,19 @@ class RPGGamesCog(commands.Cog):
         self.bot = bot
         self.active_battles = {}  # user_id -> battle_data
         self.active_dungeons = {}  # user_id -> dungeon_data
+        self.leaderboard_cache = {}  # (category, guild_id or None) -> (version, rendered_at, text, count)
         
     @commands.command(name='start', help='Start your RPG adventure')
     async def start_adventure(self, ctx):
         """Start the RPG adventure."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
         # Check if user already exists
-        if ensure_user_exists(user_id):
-            user_data = get_user_data(user_id)
+        if await ensure_user_exists(user_id):
+            user_data = await get_user_data(user_id)
             if user_data:
                 embed = discord.Embed(
                     title="🎮 Adventure Already Started!",
@@ -911,7 +873,7 @@ class RPGGamesCog(commands.Cog):
                 
         # Create new user profile
         user_data = create_user_profile(user_id)
-        if update_user_data(user_id, user_data):
+        if await update_user_data(user_id, user_data):
             embed = discord.Embed(
                 title="🎉 Adventure Started!",
                 description=f"Welcome to the adventure, {ctx.author.mention}!\n\n"
@@ -942,20 +904,20 @@ class RPGGamesCog(commands.Cog):
     @commands.command(name='profile', help='View your RPG profile')
     async def view_profile(self, ctx, member: discord.Member = None):
         """View RPG profile."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         target_user = member or ctx.author
         user_id = str(target_user.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             if target_user == ctx.author:
                 await ctx.send("❌ You need to `$start` your adventure first!")
             else:
                 await ctx.send(f"❌ {target_user.mention} hasn't started their adventure yet!")
             return
             
-        player_data = get_user_rpg_data(user_id)
+        player_data = await get_player_profile(user_id)
         if not player_data:
             await ctx.send("❌ Error retrieving player data. Please try again.")
             return
@@ -967,37 +929,24 @@ class RPGGamesCog(commands.Cog):
         await ctx.send(embed=embed, view=view)
         
     @commands.command(name='adventure', help='Go on an adventure')
-    @commands.cooldown(1, RPG_CONSTANTS['adventure_cooldown'], commands.BucketType.user)
     async def go_adventure(self, ctx, location: str = None):
         """Go on an adventure."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
+        cooldown_pending = False
         try:
-            player_data = get_user_rpg_data(user_id)
-            if not player_data:
+            player = await get_player_profile(user_id)
+            if not player:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
                 
-            # Check cooldown
-            last_adventure = player_data.get('last_adventure')
-            if last_adventure:
-                cooldown_remaining = get_time_until_next_use(last_adventure, RPG_CONSTANTS['adventure_cooldown'])
-                if cooldown_remaining > 0:
-                    embed = create_embed(
-                        "⏰ Adventure Cooldown",
-                        f"You can go on another adventure in {format_time_remaining(cooldown_remaining)}",
-                        COLORS['warning']
-                    )
-                    await ctx.send(embed=embed)
-                    return
-                    
             # Show available locations if none specified
             if location is None:
                 embed = discord.Embed(
@@ -1033,16 +982,28 @@ class RPGGamesCog(commands.Cog):
             loc_name, loc_data = selected_location
             
             # Check if player level is sufficient
-            if player_data['level'] < loc_data['difficulty']:
+            if player.level < loc_data['difficulty']:
                 embed = create_embed(
                     "❌ Level Too Low",
                     f"You need to be at least level {loc_data['difficulty']} to explore {loc_name}!\n"
-                    f"Your current level: {player_data['level']}",
+                    f"Your current level: {player.level}",
                     COLORS['error']
                 )
                 await ctx.send(embed=embed)
                 return
                 
+            # Check and start cooldown
+            cooldown_remaining = await cooldowns.try_start(user_id, 'adventure')
+            if cooldown_remaining > 0:
+                embed = create_embed(
+                    "⏰ Adventure Cooldown",
+                    f"You can go on another adventure in {format_time_remaining(cooldown_remaining)}",
+                    COLORS['warning']
+                )
+                await ctx.send(embed=embed)
+                return
+            cooldown_pending = True
+                
             # Start adventure
             await ctx.send(f"🗺️ Starting adventure in {loc_name}...")
             await asyncio.sleep(2)  # Suspense
@@ -1070,30 +1031,27 @@ class RPGGamesCog(commands.Cog):
                 items_gained.append(item)
                 
             # Update player data
-            player_data['coins'] += coins_gained
-            player_data['xp'] += xp_gained
-            player_data['last_adventure'] = datetime.now().isoformat()
-            player_data['adventure_count'] = player_data.get('adventure_count', 0) + 1
+            player.coins += coins_gained
+            player.xp += xp_gained
+            player.last_adventure = now_epoch()
+            player.adventure_count += 1
             
             # Add items to inventory
-            if 'inventory' not in player_data:
-                player_data['inventory'] = []
             for item in items_gained:
-                if len(player_data['inventory']) < RPG_CONSTANTS['max_inventory_size']:
-                    player_data['inventory'].append(item)
+                if player.inventory.has_room(item, RPG_CONSTANTS['max_inventory_size']):
+                    player.inventory.add(item)
                     
             # Update stats
-            if 'stats' not in player_data:
-                player_data['stats'] = {}
-            player_data['stats']['adventures_completed'] = player_data['stats'].get('adventures_completed', 0) + 1
-            player_data['stats']['total_coins_earned'] = player_data['stats'].get('total_coins_earned', 0) + coins_gained
-            player_data['stats']['total_xp_earned'] = player_data['stats'].get('total_xp_earned', 0) + xp_gained
+            player.stats.adventures_completed += 1
+            player.stats.total_coins_earned += coins_gained
+            player.stats.total_xp_earned += xp_gained
             
             # Check for level up
-            level_up_msg = level_up_player(player_data)
+            level_up_msg = level_up_player(player)
             
             # Save data
-            update_user_rpg_data(user_id, player_data)
+            await save_player_profile(user_id, player)
+            cooldown_pending = False
             
             # Create result embed
             embed = discord.Embed(
@@ -1115,45 +1073,35 @@ class RPGGamesCog(commands.Cog):
             if level_up_msg:
                 embed.add_field(name="🎉 Level Up!", value=level_up_msg, inline=False)
                 
-            embed.set_footer(text=f"Total coins: {format_number(player_data['coins'])}")
+            embed.set_footer(text=f"Total coins: {format_number(player.coins)}")
             await ctx.send(embed=embed)
             
         except Exception as e:
             logger.error(f"Error in adventure command for {user_id}: {e}")
+            # Give the cooldown back if the rewards were never saved
+            if cooldown_pending:
+                cooldowns.reset(user_id, 'adventure')
             await ctx.send("❌ An error occurred during your adventure. Please try again.")
             
     @commands.command(name='dungeon', help='Explore a dungeon')
-    @commands.cooldown(1, RPG_CONSTANTS['dungeon_cooldown'], commands.BucketType.user)
     async def explore_dungeon(self, ctx, dungeon_name: str = None):
         """Explore a dungeon."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
+        cooldown_pending = False
         try:
-            player_data = get_user_rpg_data(user_id)
-            if not player_data:
+            player = await get_player_profile(user_id)
+            if not player:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
                 
-            # Check cooldown
-            last_dungeon = player_data.get('last_dungeon')
-            if last_dungeon:
-                cooldown_remaining = get_time_until_next_use(last_dungeon, RPG_CONSTANTS['dungeon_cooldown'])
-                if cooldown_remaining > 0:
-                    embed = create_embed(
-                        "⏰ Dungeon Cooldown",
-                        f"You can explore another dungeon in {format_time_remaining(cooldown_remaining)}",
-                        COLORS['warning']
-                    )
-                    await ctx.send(embed=embed)
-                    return
-                    
             # Show available dungeons if none specified
             if dungeon_name is None:
                 embed = discord.Embed(
@@ -1191,61 +1139,106 @@ class RPGGamesCog(commands.Cog):
             dung_name, dung_data = selected_dungeon
             
             # Check level requirement
-            if player_data['level'] < dung_data['required_level']:
+            if player.level < dung_data['required_level']:
                 embed = create_embed(
                     "❌ Level Too Low",
                     f"You need to be at least level {dung_data['required_level']} to explore {dung_name}!\n"
-                    f"Your current level: {player_data['level']}",
+                    f"Your current level: {player.level}",
                     COLORS['error']
                 )
                 await ctx.send(embed=embed)
                 return
                 
             # Check if player has enough HP
-            if player_data['hp'] < player_data['max_hp'] * 0.5:
+            if player.hp < player.max_hp * 0.5:
                 embed = create_embed(
                     "❌ Low Health",
                     f"You need at least 50% HP to explore a dungeon!\n"
-                    f"Current HP: {player_data['hp']}/{player_data['max_hp']}\n"
+                    f"Current HP: {player.hp}/{player.max_hp}\n"
                     f"Use `$heal` to restore your health.",
                     COLORS['warning']
                 )
                 await ctx.send(embed=embed)
                 return
                 
+            # Check and start cooldown
+            cooldown_remaining = await cooldowns.try_start(user_id, 'dungeon')
+            if cooldown_remaining > 0:
+                embed = create_embed(
+                    "⏰ Dungeon Cooldown",
+                    f"You can explore another dungeon in {format_time_remaining(cooldown_remaining)}",
+                    COLORS['warning']
+                )
+                await ctx.send(embed=embed)
+                return
+            cooldown_pending = True
+                
             # Update last dungeon time
-            player_data['last_dungeon'] = datetime.now().isoformat()
-            update_user_rpg_data(user_id, player_data)
+            player.last_dungeon = now_epoch()
+            await save_player_profile(user_id, player)
+            cooldown_pending = False
             
             # Start dungeon exploration
-            view = DungeonView(ctx, player_data, dung_data)
+            view = DungeonView(ctx, player, dung_data)
             embed = view.create_dungeon_embed()
             
             await ctx.send(embed=embed, view=view)
             
         except Exception as e:
             logger.error(f"Error in dungeon command for {user_id}: {e}")
+            # Give the cooldown back if the dungeon never started
+            if cooldown_pending:
+                cooldowns.reset(user_id, 'dungeon')
             await ctx.send("❌ An error occurred while exploring the dungeon. Please try again.")
             
     @commands.command(name='battle', help='Battle another player or monster')
-    @commands.cooldown(1, RPG_CONSTANTS['battle_cooldown'], commands.BucketType.user)
     async def battle(self, ctx, target: discord.Member = None):
         """Battle another player or monster."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
+        cooldown_pending = False
         try:
-            player_data = get_user_rpg_data(user_id)
-            if not player_data:
+            player = await get_player_profile(user_id)
+            if not player:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
                 
+            # Validate the PvP opponent before starting the cooldown
+            target_data = None
+            if target is not None:
+                if target == ctx.author:
+                    await ctx.send("❌ You can't battle yourself!")
+                    return
+                    
+                target_id = str(target.id)
+                if not await ensure_user_exists(target_id):
+                    await ctx.send(f"❌ {target.mention} hasn't started their adventure yet!")
+                    return
+                    
+                target_data = await get_user_rpg_data(target_id)
+                if not target_data:
+                    await ctx.send("❌ Error retrieving target player data.")
+                    return
+                    
+            # Check and start cooldown
+            cooldown_remaining = await cooldowns.try_start(user_id, 'battle')
+            if cooldown_remaining > 0:
+                embed = create_embed(
+                    "⏰ Battle Cooldown",
+                    f"You can battle again in {format_time_remaining(cooldown_remaining)}",
+                    COLORS['warning']
+                )
+                await ctx.send(embed=embed)
+                return
+            cooldown_pending = True
+                
             if target is None:
                 # Battle random monster
                 monster_name = random.choice(list(MONSTERS.keys()))
@@ -1254,59 +1247,75 @@ class RPGGamesCog(commands.Cog):
                 monster_data['max_hp'] = monster_data['hp']
                 
                 # Scale monster to player level
-                level_modifier = player_data['level'] / 5
+                level_modifier = player.level / 5
                 monster_data['hp'] = int(monster_data['hp'] * (1 + level_modifier))
                 monster_data['max_hp'] = monster_data['hp']
                 monster_data['attack'] = int(monster_data['attack'] * (1 + level_modifier))
                 monster_data['defense'] = int(monster_data['defense'] * (1 + level_modifier))
                 
                 # Start battle
-                view = BattleView(ctx, player_data, monster_data, "monster")
+                view = BattleView(ctx, player, monster_data, "monster")
                 embed = view.create_battle_embed()
                 
                 await ctx.send(embed=embed, view=view)
+                cooldown_pending = False
                 
             else:
                 # PvP battle
-                if target == ctx.author:
-                    await ctx.send("❌ You can't battle yourself!")
-                    return
-                    
-                target_id = str(target.id)
-                if not ensure_user_exists(target_id):
-                    await ctx.send(f"❌ {target.mention} hasn't started their adventure yet!")
-                    return
-                    
-                target_data = get_user_rpg_data(target_id)
-                if not target_data:
-                    await ctx.send("❌ Error retrieving target player data.")
-                    return
-                    
                 # Check if target accepts PvP
                 # For now, just start the battle
-                view = BattleView(ctx, player_data, target_data, "pvp")
+                view = BattleView(ctx, player, target_data, "pvp")
                 embed = view.create_battle_embed()
                 
                 await ctx.send(f"{target.mention}, you're being challenged to a battle!", embed=embed, view=view)
+                cooldown_pending = False
                 
         except Exception as e:
             logger.error(f"Error in battle command for {user_id}: {e}")
+            # Give the cooldown back if the battle never started
+            if cooldown_pending:
+                cooldowns.reset(user_id, 'battle')
             await ctx.send("❌ An error occurred during battle. Please try again.")
             
+    @commands.command(name='cooldowns', aliases=['cd'], help='View your command cooldowns')
+    async def show_cooldowns(self, ctx):
+        """Show when each cooldown command is ready again."""
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
+            return
+            
+        user_id = str(ctx.author.id)
+        
+        if not await ensure_user_exists(user_id):
+            await ctx.send("❌ You need to `$start` your adventure first!")
+            return
+            
+        remaining = await cooldowns.get_all(user_id)
+        lines = []
+        for action in COOLDOWN_ACTIONS:
+            status = "✅ Ready!" if remaining[action] <= 0 else f"⏰ {format_time_remaining(remaining[action])}"
+            lines.append(f"`${action}` - {status}")
+            
+        embed = create_embed(
+            "⏰ Cooldowns",
+            "\n".join(lines),
+            COLORS['info']
+        )
+        await ctx.send(embed=embed)
+            
     @commands.command(name='heal', help='Heal your character')
     async def heal_character(self, ctx):
         """Heal the player's character."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
         try:
-            player_data = get_user_rpg_data(user_id)
+            player_data = await get_user_rpg_data(user_id)
             if not player_data:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
@@ -1340,7 +1349,7 @@ class RPGGamesCog(commands.Cog):
             player_data['coins'] -= heal_cost
             
             # Save data
-            update_user_rpg_data(user_id, player_data)
+            await update_user_rpg_data(user_id, player_data)
             
             embed = create_embed(
                 "❤️ Fully Healed!",
@@ -1359,36 +1368,23 @@ class RPGGamesCog(commands.Cog):
     @commands.command(name='equip', help='Equip weapons and armor')
     async def equip_item(self, ctx, *, item_name: str):
         """Equip an item from inventory."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
         try:
-            player_data = get_user_rpg_data(user_id)
-            if not player_data:
+            player = await get_player_profile(user_id)
+            if not player:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
                 
-            # Check if item is in inventory
-            inventory = player_data.get('inventory', [])
-            found_item = None
-            
-            for item in inventory:
-                if item.lower() == item_name.lower():
-                    found_item = item
-                    break
-                    
-            if not found_item:
-                # Try partial match
-                for item in inventory:
-                    if item_name.lower() in item.lower():
-                        found_item = item
-                        break
+            # Check if item is in inventory (exact match first, then partial)
+            found_item = player.inventory.find(item_name)
                         
             if not found_item:
                 embed = create_embed(
@@ -1400,16 +1396,8 @@ class RPGGamesCog(commands.Cog):
                 return
                 
             # Determine item type and equip
-            from utils.constants import SHOP_ITEMS
-            
-            item_type = None
-            item_stats = None
-            
-            for category, items in SHOP_ITEMS.items():
-                if found_item in items:
-                    item_type = category
-                    item_stats = items[found_item]
-                    break
+            item_type = catalog.category(found_item)
+            item_stats = catalog.item_data(found_item)
                     
             if not item_type or item_type not in ['weapons', 'armor', 'accessories']:
                 embed = create_embed(
@@ -1420,10 +1408,6 @@ class RPGGamesCog(commands.Cog):
                 await ctx.send(embed=embed)
                 return
                 
-            # Initialize equipped items
-            if 'equipped' not in player_data:
-                player_data['equipped'] = {}
-                
             # Map item types to equipment slots
             slot_mapping = {
                 'weapons': 'weapon',
@@ -1432,52 +1416,47 @@ class RPGGamesCog(commands.Cog):
             }
             
             slot = slot_mapping[item_type]
-            old_item = player_data['equipped'].get(slot)
+            old_item = player.equipped.get(slot)
             
             # Unequip old item if exists
             if old_item:
                 # Remove old item stats
-                old_item_stats = None
-                for category, items in SHOP_ITEMS.items():
-                    if old_item in items:
-                        old_item_stats = items[old_item]
-                        break
-                        
+                old_item_stats = catalog.item_data(old_item)
                 if old_item_stats:
                     if 'attack' in old_item_stats:
-                        player_data['attack'] -= old_item_stats['attack']
+                        player.attack -= old_item_stats['attack']
                     if 'defense' in old_item_stats:
-                        player_data['defense'] -= old_item_stats['defense']
+                        player.defense -= old_item_stats['defense']
                     if 'hp' in old_item_stats:
-                        player_data['max_hp'] -= old_item_stats['hp']
-                        player_data['hp'] = min(player_data['hp'], player_data['max_hp'])
+                        player.max_hp -= old_item_stats['hp']
+                        player.hp = min(player.hp, player.max_hp)
                         
                 # Add old item back to inventory
-                player_data['inventory'].append(old_item)
+                player.inventory.add(old_item)
                 
             # Equip new item
-            player_data['equipped'][slot] = found_item
-            player_data['inventory'].remove(found_item)
+            player.equipped[slot] = found_item
+            player.inventory.remove(found_item)
             
             # Apply new item stats
             if 'attack' in item_stats:
-                player_data['attack'] += item_stats['attack']
+                player.attack += item_stats['attack']
             if 'defense' in item_stats:
-                player_data['defense'] += item_stats['defense']
+                player.defense += item_stats['defense']
             if 'hp' in item_stats:
-                player_data['max_hp'] += item_stats['hp']
-                player_data['hp'] += item_stats['hp']  # Also heal when equipping HP items
+                player.max_hp += item_stats['hp']
+                player.hp += item_stats['hp']  # Also heal when equipping HP items
                 
             # Save data
-            update_user_rpg_data(user_id, player_data)
+            await save_player_profile(user_id, player)
             
             embed = create_embed(
                 "✅ Item Equipped!",
                 f"You equipped **{found_item}**!\n\n"
                 f"**Stats:**\n"
-                f"Attack: {player_data['attack']}\n"
-                f"Defense: {player_data['defense']}\n"
-                f"HP: {player_data['hp']}/{player_data['max_hp']}",
+                f"Attack: {player.attack}\n"
+                f"Defense: {player.defense}\n"
+                f"HP: {player.hp}/{player.max_hp}",
                 COLORS['success']
             )
             
@@ -1497,17 +1476,17 @@ class RPGGamesCog(commands.Cog):
     @commands.command(name='inventory', help='View your inventory')
     async def view_inventory(self, ctx):
         """View player inventory."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
         try:
-            player_data = get_user_rpg_data(user_id)
+            player_data = await get_player_profile(user_id)
             if not player_data:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
@@ -1523,9 +1502,9 @@ class RPGGamesCog(commands.Cog):
             await ctx.send("❌ An error occurred while viewing inventory. Please try again.")
             
     @commands.command(name='leaderboard', help='View leaderboards')
-    async def view_leaderboard(self, ctx, category: str = 'level'):
-        """View leaderboards."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+    async def view_leaderboard(self, ctx, category: str = 'level', scope: str = 'global'):
+        """View global or server leaderboards."""
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         try:
@@ -1539,35 +1518,64 @@ class RPGGamesCog(commands.Cog):
                 await ctx.send(embed=embed)
                 return
                 
-            leaderboard = get_leaderboard(category, 10)
-            
-            if not leaderboard:
+            valid_scopes = ['global', 'server']
+            if scope not in valid_scopes:
                 embed = create_embed(
-                    "📊 Leaderboard",
-                    "No data available yet!",
-                    COLORS['info']
+                    "❌ Invalid Scope",
+                    f"Valid scopes: {', '.join(valid_scopes)}",
+                    COLORS['error']
                 )
                 await ctx.send(embed=embed)
                 return
                 
+            member_ids = {str(member.id) for member in ctx.guild.members} if scope == 'server' else None
+            
+            # Reuse the rendered global board until its top ranks change. Server boards filter
+            # the whole ranking, so any change can reach them; they're reused for a short TTL.
+            cache_key = (category, ctx.guild.id if scope == 'server' else None)
+            if scope == 'server':
+                version = ctx.guild.member_count
+                ttl = PERFORMANCE_CONFIG['leaderboard_cache_ttl']
+            else:
+                version = leaderboard_index.version(category)
+                ttl = PERFORMANCE_CONFIG['name_cache_ttl']
+            cached = self.leaderboard_cache.get(cache_key)
+            if cached and cached[0] == version and time.monotonic() - cached[1] < ttl:
+                leaderboard_text, shown = cached[2], cached[3]
+            else:
+                leaderboard = await get_leaderboard(category, 10, member_ids)
+                
+                if not leaderboard:
+                    embed = create_embed(
+                        "📊 Leaderboard",
+                        "No data available yet!",
+                        COLORS['info']
+                    )
+                    await ctx.send(embed=embed)
+                    return
+                    
+                names = await name_resolver.resolve(self.bot, [int(entry['user_id']) for entry in leaderboard])
+                
+                leaderboard_text = ""
+                for i, entry in enumerate(leaderboard, 1):
+                    username = names[int(entry['user_id'])]
+                    medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+                    leaderboard_text += f"{medal} **{username}** - {format_number(entry['value'])}\n"
+                    
+                shown = len(leaderboard)
+                self.leaderboard_cache[cache_key] = (version, time.monotonic(), leaderboard_text, shown)
+                
             embed = discord.Embed(
-                title=f"🏆 {category.title()} Leaderboard",
+                title=f"🏆 {'Server' if scope == 'server' else 'Global'} {category.title()} Leaderboard",
                 color=COLORS['warning']
             )
-            
-            leaderboard_text = ""
-            for i, entry in enumerate(leaderboard, 1):
-                try:
-                    user = await self.bot.fetch_user(int(entry['user_id']))
-                    username = user.display_name if user else "Unknown User"
-                except:
-                    username = "Unknown User"
-                    
-                medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-                leaderboard_text += f"{medal} **{username}** - {format_number(entry['value'])}\n"
-                
             embed.description = leaderboard_text
-            embed.set_footer(text=f"Showing top {len(leaderboard)} players")
+            
+            footer = f"Showing top {shown} players"
+            rank = await get_leaderboard_rank(category, str(ctx.author.id), member_ids)
+            if rank is not None:
+                footer += f" | Your rank: #{rank}"
+            embed.set_footer(text=footer)
             
             await ctx.send(embed=embed)
             
@@ -1578,18 +1586,18 @@ class RPGGamesCog(commands.Cog):
     @commands.command(name='craft', help='Craft items')
     async def craft_item(self, ctx, *, item_name: str = None):
         """Craft items using materials."""
-        if not is_module_enabled("rpg_games", ctx.guild.id):
+        if not await is_module_enabled("rpg_games", ctx.guild.id):
             return
             
         user_id = str(ctx.author.id)
         
-        if not ensure_user_exists(user_id):
+        if not await ensure_user_exists(user_id):
             await ctx.send("❌ You need to `$start` your adventure first!")
             return
             
         try:
-            player_data = get_user_rpg_data(user_id)
-            if not player_data:
+            player = await get_player_profile(user_id)
+            if not player:
                 await ctx.send("❌ Error retrieving player data. Please try again.")
                 return
                 
@@ -1618,21 +1626,19 @@ class RPGGamesCog(commands.Cog):
                 await ctx.send(embed=embed)
                 return
                 
-            # Find recipe
-            recipe = None
-            for recipe_name, recipe_data in CRAFTING_RECIPES.items():
-                if item_name.lower() in recipe_name.lower():
-                    recipe = (recipe_name, recipe_data)
-                    break
+            # Find recipe (exact match, then prefix, then partial)
+            recipe_name = catalog.recipes.resolve(item_name)
                     
-            if not recipe:
-                await ctx.send("❌ Recipe not found! Use `$craft` to see available recipes.")
+            if not recipe_name:
+                suggestions = catalog.recipes.suggest(item_name, limit=3)
+                suggestion_text = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+                await ctx.send(f"❌ Recipe not found!{suggestion_text} Use `$craft` to see available recipes.")
                 return
                 
-            recipe_name, recipe_data = recipe
+            recipe_data = catalog.recipe(recipe_name)
             
             # Check skill requirement
-            crafting_skill = min(player_data['level'] + len(player_data.get('crafted_items', [])), 100)
+            crafting_skill = min(player.level + len(player.get('crafted_items', [])), 100)
             if crafting_skill < recipe_data['skill_required']:
                 embed = create_embed(
                     "❌ Insufficient Skill",
@@ -1644,7 +1650,7 @@ class RPGGamesCog(commands.Cog):
                 return
                 
             # Check materials
-            inventory = player_data.get('inventory', [])
+            inventory = player.inventory
             missing_materials = []
             
             for material, amount_needed in recipe_data['materials'].items():
@@ -1662,10 +1668,10 @@ class RPGGamesCog(commands.Cog):
                 return
                 
             # Check coin cost
-            if player_data['coins'] < recipe_data['cost']:
+            if player.coins < recipe_data['cost']:
                 embed = create_embed(
                     "❌ Insufficient Coins",
-                    f"You need {recipe_data['cost']} coins but only have {player_data['coins']}.",
+                    f"You need {recipe_data['cost']} coins but only have {player.coins}.",
                     COLORS['error']
                 )
                 await ctx.send(embed=embed)
@@ -1673,27 +1679,26 @@ class RPGGamesCog(commands.Cog):
                 
             # Craft the item
             for material, amount in recipe_data['materials'].items():
-                for _ in range(amount):
-                    player_data['inventory'].remove(material)
+                inventory.remove(material, amount)
                     
-            player_data['coins'] -= recipe_data['cost']
+            player.coins -= recipe_data['cost']
             
             # Add crafted item to inventory
-            if len(player_data['inventory']) < RPG_CONSTANTS['max_inventory_size']:
-                player_data['inventory'].append(recipe_name)
+            if inventory.has_room(recipe_name, RPG_CONSTANTS['max_inventory_size']):
+                inventory.add(recipe_name)
                 
                 # Track crafted items
-                if 'crafted_items' not in player_data:
-                    player_data['crafted_items'] = []
-                player_data['crafted_items'].append(recipe_name)
+                if 'crafted_items' not in player:
+                    player['crafted_items'] = []
+                player['crafted_items'].append(recipe_name)
                 
                 # Save data
-                update_user_rpg_data(user_id, player_data)
+                await save_player_profile(user_id, player)
                 
                 embed = create_embed(
                     "✅ Crafting Successful!",
                     f"You crafted **{recipe_name}**!\n\n"
-                    f"Remaining coins: {format_number(player_data['coins'])}",
+                    f"Remaining coins: {format_number(player.coins)}",
                     COLORS['success']
                 )
                 
@@ -1,7 +1,9 @@
 import os
+import copy
 import json
+import threading
 from typing import Dict, Any, Optional
-from replit import db
+from utils.storage import db
 import logging
 
 logger = logging.getLogger(__name__)
@@ -63,7 +65,8 @@ DEFAULT_SERVER_CONFIG = {
         'enabled': False,
         'spam_detection': True,
         'inappropriate_content': True,
-        'max_warnings': 3
+        'max_warnings': 3,
+        'custom_words': []  # Extra filtered words for this server
     },
     'welcome_message': {
         'enabled': False,
@@ -75,37 +78,85 @@ DEFAULT_SERVER_CONFIG = {
     'prefix': '$'
 }
 
-def get_server_config(guild_id: int) -> Dict[str, Any]:
-    """Get server configuration."""
-    try:
+# guild_id -> {'config': dict, 'allowed_channels': frozenset, 'ai_enabled_channels': frozenset}
+# Entries live until update_server_config or invalidate_server_config replaces them
+_server_config_cache: Dict[int, Dict[str, Any]] = {}
+_server_config_lock = threading.Lock()
+
+def _cache_server_config(guild_id: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a config in the cache along with its channel allow-lists as sets."""
+    entry = {
+        'config': config,
+        'allowed_channels': frozenset(config.get('allowed_channels') or ()),
+        'ai_enabled_channels': frozenset(config.get('ai_enabled_channels') or ())
+    }
+    _server_config_cache[guild_id] = entry
+    return entry
+
+def get_server_config_entry(guild_id: int) -> Dict[str, Any]:
+    """Get the cached config entry for a guild, loading it on first use.
+
+    The entry is shared; callers must treat it as read-only.
+    """
+    entry = _server_config_cache.get(guild_id)
+    if entry is not None:
+        return entry
+    
+    with _server_config_lock:
+        entry = _server_config_cache.get(guild_id)
+        if entry is not None:
+            return entry
+        
         config_key = f"server_config_{guild_id}"
-        config = db.get(config_key, DEFAULT_SERVER_CONFIG.copy())
+        config = db.get(config_key, None)
+        if config is None:
+            config = copy.deepcopy(DEFAULT_SERVER_CONFIG)
         
         # Ensure all default keys exist
         for key, value in DEFAULT_SERVER_CONFIG.items():
             if key not in config:
-                config[key] = value
+                config[key] = copy.deepcopy(value)
         
-        return config
+        return _cache_server_config(guild_id, config)
+
+def is_server_config_cached(guild_id: int) -> bool:
+    """Check whether a guild's config can be read without storage I/O."""
+    return guild_id in _server_config_cache
+
+def invalidate_server_config(guild_id: Optional[int] = None):
+    """Drop cached config for one guild, or for every guild."""
+    if guild_id is None:
+        _server_config_cache.clear()
+    else:
+        _server_config_cache.pop(guild_id, None)
+
+def get_server_config(guild_id: int) -> Dict[str, Any]:
+    """Get server configuration."""
+    try:
+        # Callers modify and write back the result, so never hand out the cached dict
+        return copy.deepcopy(get_server_config_entry(guild_id)['config'])
     except Exception as e:
         logger.error(f"Error getting server config for {guild_id}: {e}")
-        return DEFAULT_SERVER_CONFIG.copy()
+        return copy.deepcopy(DEFAULT_SERVER_CONFIG)
 
 def update_server_config(guild_id: int, config: Dict[str, Any]) -> bool:
     """Update server configuration."""
     try:
         config_key = f"server_config_{guild_id}"
         db[config_key] = config
+        with _server_config_lock:
+            _cache_server_config(guild_id, copy.deepcopy(config))
         logger.info(f"Updated server config for {guild_id}")
         return True
     except Exception as e:
+        invalidate_server_config(guild_id)
         logger.error(f"Error updating server config for {guild_id}: {e}")
         return False
 
 def is_module_enabled(module_name: str, guild_id: int) -> bool:
     """Check if a module is enabled for a guild."""
     try:
-        config = get_server_config(guild_id)
+        config = get_server_config_entry(guild_id)['config']
         return config.get('enabled_modules', {}).get(module_name, True)
     except Exception as e:
         logger.error(f"Error checking module {module_name} for {guild_id}: {e}")
@@ -114,8 +165,7 @@ def is_module_enabled(module_name: str, guild_id: int) -> bool:
 def is_channel_allowed(channel_id: int, guild_id: int) -> bool:
     """Check if a channel is allowed for bot commands."""
     try:
-        config = get_server_config(guild_id)
-        allowed_channels = config.get('allowed_channels', [])
+        allowed_channels = get_server_config_entry(guild_id)['allowed_channels']
         
         # If no channels specified, all are allowed
         if not allowed_channels:
@@ -129,8 +179,7 @@ def is_channel_allowed(channel_id: int, guild_id: int) -> bool:
 def is_ai_enabled_in_channel(channel_id: int, guild_id: int) -> bool:
     """Check if AI is enabled in a specific channel."""
     try:
-        config = get_server_config(guild_id)
-        ai_channels = config.get('ai_enabled_channels', [])
+        ai_channels = get_server_config_entry(guild_id)['ai_enabled_channels']
         
         # If no channels specified, all are allowed
         if not ai_channels:
@@ -167,12 +216,40 @@ API_CONFIG = {
     'gemini_api_key': os.getenv('GEMINI_API_KEY', ''),
     'rate_limit_requests': 100,
     'rate_limit_window': 60,
+    'user_rate_limit_requests': 5,  # AI requests per user per window
+    'guild_rate_limit_requests': 30,  # AI requests per guild per window
     'max_retries': 3,
-    'timeout': 30
+    'retry_base_delay': 1.0,  # seconds; doubled per retry with jitter
+    'timeout': 30,
+    'max_concurrent_requests': 4,
+    'max_concurrent_per_guild': 2
+}
+
+# AI Chatbot Configuration
+AI_CONFIG = {
+    'model': 'gemini-1.5-flash',
+    'history_length': 20,  # messages kept per channel
+    'history_ttl': 7200,  # seconds before a message drops out of the AI's context
+    'prompt_token_budget': 1200,  # estimated tokens for system prompt, history and message
+    'cache_max_channels': 500,
+    'cache_max_bytes': 5_000_000,  # approximate budget for cached conversation history
+    'log_compact_threshold': 50,  # appends before a channel log is compacted
+    'log_flush_interval': 5,  # seconds between conversation log flushes
+    'response_cache_ttl': 300,  # seconds a generated response can be reused
+    'response_cache_size': 1000,
+    'stream_responses': True,  # post responses while they are generated
+    'stream_edit_interval': 1.5,  # seconds between edits of a streaming message
+    'summarize_history': False,  # fold older history into a running summary when idle
+    'summary_threshold': 12,  # messages in a channel before it is summarized
+    'summary_keep_recent': 6,  # newest messages kept verbatim
+    'summary_idle_seconds': 120,
+    'summary_max_chars': 1000
 }
 
 # Database Configuration
 DATABASE_CONFIG = {
+    'backend': os.getenv('STORAGE_BACKEND', 'replit'),  # replit, sqlite or memory
+    'sqlite_path': os.getenv('SQLITE_PATH', 'bot_data.db'),
     'max_connections': 10,
     'connection_timeout': 30,
     'query_timeout': 10,
@@ -183,6 +260,13 @@ DATABASE_CONFIG = {
 PERFORMANCE_CONFIG = {
     'cache_size': 1000,
     'cache_ttl': 300,  # 5 minutes
+    'flush_interval': 10,  # seconds between write-behind flushes
+    'flush_batch_size': 100,  # profiles written per storage batch
+    'name_cache_ttl': 600,  # seconds a resolved display name is reused
+    'leaderboard_cache_ttl': 30,  # seconds a rendered server leaderboard is reused
+    'name_fetch_concurrency': 5,  # parallel fetch_user calls per lookup
+    'rate_tracker_max_keys': 10000,  # users/channels tracked by spam detection
+    'cooldown_sync_interval': 30,  # seconds before cached cooldowns are re-read from storage
     'max_memory_usage': 512,  # MB
     'cleanup_interval': 3600  # 1 hour
 }
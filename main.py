@@ -6,8 +6,13 @@ import asyncio
 from datetime import datetime
 import threading
 from web_server import run_web_server
-from config import COLORS, EMOJIS, get_server_config
+from config import COLORS, EMOJIS, PERFORMANCE_CONFIG, get_server_config
 from utils.database import init_database
+from utils.user_cache import user_cache
+from utils.cooldowns import cooldowns
+from utils.async_db import db_executor, run_db
+from utils.ai_client import ai_client
+from utils.message_pipeline import message_pipeline, COMMAND_STAGE
 from cogs.help import HelpView
 
 # Configure logging
@@ -42,7 +47,7 @@ async def on_ready():
     
     # Initialize database
     try:
-        init_database()
+        await run_db(init_database)
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
@@ -55,6 +60,21 @@ async def on_ready():
         activity=discord.Game(name="Epic RPG Adventures | $help")
     )
 
+@bot.event
+async def on_message(message):
+    """Run every message through the shared message pipeline."""
+    await message_pipeline.dispatch(message)
+
+async def command_stage(msg_ctx):
+    """Message pipeline stage that dispatches prefixed commands."""
+    if not msg_ctx.content.startswith(bot.command_prefix):
+        return
+    msg_ctx.is_command = True
+    await bot.process_commands(msg_ctx.message)
+    msg_ctx.stop()
+
+message_pipeline.add_stage('commands', command_stage, COMMAND_STAGE)
+
 @bot.event
 async def on_guild_join(guild):
     """Called when the bot joins a new guild."""
@@ -199,6 +219,14 @@ async def main():
         logger.error("DISCORD_TOKEN not found in environment variables!")
         return
     
+    # Periodically write dirty user profiles back to storage
+    flush_task = asyncio.create_task(
+        user_cache.run_flush_loop(PERFORMANCE_CONFIG['flush_interval'], db_executor)
+    )
+    cooldown_flush_task = asyncio.create_task(
+        cooldowns.run_flush_loop(PERFORMANCE_CONFIG['flush_interval'], db_executor)
+    )
+    
     # Run the bot
     try:
         await bot.start(token)
@@ -208,6 +236,13 @@ async def main():
         logger.error(f"Bot error: {e}")
     finally:
         await bot.close()
+        flush_task.cancel()
+        cooldown_flush_task.cancel()
+        flushed = user_cache.flush_all()
+        logger.info(f"Flushed {flushed} user profiles on shutdown")
+        cooldowns.flush()
+        ai_client.shutdown()
+        db_executor.shutdown(wait=True)
 
 if __name__ == "__main__":
     asyncio.run(main())
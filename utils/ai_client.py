@@ -0,0 +1,297 @@
+import asyncio
+import contextlib
+import random
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable
+from config import API_CONFIG, AI_CONFIG
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+class AIClientError(Exception):
+    """Raised when a generation request fails after all retries."""
+
+class AIClient:
+    """Bounded, retrying client for the Google Gemini API.
+
+    Blocking SDK calls run on a dedicated worker pool so a burst of requests
+    can't starve the default executor. Concurrency is capped globally and
+    per guild, requests are throttled to the configured rate limit, and
+    transient failures are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, model_name: str, max_concurrency: int = 4, per_guild_concurrency: int = 2,
+                 timeout: float = 30, max_retries: int = 3, retry_base_delay: float = 1.0,
+                 rate_limit_requests: int = 100, rate_limit_window: float = 60):
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.per_guild_concurrency = per_guild_concurrency
+        self.rate_limit_requests = rate_limit_requests
+        self.rate_limit_window = rate_limit_window
+
+        self.model = None
+        self.available = False
+        self._retryable: tuple = (asyncio.TimeoutError,)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='ai')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # One token per pool thread, returned when the thread finishes rather than when
+        # the caller stops waiting, so calls abandoned after a timeout still count
+        self._worker_tokens = asyncio.Semaphore(max_concurrency)
+        # guild_id -> [semaphore, tasks holding or waiting on it]
+        self._guild_slots: Dict[int, List[Any]] = {}
+        self._request_times: deque = deque()
+
+        self.stats = {
+            'requests': 0,
+            'failures': 0,
+            'retries': 0,
+            'timeouts': 0,
+            'throttled': 0,
+            'in_flight': 0,
+            'total_ms': 0.0
+        }
+
+    def setup(self, api_key: str) -> bool:
+        """Configure the SDK and model; returns whether the API is usable."""
+        try:
+            import google.generativeai as genai
+            from google.api_core import exceptions as api_exceptions
+
+            if not api_key:
+                logger.error("GEMINI_API_KEY not found in environment variables!")
+                self.available = False
+                return False
+
+            genai.configure(api_key=api_key)
+            self.model = genai.GenerativeModel(self.model_name)
+            self._retryable = (
+                asyncio.TimeoutError,
+                api_exceptions.ResourceExhausted,
+                api_exceptions.ServiceUnavailable,
+                api_exceptions.DeadlineExceeded,
+                api_exceptions.InternalServerError
+            )
+            self.available = True
+            logger.info("Google Gemini API initialized successfully")
+        except ImportError:
+            logger.error("google-generativeai package not installed!")
+            self.available = False
+        except Exception as e:
+            logger.error(f"Failed to initialize Gemini API: {e}")
+            self.available = False
+        return self.available
+
+    def _generate_sync(self, prompt: str) -> str:
+        response = self.model.generate_content(prompt, request_options={'timeout': self.timeout})
+        return response.text
+
+    def _stream_sync(self, prompt: str, emit: Callable[[str], None], stop: threading.Event):
+        response = self.model.generate_content(prompt, stream=True, request_options={'timeout': self.timeout})
+        for chunk in response:
+            if stop.is_set():
+                break
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts, e.g. only safety metadata
+                continue
+            if text:
+                emit(text)
+
+    async def _throttle(self):
+        """Wait until a request fits within the configured rate limit."""
+        times = self._request_times
+        while True:
+            now = time.monotonic()
+            while times and now - times[0] >= self.rate_limit_window:
+                times.popleft()
+            if len(times) < self.rate_limit_requests:
+                times.append(now)
+                return
+            self.stats['throttled'] += 1
+            await asyncio.sleep(self.rate_limit_window - (now - times[0]))
+
+    def _guild_semaphore(self, guild_id: int) -> asyncio.Semaphore:
+        slot = self._guild_slots.get(guild_id)
+        if slot is None:
+            slot = [asyncio.Semaphore(self.per_guild_concurrency), 0]
+            self._guild_slots[guild_id] = slot
+        slot[1] += 1
+        return slot[0]
+
+    def _release_guild(self, guild_id: int):
+        slot = self._guild_slots[guild_id]
+        slot[1] -= 1
+        # Drop idle guilds so the table doesn't grow with every guild ever seen
+        if slot[1] == 0:
+            del self._guild_slots[guild_id]
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, guild_id: Optional[int]):
+        """Hold a per-guild slot (when guild_id is set) and a global slot."""
+        guild_semaphore = self._guild_semaphore(guild_id) if guild_id else None
+        try:
+            async with (guild_semaphore or contextlib.nullcontext()):
+                async with self._semaphore:
+                    yield
+        finally:
+            if guild_semaphore:
+                self._release_guild(guild_id)
+
+    def _return_token(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._worker_tokens.release)
+        except RuntimeError:
+            pass  # Event loop already closed at shutdown
+
+    async def _start_worker(self, func: Callable, *args) -> asyncio.Future:
+        """Run func on the worker pool once one of its threads is free."""
+        await self._worker_tokens.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._worker_tokens.release()
+            raise
+        # Runs on the worker thread (or here, if the call never started)
+        future.add_done_callback(lambda _: self._return_token(loop))
+        worker = asyncio.wrap_future(future)
+        # Retrieve the outcome even if the caller stops waiting
+        worker.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return worker
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Count a retryable failure; returns the backoff delay or raises once retries are spent."""
+        if isinstance(error, asyncio.TimeoutError):
+            self.stats['timeouts'] += 1
+        if attempt == self.max_retries:
+            self.stats['failures'] += 1
+            raise AIClientError(f"Gemini request failed after {attempt + 1} attempts: {error!r}") from error
+        delay = self.retry_base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+        logger.warning(f"Gemini request failed ({error!r}), retrying in {delay:.1f}s")
+        self.stats['retries'] += 1
+        return delay
+
+    async def generate(self, prompt: str, guild_id: Optional[int] = None) -> str:
+        """Generate a response, retrying transient failures."""
+        if not self.available:
+            raise AIClientError("Gemini API is not available")
+
+        async with self._slot(guild_id):
+            for attempt in range(self.max_retries + 1):
+                await self._throttle()
+                self.stats['requests'] += 1
+                self.stats['in_flight'] += 1
+                start = time.perf_counter()
+                try:
+                    worker = await self._start_worker(self._generate_sync, prompt)
+                    return await asyncio.wait_for(worker, timeout=self.timeout)
+                except self._retryable as e:
+                    delay = self._retry_delay(attempt, e)
+                except Exception:
+                    self.stats['failures'] += 1
+                    raise
+                finally:
+                    self.stats['in_flight'] -= 1
+                    self.stats['total_ms'] += (time.perf_counter() - start) * 1000
+                await asyncio.sleep(delay)
+
+    async def stream(self, prompt: str, guild_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Generate a response incrementally, yielding text as the API produces it.
+
+        Failures before the first piece are retried like generate(); once text
+        has been yielded a failure raises AIClientError. timeout applies to the
+        wait for each piece rather than the whole response. The request slot
+        is held until the generator finishes, so consumers that may stop
+        early should iterate it under contextlib.aclosing.
+        """
+        if not self.available:
+            raise AIClientError("Gemini API is not available")
+
+        loop = asyncio.get_running_loop()
+        async with self._slot(guild_id):
+            for attempt in range(self.max_retries + 1):
+                await self._throttle()
+                self.stats['requests'] += 1
+                self.stats['in_flight'] += 1
+                start = time.perf_counter()
+                queue: asyncio.Queue = asyncio.Queue()
+                stop = threading.Event()
+                emit = lambda text: loop.call_soon_threadsafe(queue.put_nowait, text)
+                getter = None
+                yielded = False
+                try:
+                    worker = await self._start_worker(self._stream_sync, prompt, emit, stop)
+                    while True:
+                        getter = asyncio.ensure_future(queue.get())
+                        done, _ = await asyncio.wait({getter, worker}, timeout=self.timeout,
+                                                     return_when=asyncio.FIRST_COMPLETED)
+                        if getter in done:
+                            yielded = True
+                            yield getter.result()
+                            continue
+                        getter.cancel()
+                        if not done:
+                            raise asyncio.TimeoutError()
+                        while not queue.empty():
+                            yielded = True
+                            yield queue.get_nowait()
+                        worker.result()  # re-raises a failure from the worker thread
+                        return
+                except self._retryable as e:
+                    if yielded:
+                        if isinstance(e, asyncio.TimeoutError):
+                            self.stats['timeouts'] += 1
+                        self.stats['failures'] += 1
+                        raise AIClientError(f"Gemini stream interrupted: {e!r}") from e
+                    delay = self._retry_delay(attempt, e)
+                except Exception:
+                    self.stats['failures'] += 1
+                    raise
+                finally:
+                    if getter is not None:
+                        getter.cancel()
+                    # Lets the worker thread stop early if the consumer went away
+                    stop.set()
+                    self.stats['in_flight'] -= 1
+                    self.stats['total_ms'] += (time.perf_counter() - start) * 1000
+                await asyncio.sleep(delay)
+
+    def shutdown(self):
+        """Stop the worker pool, abandoning queued requests."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get request, retry and latency statistics."""
+        requests = self.stats['requests']
+        return {
+            'available': self.available,
+            'requests': requests,
+            'failures': self.stats['failures'],
+            'retries': self.stats['retries'],
+            'timeouts': self.stats['timeouts'],
+            'throttled': self.stats['throttled'],
+            'in_flight': self.stats['in_flight'],
+            'avg_ms': round(self.stats['total_ms'] / requests, 1) if requests else 0.0,
+            'active_guilds': len(self._guild_slots)
+        }
+
+# Global AI client instance
+ai_client = AIClient(
+    model_name=AI_CONFIG['model'],
+    max_concurrency=API_CONFIG['max_concurrent_requests'],
+    per_guild_concurrency=API_CONFIG['max_concurrent_per_guild'],
+    timeout=API_CONFIG['timeout'],
+    max_retries=API_CONFIG['max_retries'],
+    retry_base_delay=API_CONFIG['retry_base_delay'],
+    rate_limit_requests=API_CONFIG['rate_limit_requests'],
+    rate_limit_window=API_CONFIG['rate_limit_window']
+)
+register_metrics('ai_client', ai_client.get_metrics)
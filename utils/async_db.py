@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple, Callable, Collection
+import config
+from config import DATABASE_CONFIG
+from utils import database
+from utils.storage import db
+from utils.user_cache import user_cache
+from utils.leaderboard import leaderboard_index
+from utils.models import PlayerProfile
+
+logger = logging.getLogger(__name__)
+
+# Bounded pool so a slow storage backend can't spawn unbounded threads
+db_executor = ThreadPoolExecutor(
+    max_workers=DATABASE_CONFIG['max_connections'],
+    thread_name_prefix='db'
+)
+
+async def run_db(func: Callable, *args, **kwargs):
+    """Run a blocking storage call on the database thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+async def _run_user(func: Callable, user_id: str, *args):
+    """Run a user profile call, skipping the thread hop on cache hits."""
+    if user_cache.is_cached(user_id):
+        return func(user_id, *args)
+    return await run_db(func, user_id, *args)
+
+# User data management
+async def ensure_user_exists(user_id: str) -> bool:
+    """Ensure user exists in database."""
+    return await _run_user(database.ensure_user_exists, user_id)
+
+async def get_user_data(user_id: str) -> Optional[Dict[str, Any]]:
+    """Get user data without blocking the event loop."""
+    return await _run_user(database.get_user_data, user_id)
+
+async def update_user_data(user_id: str, data: Dict[str, Any]) -> bool:
+    """Update user data without blocking the event loop."""
+    return await _run_user(database.update_user_data, user_id, data)
+
+async def get_user_rpg_data(user_id: str) -> Optional[Dict[str, Any]]:
+    """Get user RPG data without blocking the event loop."""
+    return await _run_user(database.get_user_rpg_data, user_id)
+
+async def update_user_rpg_data(user_id: str, rpg_data: Dict[str, Any]) -> bool:
+    """Update user RPG data without blocking the event loop."""
+    return await _run_user(database.update_user_rpg_data, user_id, rpg_data)
+
+async def get_player_profile(user_id: str) -> Optional[PlayerProfile]:
+    """Get a user's PlayerProfile without blocking the event loop."""
+    return await _run_user(database.get_player_profile, user_id)
+
+async def save_player_profile(user_id: str, player: PlayerProfile) -> bool:
+    """Save a user's PlayerProfile without blocking the event loop."""
+    return await _run_user(database.save_player_profile, user_id, player)
+
+async def get_user_count() -> int:
+    """Get the number of stored user profiles."""
+    return await run_db(database.get_user_count)
+
+# Guild data management
+async def get_guild_data(guild_id: str) -> Optional[Dict[str, Any]]:
+    """Get guild data from database."""
+    return await run_db(database.get_guild_data, guild_id)
+
+async def update_guild_data(guild_id: str, data: Dict[str, Any]) -> bool:
+    """Update guild data in database."""
+    return await run_db(database.update_guild_data, guild_id, data)
+
+# Warning management
+async def add_warning(user_id: int, guild_id: int, reason: str, moderator_id: int) -> int:
+    """Add a warning to a user and return their new warning count."""
+    return await run_db(database.add_warning, user_id, guild_id, reason, moderator_id)
+
+async def get_user_warnings(user_id: int, guild_id: int) -> List[Dict[str, Any]]:
+    """Get a user's warnings."""
+    return await run_db(database.get_user_warnings, user_id, guild_id)
+
+async def clear_user_warnings(user_id: int, guild_id: int) -> int:
+    """Clear a user's warnings and return how many were removed."""
+    return await run_db(database.clear_user_warnings, user_id, guild_id)
+
+async def get_warning_stats(guild_id: int) -> Dict[str, Any]:
+    """Get a guild's warning aggregates."""
+    return await run_db(database.get_warning_stats, guild_id)
+
+# Leaderboard and statistics
+async def _run_leaderboard(func: Callable, *args):
+    """Run a leaderboard query, only leaving the loop to build the index."""
+    if leaderboard_index.loaded:
+        return func(*args)
+    return await run_db(func, *args)
+
+async def get_leaderboard(category: str, limit: int = 10,
+                          member_ids: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+    """Get leaderboard for a specific category."""
+    return await _run_leaderboard(database.get_leaderboard, category, limit, member_ids)
+
+async def get_leaderboard_rank(category: str, user_id: str,
+                               member_ids: Optional[Collection[str]] = None) -> Optional[int]:
+    """Get a user's 1-based leaderboard rank."""
+    return await _run_leaderboard(database.get_leaderboard_rank, category, user_id, member_ids)
+
+async def update_global_stats(stat_name: str, increment: int = 1) -> bool:
+    """Update global statistics."""
+    return await run_db(database.update_global_stats, stat_name, increment)
+
+async def get_global_stats() -> Dict[str, Any]:
+    """Get global statistics."""
+    return await run_db(database.get_global_stats)
+
+async def backup_database() -> bool:
+    """Create a backup of the database."""
+    return await run_db(database.backup_database)
+
+async def cleanup_old_data(days: int = 30) -> bool:
+    """Clean up old inactive user data."""
+    return await run_db(database.cleanup_old_data, days)
+
+# Server configuration
+async def _run_config(func: Callable, guild_id: int, *args):
+    """Run a server config call, skipping the thread hop once it is cached."""
+    if config.is_server_config_cached(guild_id):
+        return func(guild_id, *args)
+    return await run_db(func, guild_id, *args)
+
+async def get_server_config(guild_id: int) -> Dict[str, Any]:
+    """Get server configuration."""
+    return await _run_config(config.get_server_config, guild_id)
+
+async def get_server_config_entry(guild_id: int) -> Dict[str, Any]:
+    """Get the shared read-only cached config entry for a guild."""
+    return await _run_config(config.get_server_config_entry, guild_id)
+
+async def update_server_config(guild_id: int, server_config: Dict[str, Any]) -> bool:
+    """Update server configuration."""
+    return await run_db(config.update_server_config, guild_id, server_config)
+
+async def is_module_enabled(module_name: str, guild_id: int) -> bool:
+    """Check if a module is enabled for a guild."""
+    if config.is_server_config_cached(guild_id):
+        return config.is_module_enabled(module_name, guild_id)
+    return await run_db(config.is_module_enabled, module_name, guild_id)
+
+# Raw key-value access
+async def db_get(key: str, default: Any = None) -> Any:
+    """Get a raw database value."""
+    return await run_db(db.get, key, default)
+
+async def db_set(key: str, value: Any):
+    """Set a raw database value."""
+    await run_db(db.set, key, value)
+
+async def db_delete(key: str):
+    """Delete a raw database value."""
+    await run_db(db.delete, key)
+
+async def db_keys(prefix: str = '') -> Tuple[str, ...]:
+    """List raw database keys starting with prefix."""
+    return await run_db(db.prefix, prefix)
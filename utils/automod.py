@@ -0,0 +1,134 @@
+import logging
+from collections import deque
+from typing import Dict, Optional, List, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+class WordMatcher:
+    """Aho–Corasick automaton that finds any of a set of words in one pass.
+
+    Matching is plain substring matching, like `word in text`, but costs
+    O(len(text)) regardless of how many words are in the list.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]
+
+        for word in words:
+            word = word.strip().lower()
+            if word:
+                self._add(word)
+        self._build_links()
+
+    def _add(self, word: str):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state] = word
+
+    def _build_links(self):
+        """Compute failure links breadth-first."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Inherit matches that end at the fallback state
+                if self._output[next_state] is None:
+                    self._output[next_state] = self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Optional[str]:
+        """Return the first listed word found in text, or None."""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+def find_repetition(text: str, max_period: int = 10, min_repeats: int = 4) -> bool:
+    """Check for a chunk of 1..max_period characters repeated min_repeats times in a row.
+
+    Equivalent to the regex `(.{1,10})\\1{3,}` but linear: for each period p
+    it tracks how many consecutive positions satisfy text[i] == text[i - p].
+    Newlines break runs, matching regex `.` semantics.
+    """
+    length = len(text)
+    for period in range(1, max_period + 1):
+        needed = period * (min_repeats - 1)
+        if period + needed > length:
+            break
+        run = 0
+        for i in range(period, length):
+            if text[i] == text[i - period] and text[i] != '\n':
+                run += 1
+                if run >= needed:
+                    # The window text[i - needed - period + 1 : i + 1] repeats with this period
+                    return True
+            else:
+                run = 0
+    return False
+
+def is_mostly_caps(text: str, min_letters: int = 10, min_ratio: float = 0.7) -> bool:
+    """Check whether at least min_ratio of text's letters are capitals.
+
+    Messages with fewer than min_letters letters never count, so short
+    shouted words and acronyms ("HELLO", "NASA") pass.
+    """
+    letters = 0
+    capitals = 0
+    for char in text:
+        if char.isalpha():
+            letters += 1
+            if char.isupper():
+                capitals += 1
+    return letters >= min_letters and capitals >= min_ratio * letters
+
+class AutomodFilters:
+    """Compiled word matchers: one shared default, plus lazily built per-guild ones."""
+
+    def __init__(self, default_words: Iterable[str]):
+        self.default_words = tuple(default_words)
+        self.default_matcher = WordMatcher(self.default_words)
+        # guild_id -> (custom word list the matcher was built from, matcher)
+        self._guild_matchers: Dict[int, Tuple[List[str], WordMatcher]] = {}
+
+    def matcher_for(self, guild_id: int, custom_words: Optional[List[str]]) -> WordMatcher:
+        """Get the matcher for a guild, compiling it only when its word list changes."""
+        if not custom_words:
+            self._guild_matchers.pop(guild_id, None)
+            return self.default_matcher
+
+        cached = self._guild_matchers.get(guild_id)
+        # Config entries are replaced on update, so an identical list object means no change
+        if cached and cached[0] is custom_words:
+            return cached[1]
+        if cached and cached[0] == custom_words:
+            self._guild_matchers[guild_id] = (custom_words, cached[1])
+            return cached[1]
+
+        matcher = WordMatcher(self.default_words + tuple(custom_words))
+        self._guild_matchers[guild_id] = (custom_words, matcher)
+        return matcher
+
+    def find_word(self, guild_id: int, custom_words: Optional[List[str]], content: str) -> Optional[str]:
+        """Return the first filtered word found in lowered content, or None."""
+        return self.matcher_for(guild_id, custom_words).find(content)
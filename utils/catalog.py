@@ -0,0 +1,153 @@
+from typing import Dict, Any, Optional, List, Iterable, Set
+from utils.constants import SHOP_ITEMS, CRAFTING_RECIPES
+
+def _ngrams(text: str, n: int) -> Set[str]:
+    """Get the character n-grams of text, padded so short words still produce some."""
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+class _TrieNode:
+    __slots__ = ('children', 'names')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        # Every name below this node, in catalog order
+        self.names: List[str] = []
+
+class NameIndex:
+    """Case-insensitive lookup over a fixed set of names.
+
+    Holds an exact-name hash, a prefix trie and an n-gram index. The n-gram
+    index serves both substring search (a fragment's n-grams must all appear
+    in a match) and "did you mean" ranking by n-gram overlap, so neither
+    walks the whole name list. Results keep the order names were given in.
+    """
+
+    def __init__(self, names: Iterable[str], n: int = 3):
+        self.n = n
+        self._order: Dict[str, int] = {}
+        self._by_lower: Dict[str, str] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._trie = _TrieNode()
+        for name in names:
+            self._add(name)
+
+    def _add(self, name: str):
+        lowered = name.lower()
+        if lowered in self._by_lower:
+            return
+        self._order[name] = len(self._order)
+        self._by_lower[lowered] = name
+
+        node = self._trie
+        node.names.append(name)
+        for char in lowered:
+            node = node.children.setdefault(char, _TrieNode())
+            node.names.append(name)
+
+        grams = _ngrams(lowered, self.n)
+        self._grams[name] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(name)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def get(self, name: str) -> Optional[str]:
+        """Get the canonical spelling of name (case-insensitive exact match)."""
+        return self._by_lower.get(name.lower())
+
+    def starting_with(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Get names starting with prefix."""
+        node = self._trie
+        for char in prefix.lower():
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.names[:limit]
+
+    def containing(self, fragment: str, limit: Optional[int] = None) -> List[str]:
+        """Get names containing fragment."""
+        lowered = fragment.lower()
+        # Only n-grams made entirely of the fragment's own characters are guaranteed in a match
+        grams = {lowered[i:i + self.n] for i in range(len(lowered) - self.n + 1)}
+        if grams:
+            candidates = set.intersection(*(self._postings.get(gram, set()) for gram in grams))
+        else:
+            candidates = self._order
+        matches = sorted((name for name in candidates if lowered in name.lower()), key=self._order.__getitem__)
+        return matches[:limit]
+
+    def resolve(self, query: str) -> Optional[str]:
+        """Resolve user input to a name: exact match, then prefix, then substring."""
+        name = self.get(query)
+        if name is not None:
+            return name
+        matches = self.starting_with(query, 1) or self.containing(query, 1)
+        return matches[0] if matches else None
+
+    def suggest(self, query: str, limit: int = 5, min_score: float = 0.3) -> List[str]:
+        """Get names similar to query, best first.
+
+        Substring matches come first; the rest are ranked by the Dice
+        coefficient of their n-grams with the query's.
+        """
+        lowered = query.lower()
+        matches = self.containing(lowered, limit)
+        if len(matches) >= limit:
+            return matches
+
+        query_grams = _ngrams(lowered, self.n)
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for name in self._postings.get(gram, ()):
+                shared[name] = shared.get(name, 0) + 1
+
+        scored = []
+        for name, common in shared.items():
+            if name in matches:
+                continue
+            score = 2 * common / (len(query_grams) + len(self._grams[name]))
+            if score >= min_score:
+                scored.append((-score, self._order[name], name))
+        scored.sort()
+        return matches + [name for _, _, name in scored[:limit - len(matches)]]
+
+class ItemCatalog:
+    """Shop items and crafting recipes, indexed once for name resolution.
+
+    Shop data stays in utils.constants; this only precomputes the lookups
+    the cogs need: item data and category by exact name, plus NameIndexes
+    for prefix, substring and fuzzy matching of user input.
+    """
+
+    def __init__(self, shop_items: Dict[str, Dict[str, Dict[str, Any]]],
+                 recipes: Dict[str, Dict[str, Any]]):
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._categories: Dict[str, str] = {}
+        for category, items in shop_items.items():
+            for item_name, item_data in items.items():
+                self._items[item_name] = item_data
+                self._categories[item_name] = category
+        self._recipes = recipes
+        self.shop = NameIndex(self._items)
+        self.recipes = NameIndex(recipes)
+
+    def item_data(self, item_name: str) -> Optional[Dict[str, Any]]:
+        """Get a shop item's data by its exact name."""
+        return self._items.get(item_name)
+
+    def category(self, item_name: str) -> Optional[str]:
+        """Get a shop item's category by its exact name (None for non-shop items)."""
+        return self._categories.get(item_name)
+
+    def recipe(self, recipe_name: str) -> Optional[Dict[str, Any]]:
+        """Get a crafting recipe by its exact name."""
+        return self._recipes.get(recipe_name)
+
+# Global item catalog instance
+catalog = ItemCatalog(SHOP_ITEMS, CRAFTING_RECIPES)
@@ -0,0 +1,233 @@
+import time
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
+from config import AI_CONFIG
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message overhead (dict, datetime, ids) on top of the content itself
+_MESSAGE_OVERHEAD = 200
+
+def _message_size(message: Dict[str, Any]) -> int:
+    return _MESSAGE_OVERHEAD + len(message['content'])
+
+class _Conversation:
+    __slots__ = ('messages', 'size', 'last_active', 'summary', 'cached_at')
+
+    def __init__(self, messages: List[Dict[str, Any]], summary: Optional[Dict[str, Any]] = None):
+        self.messages = messages
+        self.size = sum(_message_size(message) for message in messages)
+        self.last_active: Optional[float] = None  # monotonic time of the last AI exchange
+        self.cached_at = datetime.now()
+        # Running summary of older messages: {'text': str, 'until': epoch time of the last message it covers}
+        self.summary = summary
+        if summary:
+            self.size += len(summary['text'])
+
+    def newest(self) -> datetime:
+        """Get the time TTL eviction measures from: the newest message, or when an empty channel was cached."""
+        return self.messages[-1]['timestamp'] if self.messages else self.cached_at
+
+class ConversationCache:
+    """LRU + TTL cache of recent AI conversation history per channel.
+
+    Messages older than ttl are dropped when a channel is read, and channels
+    whose newest message has expired are evicted from the LRU end. The cache holds at most
+    max_channels channels and roughly max_bytes of message data; evicted
+    channels are reloaded from the conversation log on their next use.
+    """
+
+    def __init__(self, max_channels: int = 500, max_bytes: int = 5_000_000,
+                 ttl: float = 7200, history_length: int = 20):
+        self.max_channels = max_channels
+        self.max_bytes = max_bytes
+        self.ttl = timedelta(seconds=ttl)
+        self.history_length = history_length
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def _expire(self, conversation: _Conversation, cutoff: datetime) -> int:
+        """Drop messages older than cutoff; messages are in time order."""
+        messages = conversation.messages
+        stale = 0
+        while stale < len(messages) and messages[stale]['timestamp'] <= cutoff:
+            stale += 1
+        if stale:
+            freed = sum(_message_size(message) for message in messages[:stale])
+            del messages[:stale]
+            conversation.size -= freed
+            self._bytes -= freed
+            self.stats['expired'] += stale
+        return stale
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Get a channel's unexpired messages, or None if it isn't cached."""
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if conversation is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self._conversations.move_to_end(key)
+            self._expire(conversation, datetime.now() - self.ttl)
+            return conversation.messages
+
+    def peek(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Get a channel's messages without touching LRU order or counters."""
+        with self._lock:
+            conversation = self._conversations.get(key)
+            return conversation.messages if conversation else None
+
+    def put(self, key: str, messages: List[Dict[str, Any]],
+            summary: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Cache messages loaded from storage, unless another load got there first."""
+        with self._lock:
+            existing = self._conversations.get(key)
+            if existing is not None:
+                return existing.messages
+            if summary:
+                # Stored timestamps are whole seconds, so keep the boundary second
+                # rather than risk dropping messages the summary doesn't cover
+                covered = datetime.fromtimestamp(int(summary['until']))
+                messages = [message for message in messages if message['timestamp'] >= covered]
+            conversation = _Conversation(list(messages[-self.history_length:]), summary)
+            self._conversations[key] = conversation
+            self._bytes += conversation.size
+            self._expire(conversation, datetime.now() - self.ttl)
+            self._evict()
+            return conversation.messages
+
+    def append(self, key: str, message: Dict[str, Any]):
+        """Add a message to a channel, keeping only the most recent history_length."""
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if conversation is None:
+                conversation = _Conversation([])
+                self._conversations[key] = conversation
+            else:
+                self._conversations.move_to_end(key)
+
+            conversation.messages.append(message)
+            added = _message_size(message)
+            conversation.size += added
+            self._bytes += added
+            overflow = len(conversation.messages) - self.history_length
+            if overflow > 0:
+                freed = sum(_message_size(old) for old in conversation.messages[:overflow])
+                del conversation.messages[:overflow]
+                conversation.size -= freed
+                self._bytes -= freed
+            self._evict()
+
+    def get_summary(self, key: str) -> Optional[str]:
+        """Get the running summary of a channel's older messages."""
+        with self._lock:
+            conversation = self._conversations.get(key)
+            return conversation.summary['text'] if conversation and conversation.summary else None
+
+    def apply_summary(self, key: str, summary: Dict[str, Any]) -> bool:
+        """Replace a channel's summary and drop the messages it covers.
+
+        Returns False if the channel was evicted or cleared in the meantime.
+        """
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if conversation is None:
+                return False
+            old_size = conversation.size
+            covered = datetime.fromtimestamp(summary['until'])
+            messages = conversation.messages
+            while messages and messages[0]['timestamp'] <= covered:
+                conversation.size -= _message_size(messages.pop(0))
+            if conversation.summary:
+                conversation.size -= len(conversation.summary['text'])
+            conversation.summary = summary
+            conversation.size += len(summary['text'])
+            self._bytes += conversation.size - old_size
+            return True
+
+    def mark_active(self, key: str):
+        """Record an AI exchange in a channel for conversation continuation."""
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if conversation is not None:
+                conversation.last_active = time.monotonic()
+
+    def is_active(self, key: str, timeout: float) -> bool:
+        """Check whether a channel had an AI exchange within timeout seconds."""
+        with self._lock:
+            conversation = self._conversations.get(key)
+            return (conversation is not None and conversation.last_active is not None
+                    and time.monotonic() - conversation.last_active <= timeout)
+
+    def is_recent_participant(self, key: str, user_id: str, timeout: float, last_messages: int = 5) -> bool:
+        """Check whether a channel is active and user_id wrote one of its last few messages."""
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if (conversation is None or conversation.last_active is None
+                    or time.monotonic() - conversation.last_active > timeout):
+                return False
+            return any(message.get('user_id') == user_id for message in conversation.messages[-last_messages:])
+
+    def active_count(self, timeout: float) -> int:
+        """Count channels with an AI exchange within timeout seconds."""
+        cutoff = time.monotonic() - timeout
+        with self._lock:
+            return sum(1 for conversation in self._conversations.values()
+                       if conversation.last_active is not None and conversation.last_active >= cutoff)
+
+    def discard(self, key: str):
+        """Forget a channel."""
+        with self._lock:
+            conversation = self._conversations.pop(key, None)
+            if conversation is not None:
+                self._bytes -= conversation.size
+
+    def _evict(self):
+        """Drop expired channels from the LRU end, then enforce the channel and byte budgets."""
+        cutoff = datetime.now() - self.ttl
+        while self._conversations:
+            key, conversation = next(iter(self._conversations.items()))
+            # Empty channels expire a ttl after they were cached, so a known-empty history isn't reloaded meanwhile
+            if conversation.newest() > cutoff:
+                break
+            del self._conversations[key]
+            self._bytes -= conversation.size
+            self.stats['evictions'] += 1
+
+        while self._conversations and (len(self._conversations) > self.max_channels
+                                       or self._bytes > self.max_bytes):
+            _, conversation = self._conversations.popitem(last=False)
+            self._bytes -= conversation.size
+            self.stats['evictions'] += 1
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get cache size and hit rate statistics."""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'channels': len(self._conversations),
+                'max_channels': self.max_channels,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+                **self.stats
+            }
+
+# Global conversation cache instance
+conversation_cache = ConversationCache(
+    max_channels=AI_CONFIG['cache_max_channels'],
+    max_bytes=AI_CONFIG['cache_max_bytes'],
+    ttl=AI_CONFIG['history_ttl'],
+    history_length=AI_CONFIG['history_length']
+)
+register_metrics('conversation_cache', conversation_cache.get_metrics)
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+import logging
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+from config import AI_CONFIG
+from utils.storage import db
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# Compact role codes used in encoded records
+_ROLE_CODES = {'user': 'u', 'assistant': 'a'}
+_CODE_ROLES = {code: role for role, code in _ROLE_CODES.items()}
+# Record written to an otherwise empty log once it has been checked for a legacy conversation
+_CHECKED_MARKER = '"checked"'
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """Encode a conversation message as one compact JSON line."""
+    return json.dumps(
+        [
+            _ROLE_CODES.get(message['role'], message['role']),
+            int(message['timestamp'].timestamp()),
+            message.get('user_id'),
+            message['content']
+        ],
+        separators=(',', ':'),
+        ensure_ascii=False
+    )
+
+def decode_message(record: str) -> Dict[str, Any]:
+    """Decode a record written by encode_message."""
+    role, timestamp, user_id, content = json.loads(record)
+    return {
+        'role': _CODE_ROLES.get(role, role),
+        'content': content,
+        'timestamp': datetime.fromtimestamp(timestamp),
+        'user_id': user_id
+    }
+
+class ConversationLog:
+    """Append-only, write-behind persistence for AI conversation history.
+
+    Each channel's messages go to a storage log as compact JSON lines.
+    Appends are buffered in memory and written in one batch per log by a
+    background flush, and a log is compacted down to its most recent
+    messages once enough appends have accumulated.
+    """
+
+    def __init__(self, keep_messages: int = 20, compact_threshold: int = 50):
+        self.keep_messages = keep_messages
+        self.compact_threshold = compact_threshold
+        self._pending: Dict[str, List[str]] = {}
+        self._appended: Dict[str, int] = {}  # log -> records appended since last compaction
+        self._lock = threading.Lock()
+        self.stats = {
+            'records_written': 0,
+            'flushes': 0,
+            'compactions': 0,
+            'flush_errors': 0
+        }
+
+    def append(self, conversation_key: str, message: Dict[str, Any]):
+        """Queue a message for the next flush."""
+        record = encode_message(message)
+        with self._lock:
+            self._pending.setdefault(conversation_key, []).append(record)
+
+    def load(self, conversation_key: str) -> List[Dict[str, Any]]:
+        """Load a conversation's most recent messages, including unflushed ones."""
+        records = db.read_log(f"conversation_{conversation_key}")
+        if not records:
+            records = self._import_legacy(conversation_key)
+        records = [record for record in records if record != _CHECKED_MARKER]
+        with self._lock:
+            records = records + self._pending.get(conversation_key, [])
+
+        messages = []
+        for record in records[-self.keep_messages:]:
+            try:
+                messages.append(decode_message(record))
+            except (ValueError, TypeError) as e:
+                logger.error(f"Skipping corrupt conversation record in {conversation_key}: {e}")
+        return messages
+
+    def _import_legacy(self, conversation_key: str) -> List[str]:
+        """Move a conversation saved as one full list into the log format."""
+        legacy_key = f"conversation_{conversation_key}"
+        legacy = db.get(legacy_key)
+        if not legacy:
+            # Leave a marker so later loads of this still-empty log skip the legacy read
+            db.append_log(legacy_key, [_CHECKED_MARKER])
+            return []
+
+        records = []
+        for message in legacy[-self.keep_messages:]:
+            try:
+                message = dict(message, timestamp=datetime.fromisoformat(message['timestamp']))
+                records.append(encode_message(message))
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"Skipping legacy conversation message in {conversation_key}: {e}")
+
+        db.replace_log(legacy_key, records)
+        del db[legacy_key]
+        logger.info(f"Imported {len(records)} legacy messages for conversation {conversation_key}")
+        return records
+
+    def flush(self) -> int:
+        """Write all queued records, one append per conversation."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        written = 0
+        for conversation_key, records in pending.items():
+            log_name = f"conversation_{conversation_key}"
+            try:
+                db.append_log(log_name, records)
+            except Exception as e:
+                logger.error(f"Error appending conversation log {conversation_key}: {e}")
+                self.stats['flush_errors'] += 1
+                with self._lock:
+                    # Requeue ahead of anything appended meanwhile
+                    self._pending[conversation_key] = records + self._pending.get(conversation_key, [])
+                continue
+
+            written += len(records)
+            appended = self._appended.get(conversation_key, 0) + len(records)
+            if appended >= self.compact_threshold:
+                self.compact(conversation_key)
+                appended = 0
+            self._appended[conversation_key] = appended
+
+        self.stats['records_written'] += written
+        self.stats['flushes'] += 1
+        return written
+
+    def compact(self, conversation_key: str):
+        """Rewrite a log keeping only its most recent messages."""
+        log_name = f"conversation_{conversation_key}"
+        try:
+            records = db.read_log(log_name)
+            db.replace_log(log_name, records[-self.keep_messages:])
+            self.stats['compactions'] += 1
+        except Exception as e:
+            logger.error(f"Error compacting conversation log {conversation_key}: {e}")
+
+    def clear(self, conversation_key: str):
+        """Delete a conversation's log and any queued records."""
+        with self._lock:
+            self._pending.pop(conversation_key, None)
+        self._appended.pop(conversation_key, None)
+        db.replace_log(f"conversation_{conversation_key}", [_CHECKED_MARKER])
+
+    async def run_flush_loop(self, interval: float, executor: Optional[Executor] = None):
+        """Periodically flush queued records off the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(executor, self.flush)
+            except Exception as e:
+                logger.error(f"Error in conversation log flush loop: {e}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get write and compaction statistics."""
+        with self._lock:
+            backlog = sum(len(records) for records in self._pending.values())
+        return {'pending_records': backlog, **self.stats}
+
+# Global conversation log instance
+conversation_log = ConversationLog(
+    keep_messages=AI_CONFIG['history_length'],
+    compact_threshold=AI_CONFIG['log_compact_threshold']
+)
+register_metrics('conversation_log', conversation_log.get_metrics)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from config import AI_CONFIG
+from utils.storage import db
+from utils.async_db import run_db
+from utils.ai_client import ai_client
+from utils.conversation_cache import conversation_cache
+from utils.prompt_builder import render_message
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+SummarizeFunc = Callable[[Optional[str], List[Dict[str, Any]]], Awaitable[str]]
+
+async def summarize_with_gemini(previous_summary: Optional[str], messages: List[Dict[str, Any]]) -> str:
+    """Fold messages into a running summary using the AI client."""
+    lines = "\n".join(render_message(message) for message in messages)
+    prompt = (
+        "Summarize this Discord conversation between users and an assistant in at most 5 short sentences. "
+        "Keep names, facts, preferences and open questions; drop greetings and small talk.\n\n"
+    )
+    if previous_summary:
+        prompt += f"Summary so far:\n{previous_summary}\n\n"
+    prompt += f"New messages:\n{lines}\n\nUpdated summary:"
+    return await ai_client.generate(prompt)
+
+class ConversationSummarizer:
+    """Compresses older conversation history into a running per-channel summary.
+
+    A channel is summarized once it has been idle for idle_seconds and holds
+    more than threshold messages: everything but the newest keep_recent is
+    folded into the summary, which is stored next to the conversation log.
+    The summarize function is injectable so a local stand-in can replace the
+    API.
+    """
+
+    def __init__(self, summarize: SummarizeFunc, threshold: int = 12, keep_recent: int = 6,
+                 idle_seconds: float = 120, max_summary_chars: int = 1000):
+        self.summarize = summarize
+        self.threshold = threshold
+        self.keep_recent = keep_recent
+        self.idle_seconds = idle_seconds
+        self.max_summary_chars = max_summary_chars
+        self._timers: Dict[str, asyncio.Task] = {}
+        self.stats = {'summaries': 0, 'messages_summarized': 0, 'failures': 0}
+
+    @staticmethod
+    def _key(conversation_key: str) -> str:
+        return f"conversation_summary_{conversation_key}"
+
+    def load(self, conversation_key: str) -> Optional[Dict[str, Any]]:
+        """Load a channel's stored summary."""
+        return db.get(self._key(conversation_key))
+
+    def save(self, conversation_key: str, summary: Dict[str, Any]):
+        """Store a channel's summary."""
+        db[self._key(conversation_key)] = summary
+
+    def delete(self, conversation_key: str):
+        """Delete a channel's stored summary."""
+        if self._key(conversation_key) in db:
+            del db[self._key(conversation_key)]
+
+    def schedule(self, conversation_key: str):
+        """(Re)start a channel's idle timer; called after every exchange."""
+        timer = self._timers.get(conversation_key)
+        if timer:
+            timer.cancel()
+        self._timers[conversation_key] = asyncio.create_task(self._run_when_idle(conversation_key))
+
+    def cancel(self, conversation_key: str):
+        """Stop a channel's pending summarization."""
+        timer = self._timers.pop(conversation_key, None)
+        if timer:
+            timer.cancel()
+
+    def cancel_all(self):
+        """Stop every pending summarization."""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+    async def _run_when_idle(self, conversation_key: str):
+        await asyncio.sleep(self.idle_seconds)
+        self._timers.pop(conversation_key, None)
+        await self.summarize_now(conversation_key)
+
+    async def summarize_now(self, conversation_key: str) -> bool:
+        """Fold a channel's older messages into its summary if it is over the threshold."""
+        messages = conversation_cache.peek(conversation_key)
+        if not messages or len(messages) <= self.threshold:
+            return False
+
+        older = list(messages[:-self.keep_recent])
+        try:
+            text = await self.summarize(conversation_cache.get_summary(conversation_key), older)
+        except Exception as e:
+            logger.error(f"Error summarizing conversation {conversation_key}: {e}")
+            self.stats['failures'] += 1
+            return False
+
+        summary = {
+            'text': text.strip()[:self.max_summary_chars],
+            'until': older[-1]['timestamp'].timestamp()
+        }
+        # The channel may have been cleared or evicted while the summary was generated
+        if not conversation_cache.apply_summary(conversation_key, summary):
+            return False
+        await run_db(self.save, conversation_key, summary)
+
+        self.stats['summaries'] += 1
+        self.stats['messages_summarized'] += len(older)
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get summarization statistics."""
+        return {'pending': len(self._timers), **self.stats}
+
+# Global conversation summarizer instance
+conversation_summarizer = ConversationSummarizer(
+    summarize_with_gemini,
+    threshold=AI_CONFIG['summary_threshold'],
+    keep_recent=AI_CONFIG['summary_keep_recent'],
+    idle_seconds=AI_CONFIG['summary_idle_seconds'],
+    max_summary_chars=AI_CONFIG['summary_max_chars']
+)
+register_metrics('conversation_summarizer', conversation_summarizer.get_metrics)
@@ -0,0 +1,218 @@
+import asyncio
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Dict, Any, Optional
+from config import PERFORMANCE_CONFIG
+from utils.constants import RPG_CONSTANTS
+from utils.storage import db
+from utils.user_cache import user_cache
+from utils.async_db import run_db
+from utils.helpers import to_epoch
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# Action -> cooldown in seconds
+COOLDOWN_ACTIONS = {
+    'work': RPG_CONSTANTS['work_cooldown'],
+    'daily': RPG_CONSTANTS['daily_cooldown'],
+    'adventure': RPG_CONSTANTS['adventure_cooldown'],
+    'dungeon': RPG_CONSTANTS['dungeon_cooldown'],
+    'battle': RPG_CONSTANTS['battle_cooldown']
+}
+
+class CooldownEngine:
+    """Per-user command cooldowns stored as epoch-second expiries.
+
+    Each user's cooldowns are one small {action: expiry} dict under
+    `cooldowns_{user_id}`. Checks are served from memory and starts are
+    written back in batches. Cached entries are re-read from storage after
+    sync_interval seconds, keeping the later expiry per action, so several
+    processes sharing a database converge on the same cooldowns. Actions
+    reset since the last flush skip that merge until the reset is written,
+    so a refunded cooldown can't be revived from its stale stored expiry.
+    """
+
+    def __init__(self, durations: Dict[str, int], sync_interval: float = 30,
+                 max_users: int = 10000, flush_batch_size: int = 100):
+        self.durations = durations
+        self.sync_interval = sync_interval
+        self.max_users = max_users
+        self.flush_batch_size = flush_batch_size
+        # user_id -> [{action: expiry}, monotonic time loaded from storage, actions reset since last flush]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self.stats = {'hits': 0, 'loads': 0, 'started': 0, 'blocked': 0, 'flushed': 0, 'flush_errors': 0}
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"cooldowns_{user_id}"
+
+    def _seed_from_profile(self, user_id: str) -> Dict[str, int]:
+        """Build expiries from a profile's last_* times for users without stored cooldowns."""
+        user_data = user_cache.get(user_id) or {}
+        profile = user_data.get('rpg_data') or {}
+        expiries = {}
+        for action, duration in self.durations.items():
+            last_used = to_epoch(profile.get(f"last_{action}"))
+            if last_used is not None:
+                expiries[action] = last_used + duration
+        return expiries
+
+    def _load(self, user_id: str) -> Dict[str, int]:
+        """Read a user's cooldowns from storage and merge them into memory."""
+        stored = db.get(self._key(user_id))
+        if stored is None:
+            stored = self._seed_from_profile(user_id)
+        now = int(time.time())
+
+        with self._lock:
+            self.stats['loads'] += 1
+            entry = self._entries.get(user_id)
+            if entry is None:
+                entry = [{}, 0.0, set()]
+                self._entries[user_id] = entry
+            expiries, _, resets = entry
+            for action, expiry in stored.items():
+                if action in resets:
+                    continue
+                if expiry > now and expiry > expiries.get(action, 0):
+                    expiries[action] = expiry
+            entry[1] = time.monotonic()
+            self._evict()
+            return expiries
+
+    async def _expiries(self, user_id: str) -> Dict[str, int]:
+        """Get a user's expiries, loading them off the event loop when missing or stale."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] <= self.sync_interval:
+                self._entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return entry[0]
+        return await run_db(self._load, user_id)
+
+    async def remaining(self, user_id: str, action: str) -> int:
+        """Get seconds until action is ready for user_id (0 if ready)."""
+        expiries = await self._expiries(user_id)
+        return max(0, expiries.get(action, 0) - int(time.time()))
+
+    async def try_start(self, user_id: str, action: str) -> int:
+        """Start action's cooldown if it is ready.
+
+        Returns 0 when the cooldown was started, otherwise the seconds left.
+        The check and start are atomic, so concurrent invocations can't both
+        pass.
+        """
+        while True:
+            await self._expiries(user_id)
+            now = int(time.time())
+            with self._lock:
+                # Re-read under the lock: the entry may have been evicted since it was loaded
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    continue
+                expiries, _, resets = entry
+                expiry = expiries.get(action, 0)
+                if expiry > now:
+                    self.stats['blocked'] += 1
+                    return expiry - now
+                expiries[action] = now + self.durations[action]
+                resets.discard(action)
+                self._dirty.add(user_id)
+                self.stats['started'] += 1
+                return 0
+
+    def reset(self, user_id: str, action: str):
+        """Clear a started cooldown, e.g. when the command failed."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0].pop(action, None) is not None:
+                entry[2].add(action)
+                self._dirty.add(user_id)
+
+    async def get_all(self, user_id: str) -> Dict[str, int]:
+        """Get seconds remaining for every action (0 if ready)."""
+        expiries = await self._expiries(user_id)
+        now = int(time.time())
+        return {action: max(0, expiries.get(action, 0) - now) for action in self.durations}
+
+    def _evict(self):
+        """Drop least recently used users above the limit, writing unsaved ones first."""
+        while len(self._entries) > self.max_users:
+            user_id, (expiries, _, _) = self._entries.popitem(last=False)
+            if user_id in self._dirty:
+                self._dirty.discard(user_id)
+                try:
+                    db.set(self._key(user_id), dict(expiries))
+                except Exception as e:
+                    logger.error(f"Error writing evicted cooldowns for {user_id}: {e}")
+                    self.stats['flush_errors'] += 1
+
+    def flush(self) -> int:
+        """Write dirty users' unexpired cooldowns to storage in batches."""
+        written = 0
+        while True:
+            now = int(time.time())
+            with self._lock:
+                if not self._dirty:
+                    return written
+                batch_ids = [user_id for _, user_id in zip(range(self.flush_batch_size), self._dirty)]
+                batch = {}
+                flushed_resets = {}
+                for user_id in batch_ids:
+                    self._dirty.discard(user_id)
+                    entry = self._entries.get(user_id)
+                    if entry is not None:
+                        batch[self._key(user_id)] = {a: e for a, e in entry[0].items() if e > now}
+                        flushed_resets[user_id] = set(entry[2])
+
+            try:
+                db.set_many(batch)
+            except Exception as e:
+                logger.error(f"Error flushing cooldowns for {len(batch)} users: {e}")
+                with self._lock:
+                    self.stats['flush_errors'] += 1
+                    self._dirty.update(user_id for user_id in batch_ids if user_id in self._entries)
+                return written
+
+            written += len(batch)
+            with self._lock:
+                self.stats['flushed'] += len(batch)
+                # Storage no longer holds the reset expiries, so normal merging can resume
+                for user_id, actions in flushed_resets.items():
+                    entry = self._entries.get(user_id)
+                    if entry is not None:
+                        entry[2].difference_update(actions)
+
+    async def run_flush_loop(self, interval: float, executor: Optional[Executor] = None):
+        """Periodically flush started cooldowns off the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(executor, self.flush)
+            except Exception as e:
+                logger.error(f"Error in cooldown flush loop: {e}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get cache and flush statistics."""
+        with self._lock:
+            return {
+                'cached_users': len(self._entries),
+                'dirty_backlog': len(self._dirty),
+                **self.stats
+            }
+
+# Global cooldown engine instance
+cooldowns = CooldownEngine(
+    COOLDOWN_ACTIONS,
+    sync_interval=PERFORMANCE_CONFIG['cooldown_sync_interval'],
+    max_users=PERFORMANCE_CONFIG['rate_tracker_max_keys'],
+    flush_batch_size=PERFORMANCE_CONFIG['flush_batch_size']
+)
+register_metrics('cooldowns', cooldowns.get_metrics)
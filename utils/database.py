@@ -1,18 +1,31 @@
-import json
+import copy
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+from typing import Dict, Any, Optional, List, Collection
 from datetime import datetime
-from replit import db
+from utils.storage import db, LEADERBOARD_FIELDS
+from utils.user_cache import user_cache
+from utils.leaderboard import leaderboard_index
+from utils.helpers import now_epoch, to_epoch
+from utils.models import PlayerProfile, Inventory
 
 logger = logging.getLogger(__name__)
 
+# Serializes read-modify-write of shared blobs across database worker threads
+_blob_lock = threading.Lock()
+
+# Profile times stored as integer epoch seconds, top-level and inside rpg_data
+PROFILE_TIME_FIELDS = ('created_at', 'last_active')
+RPG_TIME_FIELDS = ('last_work', 'last_daily', 'last_adventure', 'last_dungeon')
+# Version 2: profile times moved from ISO strings to epoch seconds
+# Version 3: inventories moved from item lists to {item: quantity} dicts
+PROFILE_SCHEMA_VERSION = 3
+
 # Database initialization
 def init_database():
     """Initialize database with default structures."""
     try:
         # Create default structures if they don't exist
-        if 'users' not in db:
-            db['users'] = {}
         if 'guilds' not in db:
             db['guilds'] = {}
         if 'global_stats' not in db:
@@ -22,19 +35,95 @@ def init_database():
                 'total_guilds': 0,
                 'created_at': datetime.now().isoformat()
             }
+        migrate_users_blob()
+        migrate_profiles()
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
         raise
 
+def migrate_users_blob() -> int:
+    """Move profiles from the legacy monolithic 'users' blob to per-user keys."""
+    try:
+        if 'users' not in db:
+            return 0
+
+        users = db.get('users', {})
+        # Never clobber a profile that was already written on its own
+        pending = {
+            user_id: user_data for user_id, user_data in users.items()
+            if not db.has_user(user_id)
+        }
+        db.set_users(pending)
+        migrated = len(pending)
+
+        del db['users']
+        logger.info(f"Migrated {migrated} user profiles out of the users blob")
+        return migrated
+    except Exception as e:
+        logger.error(f"Error migrating users blob: {e}")
+        return 0
+
+def _epoch_fields(section: Dict[str, Any], fields) -> bool:
+    """Convert a section's ISO string times to epoch seconds; returns whether any changed."""
+    changed = False
+    for field in fields:
+        value = section.get(field)
+        if isinstance(value, str):
+            section[field] = to_epoch(value)
+            changed = True
+    return changed
+
+def _count_inventory(rpg_data: Dict[str, Any]) -> bool:
+    """Convert a legacy list inventory to counted form; returns whether it changed."""
+    inventory = rpg_data.get('inventory')
+    if not isinstance(inventory, list):
+        return False
+    rpg_data['inventory'] = Inventory.from_stored(inventory).to_dict()
+    return True
+
+def migrate_profiles(batch_size: int = 500) -> int:
+    """Upgrade stored profiles to the current schema.
+
+    Converts ISO string times to epoch seconds and list inventories to
+    counted ones; each profile is only rewritten if something changed.
+    """
+    try:
+        if db.get('profile_schema_version', 1) >= PROFILE_SCHEMA_VERSION:
+            return 0
+
+        migrated = 0
+        batch = {}
+        for user_id, user_data in db.iter_users():
+            rpg_data = user_data.get('rpg_data') or {}
+            changed = _epoch_fields(user_data, PROFILE_TIME_FIELDS)
+            changed = _epoch_fields(rpg_data, RPG_TIME_FIELDS) or changed
+            changed = _count_inventory(rpg_data) or changed
+            if changed:
+                batch[user_id] = user_data
+            if len(batch) >= batch_size:
+                db.set_users(batch)
+                migrated += len(batch)
+                batch = {}
+        if batch:
+            db.set_users(batch)
+            migrated += len(batch)
+
+        db['profile_schema_version'] = PROFILE_SCHEMA_VERSION
+        logger.info(f"Migrated {migrated} user profiles to schema version {PROFILE_SCHEMA_VERSION}")
+        return migrated
+    except Exception as e:
+        logger.error(f"Error migrating user profiles: {e}")
+        return 0
+
 # User data management
 def ensure_user_exists(user_id: str) -> bool:
     """Ensure user exists in database."""
     try:
-        users = db.get('users', {})
-        if user_id not in users:
-            users[user_id] = create_user_profile(user_id)
-            db['users'] = users
+        if user_cache.get(user_id) is None:
+            user_data = create_user_profile(user_id)
+            user_cache.put(user_id, user_data)
+            leaderboard_index.update(user_id, user_data)
             logger.info(f"Created user profile for {user_id}")
             return True
         return True
@@ -44,44 +133,12 @@ def ensure_user_exists(user_id: str) -> bool:
 
 def create_user_profile(user_id: str) -> Dict[str, Any]:
     """Create a new user profile."""
+    now = now_epoch()
     return {
         'user_id': user_id,
-        'created_at': datetime.now().isoformat(),
-        'last_active': datetime.now().isoformat(),
-        'rpg_data': {
-            'level': 1,
-            'xp': 0,
-            'max_xp': 100,
-            'hp': 100,
-            'max_hp': 100,
-            'attack': 10,
-            'defense': 5,
-            'coins': 100,
-            'inventory': [],
-            'equipped': {
-                'weapon': None,
-                'armor': None,
-                'accessory': None
-            },
-            'stats': {
-                'total_xp_earned': 0,
-                'total_coins_earned': 0,
-                'battles_won': 0,
-                'battles_lost': 0,
-                'adventures_completed': 0,
-                'dungeons_completed': 0
-            },
-            'achievements': [],
-            'guild_id': None,
-            'guild_rank': 'member',
-            'last_work': None,
-            'last_daily': None,
-            'last_adventure': None,
-            'last_dungeon': None,
-            'work_count': 0,
-            'adventure_count': 0,
-            'dungeon_count': 0
-        },
+        'created_at': now,
+        'last_active': now,
+        'rpg_data': PlayerProfile().to_dict(),
         'settings': {
             'notifications': True,
             'public_profile': True,
@@ -89,28 +146,30 @@ def create_user_profile(user_id: str) -> Dict[str, Any]:
         }
     }
 
+def _touch(user_data: Dict[str, Any]):
+    """Bump a profile's last active time."""
+    user_data['last_active'] = now_epoch()
+
 def get_user_data(user_id: str) -> Optional[Dict[str, Any]]:
-    """Get user data from database."""
+    """Get user data from the user cache."""
     try:
-        users = db.get('users', {})
-        user_data = users.get(user_id)
-        if user_data:
-            # Update last active
-            user_data['last_active'] = datetime.now().isoformat()
-            users[user_id] = user_data
-            db['users'] = users
-        return user_data
+        user_data = user_cache.get(user_id)
+        if user_data is None:
+            return None
+        # Update last active; persisted by the next write-behind flush
+        user_cache.mutate(user_id, _touch)
+        return copy.deepcopy(user_data)
     except Exception as e:
         logger.error(f"Error getting user data for {user_id}: {e}")
         return None
 
 def update_user_data(user_id: str, data: Dict[str, Any]) -> bool:
-    """Update user data in database."""
+    """Update user data in the user cache."""
     try:
-        users = db.get('users', {})
-        data['last_active'] = datetime.now().isoformat()
-        users[user_id] = data
-        db['users'] = users
+        data = copy.deepcopy(data)
+        _touch(data)
+        user_cache.put(user_id, data)
+        leaderboard_index.update(user_id, data)
         return True
     except Exception as e:
         logger.error(f"Error updating user data for {user_id}: {e}")
@@ -119,26 +178,66 @@ def update_user_data(user_id: str, data: Dict[str, Any]) -> bool:
 def get_user_rpg_data(user_id: str) -> Optional[Dict[str, Any]]:
     """Get user RPG data specifically."""
     try:
-        user_data = get_user_data(user_id)
-        return user_data.get('rpg_data') if user_data else None
+        user_data = user_cache.get(user_id)
+        if user_data is None:
+            return None
+        user_cache.mutate(user_id, _touch)
+        rpg_data = user_data.get('rpg_data')
+        return copy.deepcopy(rpg_data) if rpg_data is not None else None
     except Exception as e:
         logger.error(f"Error getting RPG data for {user_id}: {e}")
         return None
 
+def _store_rpg_data(user_id: str, rpg_data: Dict[str, Any]) -> bool:
+    """Replace a cached profile's rpg_data with a dict the caller no longer mutates."""
+    def apply(user_data: Dict[str, Any]):
+        user_data['rpg_data'] = rpg_data
+        _touch(user_data)
+
+    if not user_cache.mutate(user_id, apply):
+        return False
+    leaderboard_index.update(user_id, {'rpg_data': rpg_data})
+    return True
+
 def update_user_rpg_data(user_id: str, rpg_data: Dict[str, Any]) -> bool:
     """Update user RPG data specifically."""
     try:
-        users = db.get('users', {})
-        if user_id in users:
-            users[user_id]['rpg_data'] = rpg_data
-            users[user_id]['last_active'] = datetime.now().isoformat()
-            db['users'] = users
-            return True
-        return False
+        return _store_rpg_data(user_id, copy.deepcopy(rpg_data))
     except Exception as e:
         logger.error(f"Error updating RPG data for {user_id}: {e}")
         return False
 
+def get_player_profile(user_id: str) -> Optional[PlayerProfile]:
+    """Get user RPG data as a PlayerProfile; nested sections are copied only when used."""
+    try:
+        user_data = user_cache.get(user_id)
+        if user_data is None:
+            return None
+        user_cache.mutate(user_id, _touch)
+        rpg_data = user_data.get('rpg_data')
+        return PlayerProfile.from_dict(rpg_data) if rpg_data is not None else None
+    except Exception as e:
+        logger.error(f"Error getting player profile for {user_id}: {e}")
+        return None
+
+def save_player_profile(user_id: str, player: PlayerProfile) -> bool:
+    """Save a PlayerProfile back to the user's rpg_data."""
+    try:
+        # to_dict() already builds fresh containers for every section it changed
+        return _store_rpg_data(user_id, player.to_dict())
+    except Exception as e:
+        logger.error(f"Error saving player profile for {user_id}: {e}")
+        return False
+
+def get_user_count() -> int:
+    """Get the number of stored user profiles."""
+    try:
+        user_cache.flush_all()
+        return db.count_users()
+    except Exception as e:
+        logger.error(f"Error counting users: {e}")
+        return 0
+
 # Guild data management
 def get_guild_data(guild_id: str) -> Optional[Dict[str, Any]]:
     """Get guild data from database."""
@@ -152,10 +251,11 @@ def get_guild_data(guild_id: str) -> Optional[Dict[str, Any]]:
 def update_guild_data(guild_id: str, data: Dict[str, Any]) -> bool:
     """Update guild data in database."""
     try:
-        guilds = db.get('guilds', {})
-        data['last_updated'] = datetime.now().isoformat()
-        guilds[guild_id] = data
-        db['guilds'] = guilds
+        with _blob_lock:
+            guilds = db.get('guilds', {})
+            data['last_updated'] = datetime.now().isoformat()
+            guilds[guild_id] = data
+            db['guilds'] = guilds
         return True
     except Exception as e:
         logger.error(f"Error updating guild data for {guild_id}: {e}")
@@ -187,48 +287,141 @@ def create_guild_profile(guild_id: str, name: str) -> Dict[str, Any]:
         }
     }
 
+# Warning management
+# Per-user warning lists live under warnings_{guild_id}_{user_id}; each guild also
+# keeps a warning_index_{guild_id} record with its running aggregates.
+_warnings_lock = threading.Lock()
+
+def _empty_warning_index() -> Dict[str, Any]:
+    return {
+        'total': 0,
+        'users': {},  # user_id -> warning count
+        'reasons': {},  # reason -> warning count
+        'moderators': {}  # moderator_id -> warnings issued
+    }
+
+def _count_warning(index: Dict[str, Any], user_id: str, warning: Dict[str, Any], step: int):
+    """Add (step=1) or remove (step=-1) one warning from the aggregates."""
+    for section, key in (('users', user_id),
+                         ('reasons', warning.get('reason', '')),
+                         ('moderators', str(warning.get('moderator_id')))):
+        counts = index[section]
+        counts[key] = counts.get(key, 0) + step
+        if counts[key] <= 0:
+            del counts[key]
+    index['total'] += step
+
+def _load_warning_index(guild_id: int) -> Dict[str, Any]:
+    """Get a guild's warning index, building it once from legacy per-user keys."""
+    index = db.get(f"warning_index_{guild_id}")
+    if index is not None:
+        return index
+
+    index = _empty_warning_index()
+    prefix = f"warnings_{guild_id}_"
+    for key in db.prefix(prefix):
+        user_id = key[len(prefix):]
+        for warning in db.get(key, []):
+            _count_warning(index, user_id, warning, 1)
+    db[f"warning_index_{guild_id}"] = index
+    logger.info(f"Built warning index for guild {guild_id}: {index['total']} warnings")
+    return index
+
+def add_warning(user_id: int, guild_id: int, reason: str, moderator_id: int) -> int:
+    """Add a warning to a user and return their new warning count."""
+    try:
+        warning = {
+            'reason': reason,
+            'moderator_id': moderator_id,
+            'timestamp': datetime.now().isoformat()
+        }
+        warnings_key = f"warnings_{guild_id}_{user_id}"
+
+        with _warnings_lock:
+            index = _load_warning_index(guild_id)
+            warnings = db.get(warnings_key, [])
+            warnings.append(warning)
+            _count_warning(index, str(user_id), warning, 1)
+            db.set_many({warnings_key: warnings, f"warning_index_{guild_id}": index})
+            return len(warnings)
+    except Exception as e:
+        logger.error(f"Error adding warning: {e}")
+        return 0
+
+def get_user_warnings(user_id: int, guild_id: int) -> List[Dict[str, Any]]:
+    """Get a user's warnings."""
+    try:
+        return db.get(f"warnings_{guild_id}_{user_id}", [])
+    except Exception as e:
+        logger.error(f"Error getting warnings: {e}")
+        return []
+
+def clear_user_warnings(user_id: int, guild_id: int) -> int:
+    """Clear a user's warnings and return how many were removed."""
+    try:
+        warnings_key = f"warnings_{guild_id}_{user_id}"
+
+        with _warnings_lock:
+            index = _load_warning_index(guild_id)
+            warnings = db.get(warnings_key, [])
+            if not warnings:
+                return 0
+            for warning in warnings:
+                _count_warning(index, str(user_id), warning, -1)
+            db[f"warning_index_{guild_id}"] = index
+            del db[warnings_key]
+            return len(warnings)
+    except Exception as e:
+        logger.error(f"Error clearing warnings: {e}")
+        return 0
+
+def get_warning_stats(guild_id: int) -> Dict[str, Any]:
+    """Get a guild's warning aggregates."""
+    try:
+        with _warnings_lock:
+            index = _load_warning_index(guild_id)
+        return {
+            'total_warnings': index['total'],
+            'warned_users': len(index['users']),
+            'reasons': index['reasons'],
+            'moderators': index['moderators']
+        }
+    except Exception as e:
+        logger.error(f"Error getting warning stats for {guild_id}: {e}")
+        return {'total_warnings': 0, 'warned_users': 0, 'reasons': {}, 'moderators': {}}
+
 # Leaderboard functions
-def get_leaderboard(category: str, limit: int = 10) -> List[Dict[str, Any]]:
-    """Get leaderboard for a specific category."""
+def get_leaderboard(category: str, limit: int = 10,
+                    member_ids: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+    """Get leaderboard for a specific category, optionally limited to member_ids."""
     try:
-        users = db.get('users', {})
-        leaderboard = []
-        
-        for user_id, user_data in users.items():
-            rpg_data = user_data.get('rpg_data', {})
-            
-            if category == 'level':
-                value = rpg_data.get('level', 1)
-            elif category == 'coins':
-                value = rpg_data.get('coins', 0)
-            elif category == 'xp':
-                value = rpg_data.get('stats', {}).get('total_xp_earned', 0)
-            elif category == 'battles':
-                value = rpg_data.get('stats', {}).get('battles_won', 0)
-            else:
-                continue
-                
-            leaderboard.append({
-                'user_id': user_id,
-                'value': value,
-                'level': rpg_data.get('level', 1)
-            })
-        
-        # Sort by value (descending)
-        leaderboard.sort(key=lambda x: x['value'], reverse=True)
-        return leaderboard[:limit]
+        if category not in LEADERBOARD_FIELDS:
+            return []
+        return leaderboard_index.top(category, limit, member_ids)
     except Exception as e:
         logger.error(f"Error getting leaderboard for {category}: {e}")
         return []
 
+def get_leaderboard_rank(category: str, user_id: str,
+                         member_ids: Optional[Collection[str]] = None) -> Optional[int]:
+    """Get a user's 1-based leaderboard rank, optionally among member_ids."""
+    try:
+        if category not in LEADERBOARD_FIELDS:
+            return None
+        return leaderboard_index.rank(category, user_id, member_ids)
+    except Exception as e:
+        logger.error(f"Error getting leaderboard rank for {user_id}: {e}")
+        return None
+
 # Statistics functions
 def update_global_stats(stat_name: str, increment: int = 1) -> bool:
     """Update global statistics."""
     try:
-        stats = db.get('global_stats', {})
-        stats[stat_name] = stats.get(stat_name, 0) + increment
-        stats['last_updated'] = datetime.now().isoformat()
-        db['global_stats'] = stats
+        with _blob_lock:
+            stats = db.get('global_stats', {})
+            stats[stat_name] = stats.get(stat_name, 0) + increment
+            stats['last_updated'] = datetime.now().isoformat()
+            db['global_stats'] = stats
         return True
     except Exception as e:
         logger.error(f"Error updating global stats: {e}")
@@ -246,8 +439,9 @@ def get_global_stats() -> Dict[str, Any]:
 def backup_database() -> bool:
     """Create a backup of the database."""
     try:
+        user_cache.flush_all()
         backup_data = {
-            'users': dict(db.get('users', {})),
+            'users': dict(db.iter_users()),
             'guilds': dict(db.get('guilds', {})),
             'global_stats': dict(db.get('global_stats', {})),
             'backup_timestamp': datetime.now().isoformat()
@@ -265,25 +459,16 @@ def backup_database() -> bool:
 def cleanup_old_data(days: int = 30) -> bool:
     """Clean up old inactive user data."""
     try:
-        users = db.get('users', {})
-        cutoff_date = datetime.now().timestamp() - (days * 24 * 60 * 60)
+        cutoff = now_epoch() - (days * 24 * 60 * 60)
+        user_cache.flush_all()
         
-        inactive_users = []
-        for user_id, user_data in users.items():
-            last_active = user_data.get('last_active')
-            if last_active:
-                try:
-                    last_active_dt = datetime.fromisoformat(last_active)
-                    if last_active_dt.timestamp() < cutoff_date:
-                        inactive_users.append(user_id)
-                except:
-                    pass
+        inactive_users = db.inactive_user_ids(cutoff)
         
         # Remove inactive users
         for user_id in inactive_users:
-            del users[user_id]
+            user_cache.delete(user_id)
+            leaderboard_index.remove(user_id)
         
-        db['users'] = users
         logger.info(f"Cleaned up {len(inactive_users)} inactive users")
         return True
     except Exception as e:
@@ -1,9 +1,11 @@
 import discord
 import random
 import math
+import time
 from typing import Dict, Any, Optional, List, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
+from utils.models import PlayerProfile
 
 logger = logging.getLogger(__name__)
 
@@ -43,47 +45,35 @@ def calculate_level_xp(level: int) -> int:
     """Calculate XP required for a level."""
     return int(100 * (level ** 1.5))
 
-def level_up_player(player_data: Dict[str, Any]) -> Optional[str]:
+def level_up_player(player: PlayerProfile) -> Optional[str]:
     """Check if player levels up and apply level up bonuses."""
     try:
-        current_level = player_data.get('level', 1)
-        current_xp = player_data.get('xp', 0)
-        max_xp = player_data.get('max_xp', 100)
-        
         level_up_msg = None
         
         # Check for level up
-        while current_xp >= max_xp:
-            current_xp -= max_xp
-            current_level += 1
+        while player.xp >= player.max_xp:
+            player.xp -= player.max_xp
+            player.level += 1
             
             # Calculate new max XP
-            max_xp = calculate_level_xp(current_level)
+            player.max_xp = calculate_level_xp(player.level)
             
             # Apply level up bonuses
             hp_bonus = random.randint(5, 15)
             attack_bonus = random.randint(2, 8)
             defense_bonus = random.randint(1, 5)
             
-            player_data['level'] = current_level
-            player_data['xp'] = current_xp
-            player_data['max_xp'] = max_xp
-            player_data['max_hp'] += hp_bonus
-            player_data['hp'] = player_data['max_hp']  # Full heal on level up
-            player_data['attack'] += attack_bonus
-            player_data['defense'] += defense_bonus
+            player.max_hp += hp_bonus
+            player.hp = player.max_hp  # Full heal on level up
+            player.attack += attack_bonus
+            player.defense += defense_bonus
             
             level_up_msg = (
-                f"Level {current_level}! "
+                f"Level {player.level}! "
                 f"HP +{hp_bonus}, ATK +{attack_bonus}, DEF +{defense_bonus}"
             )
             
-            logger.info(f"Player leveled up to {current_level}")
-        
-        # Update player data
-        player_data['level'] = current_level
-        player_data['xp'] = current_xp
-        player_data['max_xp'] = max_xp
+            logger.info(f"Player leveled up to {player.level}")
         
         return level_up_msg
     except Exception as e:
@@ -150,23 +140,32 @@ def get_random_adventure_outcome() -> Dict[str, Any]:
     ]
     return random.choice(outcomes)
 
-def get_time_until_next_use(last_use: Optional[str], cooldown_seconds: int) -> int:
-    """Get time remaining until next use."""
-    if not last_use:
-        return 0
-    
+def now_epoch() -> int:
+    """Get the current time as integer epoch seconds, the format profiles store."""
+    return int(time.time())
+
+def to_epoch(value: Any) -> Optional[int]:
+    """Convert a stored timestamp to epoch seconds; accepts ints and legacy ISO strings."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
     try:
-        last_use_dt = datetime.fromisoformat(last_use)
-        next_use_dt = last_use_dt + timedelta(seconds=cooldown_seconds)
-        now = datetime.now()
-        
-        if now >= next_use_dt:
-            return 0
-        
-        return int((next_use_dt - now).total_seconds())
-    except Exception as e:
-        logger.error(f"Error calculating time until next use: {e}")
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+def seconds_since(timestamp: Any) -> Optional[int]:
+    """Get seconds elapsed since a stored timestamp, or None if it is unset."""
+    epoch = to_epoch(timestamp)
+    return None if epoch is None else now_epoch() - epoch
+
+def get_time_until_next_use(last_use: Optional[int], cooldown_seconds: int) -> int:
+    """Get time remaining until next use."""
+    elapsed = seconds_since(last_use)
+    if elapsed is None:
         return 0
+    return max(0, cooldown_seconds - elapsed)
 
 def format_time_remaining(seconds: int) -> str:
     """Format seconds into human-readable time."""
@@ -300,3 +299,63 @@ def calculate_luck_modifier(luck_score: int) -> float:
         return 1.1  # Above average
     else:
         return 1.2  # Very lucky
+
+def _fence_state(text: str, language: Optional[str]) -> Optional[str]:
+    """Track code fences through text; returns the open block's language or None."""
+    start = 0
+    while True:
+        fence = text.find('```', start)
+        if fence == -1:
+            return language
+        if language is None:
+            line_end = text.find('\n', fence + 3)
+            language = text[fence + 3:line_end if line_end != -1 else len(text)].strip()
+        else:
+            language = None
+        start = fence + 3
+
+def split_message(text: str, limit: int = 2000) -> List[str]:
+    """Split text into Discord-sized chunks without breaking words or code blocks.
+
+    Chunks end at a newline or space where possible. A code block that has to
+    span chunks is closed at the end of one and reopened, with its language,
+    at the start of the next.
+    """
+    chunks = []
+    language = None
+    while text:
+        prefix = f"```{language}\n" if language is not None else ""
+        if len(prefix) + len(text) <= limit:
+            if text.strip():
+                chunks.append(prefix + text)
+            break
+
+        # Leave room to close a code block at the end of the chunk
+        budget = limit - len(prefix) - 4
+        window = text[:budget]
+
+        cut = window.rfind('\n')
+        if cut < budget // 2:
+            cut = max(cut, window.rfind(' '))
+        if cut <= 0:
+            cut = budget  # a single unbroken run longer than a chunk
+
+        # Rather than splitting a short code block, start it in the next chunk
+        if _fence_state(window[:cut], language) is not None and language is None:
+            block_start = window.rfind('```', 0, cut)
+            if block_start > 0:
+                cut = block_start
+
+        body = text[:cut]
+        text = text[cut:]
+        if text[:1] in ('\n', ' '):
+            text = text[1:]
+
+        language = _fence_state(body, language)
+        if not body.strip():
+            continue
+        chunk = prefix + body.rstrip()
+        if language is not None:
+            chunk += "\n```"
+        chunks.append(chunk)
+    return chunks
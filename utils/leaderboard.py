@@ -0,0 +1,180 @@
+import bisect
+import threading
+import logging
+from typing import Dict, Any, Optional, List, Tuple, Collection
+from utils.storage import db, LEADERBOARD_FIELDS, get_leaderboard_value
+from utils.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+class LeaderboardIndex:
+    """Ranked per-category indexes of user leaderboard values.
+
+    Each category keeps a list of (-value, user_id) tuples in ascending order,
+    so the best players come first and ties break by user id. The index is
+    built once from storage and then kept current by the profile update
+    helpers in utils.database, making top-N reads a slice and rank lookups a
+    binary search.
+    """
+
+    def __init__(self, top_depth: int = 10):
+        # Ranks shown on a board; only changes within them bump a category's version
+        self.top_depth = top_depth
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._loaded = False
+        # Changes seen while the index is being built; user_id -> profile, or None if removed
+        self._building = False
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._ranked: Dict[str, List[Tuple[int, str]]] = {category: [] for category in LEADERBOARD_FIELDS}
+        self._values: Dict[str, Dict[str, int]] = {category: {} for category in LEADERBOARD_FIELDS}
+        self._levels: Dict[str, int] = {}
+        self._versions: Dict[str, int] = {category: 0 for category in LEADERBOARD_FIELDS}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self):
+        """Build the index from storage on first use.
+
+        The scan runs without holding the index lock, so profile updates on
+        the event loop don't wait for it; updates made meanwhile are queued
+        and replayed once the new index is swapped in.
+        """
+        if self._loaded:
+            return
+        with self._build_lock:
+            if self._loaded:
+                return
+            with self._lock:
+                self._building = True
+                self._pending = {}
+            try:
+                # Pending profile writes must be visible to the storage scan
+                user_cache.flush_all()
+                levels = {}
+                values = {category: {} for category in LEADERBOARD_FIELDS}
+                for user_id, user_data in db.iter_users():
+                    levels[user_id] = user_data.get('rpg_data', {}).get('level', 1)
+                    for category, category_values in values.items():
+                        category_values[user_id] = get_leaderboard_value(user_data, category)
+                ranked = {
+                    category: sorted((-value, user_id) for user_id, value in category_values.items())
+                    for category, category_values in values.items()
+                }
+            except Exception:
+                with self._lock:
+                    self._building = False
+                    self._pending = {}
+                raise
+
+            with self._lock:
+                self._levels = levels
+                self._values = values
+                self._ranked = ranked
+                for category in self._versions:
+                    self._versions[category] += 1
+                for user_id, user_data in self._pending.items():
+                    if user_data is None:
+                        self._remove(user_id)
+                    else:
+                        self._apply(user_id, user_data)
+                self._pending = {}
+                self._building = False
+                self._loaded = True
+            logger.info(f"Built leaderboard index for {len(levels)} users")
+
+    def _apply(self, user_id: str, user_data: Dict[str, Any]):
+        """Move a user to their current position in every category."""
+        self._levels[user_id] = user_data.get('rpg_data', {}).get('level', 1)
+        for category, ranked in self._ranked.items():
+            value = get_leaderboard_value(user_data, category)
+            old_value = self._values[category].get(user_id)
+            if old_value == value:
+                continue
+            old_position = None
+            if old_value is not None:
+                old_position = bisect.bisect_left(ranked, (-old_value, user_id))
+                del ranked[old_position]
+            new_position = bisect.bisect_left(ranked, (-value, user_id))
+            ranked.insert(new_position, (-value, user_id))
+            self._values[category][user_id] = value
+            if min(new_position, self.top_depth if old_position is None else old_position) < self.top_depth:
+                self._versions[category] += 1
+
+    def update(self, user_id: str, user_data: Dict[str, Any]):
+        """Record a changed profile; ignored until the index is built."""
+        if not self._loaded and not self._building:
+            return
+        with self._lock:
+            if self._loaded:
+                self._apply(user_id, user_data)
+            elif self._building:
+                self._pending[user_id] = user_data
+
+    def _remove(self, user_id: str):
+        self._levels.pop(user_id, None)
+        for category, ranked in self._ranked.items():
+            old_value = self._values[category].pop(user_id, None)
+            if old_value is None:
+                continue
+            position = bisect.bisect_left(ranked, (-old_value, user_id))
+            del ranked[position]
+            if position < self.top_depth:
+                self._versions[category] += 1
+
+    def remove(self, user_id: str):
+        """Drop a user from every category."""
+        if not self._loaded and not self._building:
+            return
+        with self._lock:
+            if self._loaded:
+                self._remove(user_id)
+            elif self._building:
+                self._pending[user_id] = None
+
+    def top(self, category: str, limit: int = 10,
+            member_ids: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+        """Get the highest ranked users, optionally only those in member_ids."""
+        self.ensure_loaded()
+        with self._lock:
+            ranked = self._ranked[category]
+            if member_ids is None:
+                entries = ranked[:limit]
+            else:
+                entries = []
+                for entry in ranked:
+                    if entry[1] in member_ids:
+                        entries.append(entry)
+                        if len(entries) >= limit:
+                            break
+            return [
+                {'user_id': user_id, 'value': -neg_value, 'level': self._levels.get(user_id, 1)}
+                for neg_value, user_id in entries
+            ]
+
+    def rank(self, category: str, user_id: str,
+             member_ids: Optional[Collection[str]] = None) -> Optional[int]:
+        """Get a user's 1-based rank, or None if they are not ranked."""
+        self.ensure_loaded()
+        with self._lock:
+            value = self._values[category].get(user_id)
+            if value is None:
+                return None
+            ranked = self._ranked[category]
+            position = bisect.bisect_left(ranked, (-value, user_id))
+            if member_ids is None:
+                return position + 1
+            return sum(1 for _, other_id in ranked[:position] if other_id in member_ids) + 1
+
+    def version(self, category: str) -> int:
+        """Get a counter that changes whenever the category's top_depth entries change."""
+        return self._versions[category]
+
+    def size(self) -> int:
+        """Get the number of ranked users."""
+        return len(self._levels)
+
+# Global leaderboard index instance
+leaderboard_index = LeaderboardIndex()
@@ -0,0 +1,122 @@
+import time
+import logging
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+import discord
+from utils.async_db import get_server_config_entry
+from utils.metrics import register_metrics
+from utils.text_normalizer import strip_mentions, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Stage order; lower runs first
+AUTOMOD_STAGE = 100
+COMMAND_STAGE = 200
+AI_STAGE = 300
+
+class MessageContext:
+    """Per-message state shared by every pipeline stage.
+
+    Guild config and the normalized content are computed once here instead of
+    separately in each listener. Derived forms of the content are computed on
+    first use, so stages that return early never pay for them.
+    """
+
+    def __init__(self, message: discord.Message, config_entry: Optional[Dict[str, Any]]):
+        self.message = message
+        self.guild_id = message.guild.id if message.guild else None
+        self.is_dm = isinstance(message.channel, discord.DMChannel)
+        self.content = message.content
+        self.lowered = message.content.lower()
+        # Read-only cached config entry; None outside guilds
+        self.config_entry = config_entry
+        self.config = config_entry['config'] if config_entry else None
+        self.is_command = False
+        self.stopped = False
+        self._tokens = None
+        self._clean_content = None
+        self._normalized = None
+
+    @property
+    def tokens(self) -> List[str]:
+        """Whitespace-split lowered content, computed on first use."""
+        if self._tokens is None:
+            self._tokens = self.lowered.split()
+        return self._tokens
+
+    @property
+    def clean_content(self) -> str:
+        """Content with user mentions stripped, computed on first use."""
+        if self._clean_content is None:
+            self._clean_content = strip_mentions(self.content)
+        return self._clean_content
+
+    @property
+    def normalized(self) -> str:
+        """Lowered content without mentions and with collapsed whitespace, computed on first use."""
+        if self._normalized is None:
+            self._normalized = normalize_text(self.content)
+        return self._normalized
+
+    def stop(self):
+        """Skip every remaining stage for this message."""
+        self.stopped = True
+
+class MessagePipeline:
+    """Ordered message handlers run once per incoming message."""
+
+    def __init__(self):
+        self._stages: List[Tuple[int, str, Callable[[MessageContext], Awaitable[None]]]] = []
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def add_stage(self, name: str, handler: Callable[[MessageContext], Awaitable[None]], order: int):
+        """Register a stage, replacing any stage with the same name."""
+        self.remove_stage(name)
+        self._stages.append((order, name, handler))
+        self._stages.sort(key=lambda stage: stage[0])
+        self._timings.setdefault(name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'stopped': 0})
+
+    def remove_stage(self, name: str):
+        """Unregister a stage."""
+        self._stages = [stage for stage in self._stages if stage[1] != name]
+
+    async def dispatch(self, message: discord.Message):
+        """Run a message through every stage until one stops it."""
+        if message.author.bot:
+            return
+        if not message.guild and not isinstance(message.channel, discord.DMChannel):
+            return
+
+        config_entry = await get_server_config_entry(message.guild.id) if message.guild else None
+        ctx = MessageContext(message, config_entry)
+
+        for _, name, handler in list(self._stages):
+            start = time.perf_counter()
+            try:
+                await handler(ctx)
+            except Exception as e:
+                logger.error(f"Error in message pipeline stage {name}: {e}")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            timing = self._timings[name]
+            timing['calls'] += 1
+            timing['total_ms'] += elapsed_ms
+            timing['max_ms'] = max(timing['max_ms'], elapsed_ms)
+            if ctx.stopped:
+                timing['stopped'] += 1
+                break
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get per-stage timing statistics."""
+        return {
+            name: {
+                'calls': timing['calls'],
+                'avg_ms': round(timing['total_ms'] / timing['calls'], 3) if timing['calls'] else 0.0,
+                'max_ms': round(timing['max_ms'], 3),
+                'stopped': timing['stopped']
+            }
+            for name, timing in self._timings.items()
+        }
+
+# Global message pipeline instance
+message_pipeline = MessagePipeline()
+register_metrics('message_pipeline', message_pipeline.get_metrics)
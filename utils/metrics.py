@@ -0,0 +1,26 @@
+import logging
+from typing import Dict, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# Component name -> callable returning a JSON-serializable metrics dict
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+def register_metrics(name: str, provider: Callable[[], Dict[str, Any]]):
+    """Register a metrics provider reported by the /metrics endpoint."""
+    _providers[name] = provider
+
+def unregister_metrics(name: str):
+    """Remove a metrics provider."""
+    _providers.pop(name, None)
+
+def collect_metrics() -> Dict[str, Any]:
+    """Collect metrics from every registered provider."""
+    collected = {}
+    for name, provider in list(_providers.items()):
+        try:
+            collected[name] = provider()
+        except Exception as e:
+            logger.error(f"Error collecting metrics for {name}: {e}")
+            collected[name] = {'error': str(e)}
+    return collected
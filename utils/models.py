@@ -0,0 +1,333 @@
+import copy
+import logging
+from dataclasses import dataclass, field, fields
+from typing import Dict, Any, Optional, List, Iterator, Tuple, Union
+from utils.catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+# Tag on packed profiles; dict profiles are the legacy, unpacked form
+PACKED_PROFILE_VERSION = 1
+
+class _MappingCompat:
+    """Dict-style access for code that still treats models as profile dicts.
+
+    Known fields map to attributes; anything else lives in the extra dict so
+    keys written by older code survive a round trip.
+    """
+
+    __slots__ = ()
+    _FIELDS: frozenset = frozenset()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELDS:
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key in self._FIELDS:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._FIELDS or key in self.extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._FIELDS:
+            return getattr(self, key)
+        return self.extra.get(key, default)
+
+@dataclass(slots=True)
+class RPGStats(_MappingCompat):
+    """Lifetime counters kept in a profile's stats section."""
+
+    total_xp_earned: int = 0
+    total_coins_earned: int = 0
+    battles_won: int = 0
+    battles_lost: int = 0
+    adventures_completed: int = 0
+    dungeons_completed: int = 0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> 'RPGStats':
+        data = data or {}
+        stats = cls(**{name: data[name] for name in STATS_FIELDS if name in data})
+        stats.extra = {key: value for key, value in data.items() if key not in cls._FIELDS}
+        return stats
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in STATS_FIELDS}
+        data.update(self.extra)
+        return data
+
+STATS_FIELDS = tuple(f.name for f in fields(RPGStats) if f.name != 'extra')
+RPGStats._FIELDS = frozenset(STATS_FIELDS)
+
+# Item categories, in the order the inventory embed lists them
+ITEM_CATEGORIES = ('weapons', 'armor', 'consumables', 'accessories', 'materials')
+# Fallback classification for items that aren't sold in the shop
+_CATEGORY_KEYWORDS = (
+    ('weapons', ('sword', 'blade', 'bow', 'staff')),
+    ('armor', ('armor', 'shield', 'helmet')),
+    ('consumables', ('potion', 'elixir', 'scroll')),
+    ('accessories', ('ring', 'amulet', 'cloak'))
+)
+
+def item_category(item_name: str) -> str:
+    """Get the inventory category of an item."""
+    category = catalog.category(item_name)
+    if category:
+        return category
+    lowered = item_name.lower()
+    for category, keywords in _CATEGORY_KEYWORDS:
+        if any(word in lowered for word in keywords):
+            return category
+    return 'materials'
+
+class Inventory:
+    """Item name -> quantity multiset with per-category and case-insensitive indexes.
+
+    Each distinct item is one stack; size limits count stacks, not units.
+    Stored as a {item: quantity} dict; legacy list inventories are counted
+    on load.
+    """
+
+    __slots__ = ('_counts', '_by_category', '_by_lower')
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None):
+        self._counts: Dict[str, int] = {}
+        self._by_category: Dict[str, Dict[str, None]] = {category: {} for category in ITEM_CATEGORIES}
+        # Lowercased name -> held items with that name, in insertion order
+        self._by_lower: Dict[str, Dict[str, None]] = {}
+        for item, quantity in (counts or {}).items():
+            self.add(item, quantity)
+
+    @classmethod
+    def from_stored(cls, raw: Union[Dict[str, int], List[str], None]) -> 'Inventory':
+        inventory = cls()
+        if isinstance(raw, dict):
+            for item, quantity in raw.items():
+                inventory.add(item, quantity)
+        else:
+            for item in raw or ():
+                inventory.add(item)
+        return inventory
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(self._counts)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __bool__(self) -> bool:
+        return bool(self._counts)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._counts
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._counts)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        return iter(self._counts.items())
+
+    def count(self, item: str) -> int:
+        return self._counts.get(item, 0)
+
+    def total(self) -> int:
+        """Get the number of units across all stacks."""
+        return sum(self._counts.values())
+
+    def has_room(self, item: str, max_stacks: int) -> bool:
+        """Check whether item can be added without exceeding max_stacks."""
+        return item in self._counts or len(self._counts) < max_stacks
+
+    def add(self, item: str, quantity: int = 1):
+        if quantity <= 0:
+            return
+        if item not in self._counts:
+            self._counts[item] = 0
+            self._by_category[item_category(item)][item] = None
+            self._by_lower.setdefault(item.lower(), {})[item] = None
+        self._counts[item] += quantity
+
+    def remove(self, item: str, quantity: int = 1) -> bool:
+        """Take quantity units of item; returns False (and changes nothing) if there aren't enough."""
+        have = self._counts.get(item, 0)
+        if quantity <= 0 or have < quantity:
+            return False
+        if have == quantity:
+            del self._counts[item]
+            del self._by_category[item_category(item)][item]
+            same_name = self._by_lower[item.lower()]
+            del same_name[item]
+            if not same_name:
+                del self._by_lower[item.lower()]
+        else:
+            self._counts[item] = have - quantity
+        return True
+
+    def in_category(self, category: str) -> List[str]:
+        """Get the items held in a category."""
+        return list(self._by_category.get(category, ()))
+
+    def find(self, name: str) -> Optional[str]:
+        """Resolve a user-typed name to a held item: exact, then case-insensitive, then partial."""
+        lowered = name.lower()
+        if name in self._counts:
+            return name
+        same_name = self._by_lower.get(lowered)
+        if same_name:
+            return next(iter(same_name))
+        return next((next(iter(items)) for item_lower, items in self._by_lower.items() if lowered in item_lower), None)
+
+# Scalar rpg_data fields and their defaults for new profiles
+PROFILE_DEFAULTS = {
+    'level': 1,
+    'xp': 0,
+    'max_xp': 100,
+    'hp': 100,
+    'max_hp': 100,
+    'attack': 10,
+    'defense': 5,
+    'coins': 100,
+    'guild_id': None,
+    'guild_rank': 'member',
+    'last_work': None,
+    'last_daily': None,
+    'last_adventure': None,
+    'last_dungeon': None,
+    'work_count': 0,
+    'adventure_count': 0,
+    'dungeon_count': 0,
+    'daily_streak': 0
+}
+SCALAR_FIELDS = tuple(PROFILE_DEFAULTS)
+EQUIPMENT_SLOTS = ('weapon', 'armor', 'accessory')
+
+# Nested sections: name -> (build a working copy from the stored value, convert back)
+_SECTIONS = {
+    'stats': (RPGStats.from_dict, RPGStats.to_dict),
+    'inventory': (Inventory.from_stored, Inventory.to_dict),
+    'equipped': (lambda raw: {**dict.fromkeys(EQUIPMENT_SLOTS), **(raw or {})}, dict),
+    'achievements': (lambda raw: list(raw or []), list)
+}
+SECTION_FIELDS = tuple(_SECTIONS)
+
+class PlayerProfile(_MappingCompat):
+    """A player's RPG state, built from a profile's rpg_data section.
+
+    Scalars are copied into slots. Nested sections stay as the stored values
+    until first accessed, when a working copy is made, so a command that only
+    touches coins and XP never copies the inventory or stats. to_dict() hands
+    untouched sections back as they were loaded.
+    """
+
+    __slots__ = SCALAR_FIELDS + ('_raw', '_loaded', 'extra')
+    _FIELDS = frozenset(SCALAR_FIELDS + SECTION_FIELDS)
+
+    def __init__(self, **values):
+        self._raw: Dict[str, Any] = {}
+        self._loaded: Dict[str, Any] = {}
+        self.extra: Dict[str, Any] = {}
+        for name, default in PROFILE_DEFAULTS.items():
+            setattr(self, name, values.pop(name, default))
+        for name, value in values.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PlayerProfile':
+        """Wrap rpg_data without copying its nested sections."""
+        profile = cls.__new__(cls)
+        profile._loaded = {}
+        profile._raw = {name: data[name] for name in SECTION_FIELDS if name in data}
+        for name, default in PROFILE_DEFAULTS.items():
+            setattr(profile, name, data.get(name, default))
+        profile.extra = copy.deepcopy({
+            key: value for key, value in data.items() if key not in cls._FIELDS
+        })
+        return profile
+
+    def _section(self, name: str) -> Any:
+        value = self._loaded.get(name)
+        if value is None:
+            value = _SECTIONS[name][0](self._raw.pop(name, None))
+            self._loaded[name] = value
+        return value
+
+    def _set_section(self, name: str, value: Any):
+        self._raw.pop(name, None)
+        self._loaded[name] = value
+
+    stats = property(lambda self: self._section('stats'),
+                     lambda self, value: self._set_section('stats', value))
+    inventory = property(lambda self: self._section('inventory'),
+                         lambda self, value: self._set_section('inventory', value))
+    equipped = property(lambda self: self._section('equipped'),
+                        lambda self, value: self._set_section('equipped', value))
+    achievements = property(lambda self: self._section('achievements'),
+                            lambda self, value: self._set_section('achievements', value))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert back to an rpg_data dict."""
+        data = {name: getattr(self, name) for name in SCALAR_FIELDS}
+        for name, (build, dump) in _SECTIONS.items():
+            if name in self._loaded:
+                data[name] = dump(self._loaded[name])
+            elif name in self._raw:
+                data[name] = self._raw[name]
+            else:
+                data[name] = dump(build(None))
+        data.update(copy.deepcopy(self.extra))
+        return data
+
+# Packed profiles store values positionally in the field order above instead of
+# repeating every key name in every stored profile.
+def _pack_rpg(rpg_data: Dict[str, Any]) -> List[Any]:
+    stats = rpg_data.get('stats') or {}
+    packed = [rpg_data.get(name, default) for name, default in PROFILE_DEFAULTS.items()]
+    packed.append([stats.get(name, 0) for name in STATS_FIELDS]
+                  + [{key: value for key, value in stats.items() if key not in RPGStats._FIELDS}])
+    packed.extend(rpg_data.get(name) for name in SECTION_FIELDS[1:])
+    packed.append({key: value for key, value in rpg_data.items() if key not in PlayerProfile._FIELDS})
+    return packed
+
+def _unpack_rpg(packed: List[Any]) -> Dict[str, Any]:
+    rpg_data = dict(zip(SCALAR_FIELDS, packed))
+    offset = len(SCALAR_FIELDS)
+    stats = packed[offset]
+    rpg_data['stats'] = {**dict(zip(STATS_FIELDS, stats)), **stats[-1]}
+    for index, name in enumerate(SECTION_FIELDS[1:], offset + 1):
+        if packed[index] is not None:
+            rpg_data[name] = packed[index]
+    rpg_data.update(packed[-1])
+    return rpg_data
+
+def pack_profile(user_data: Dict[str, Any]) -> List[Any]:
+    """Encode a stored user profile in the compact positional form."""
+    rpg_data = user_data.get('rpg_data')
+    return [
+        PACKED_PROFILE_VERSION,
+        user_data.get('user_id'),
+        user_data.get('created_at'),
+        user_data.get('last_active'),
+        user_data.get('settings'),
+        _pack_rpg(rpg_data) if rpg_data is not None else None,
+        {key: value for key, value in user_data.items()
+         if key not in ('user_id', 'created_at', 'last_active', 'settings', 'rpg_data')}
+    ]
+
+def unpack_profile(stored: Any) -> Dict[str, Any]:
+    """Decode a stored user profile; legacy dict profiles pass through unchanged."""
+    if isinstance(stored, dict):
+        return stored
+    _, user_id, created_at, last_active, settings, rpg_packed, extra = stored
+    user_data = {'user_id': user_id, 'created_at': created_at, 'last_active': last_active}
+    if rpg_packed is not None:
+        user_data['rpg_data'] = _unpack_rpg(rpg_packed)
+    if settings is not None:
+        user_data['settings'] = settings
+    user_data.update(extra)
+    return user_data
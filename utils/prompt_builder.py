@@ -0,0 +1,145 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+from config import AI_CONFIG
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYSTEM_PROMPT = """You are Epic-Maki, a friendly Discord bot for an RPG server. Be conversational and helpful.
+
+Key traits:
+- Keep responses SHORT (1-2 sentences max)
+- Be casual, warm, and engaging
+- Ask brief follow-up questions occasionally
+- Stay positive and encouraging
+- Chat naturally about any topic
+- Reference RPG/gaming themes when appropriate
+- Remember context from recent messages
+
+Goal: Be a fun, memorable chat companion without being wordy."""
+
+CUSTOM_PROMPT_SUFFIX = "Important: Keep responses SHORT (1-2 sentences max), casual, and engaging. Don't be overly verbose."
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count; about four characters per token for English text."""
+    return (len(text) + 3) // 4
+
+def render_message(message: Dict[str, Any]) -> str:
+    """Render a history message as a prompt line."""
+    speaker = "User" if message['role'] == 'user' else "Assistant"
+    return f"{speaker}: {message['content']}"
+
+class PromptBuilder:
+    """Assembles Gemini prompts within a token budget.
+
+    System prompts are built once per guild and persona. History is packed
+    newest-first until the budget runs out, and each message's rendered line
+    and token estimate are memoized in a bounded side table, so the history
+    dicts owned by the conversation cache are never modified.
+    """
+
+    def __init__(self, token_budget: int = 1200, max_cached_lines: int = 5000):
+        self.token_budget = token_budget
+        self.max_cached_lines = max_cached_lines
+        # id(message) -> (message, role, content, line, token estimate). Holding the
+        # message keeps its id from being reused; role/content detect edits.
+        self._lines: "OrderedDict[int, Tuple[Dict[str, Any], str, str, str, int]]" = OrderedDict()
+        # guild_id -> (custom prompt it was built from, system prompt, token estimate)
+        self._system_prompts: Dict[int, Tuple[str, str, int]] = {}
+        self.stats = {
+            'builds': 0,
+            'total_tokens': 0,
+            'max_tokens': 0,
+            'history_messages': 0,
+            'truncated': 0
+        }
+
+    def system_prompt(self, guild_id: int, custom_prompt: str) -> Tuple[str, int]:
+        """Get a guild's system prompt and its token estimate."""
+        cached = self._system_prompts.get(guild_id)
+        if cached and cached[0] == custom_prompt:
+            return cached[1], cached[2]
+
+        if custom_prompt:
+            text = f"{custom_prompt}\n\n{CUSTOM_PROMPT_SUFFIX}"
+        else:
+            text = DEFAULT_SYSTEM_PROMPT
+        tokens = estimate_tokens(text)
+        self._system_prompts[guild_id] = (custom_prompt, text, tokens)
+        return text, tokens
+
+    def _line(self, message: Dict[str, Any]) -> Tuple[str, int]:
+        key = id(message)
+        cached = self._lines.get(key)
+        if (cached is not None and cached[0] is message
+                and cached[1] == message['role'] and cached[2] == message['content']):
+            self._lines.move_to_end(key)
+            return cached[3], cached[4]
+
+        line = render_message(message)
+        tokens = estimate_tokens(line) + 1  # newline separator
+        self._lines[key] = (message, message['role'], message['content'], line, tokens)
+        self._lines.move_to_end(key)
+        if len(self._lines) > self.max_cached_lines:
+            self._lines.popitem(last=False)
+        return line, tokens
+
+    def build(self, guild_id: int, custom_prompt: str, history: List[Dict[str, Any]],
+              user_message: str, summary: Optional[str] = None) -> Tuple[str, List[str]]:
+        """Build a prompt for user_message; returns it with the history lines included."""
+        system_text, system_tokens = self.system_prompt(guild_id, custom_prompt)
+        if summary:
+            system_text = f"{system_text}\n\nSummary of the earlier conversation:\n{summary}"
+            system_tokens += estimate_tokens(summary) + 8
+        request_line = f"User: {user_message}"
+        remaining = self.token_budget - system_tokens - estimate_tokens(request_line)
+
+        # The message being answered is usually already the newest history entry
+        end = len(history)
+        if end and history[-1]['role'] == 'user' and history[-1]['content'] == user_message:
+            end -= 1
+
+        lines = []
+        index = end - 1
+        while index >= 0:
+            line, tokens = self._line(history[index])
+            if tokens > remaining:
+                break
+            lines.append(line)
+            remaining -= tokens
+            index -= 1
+        lines.reverse()
+
+        if lines:
+            context_text = "\n".join(lines)
+            prompt = f"{system_text}\n\nRecent conversation:\n{context_text}\n\n{request_line}"
+        else:
+            prompt = f"{system_text}\n\n{request_line}"
+
+        prompt_tokens = self.token_budget - remaining
+        self.stats['builds'] += 1
+        self.stats['total_tokens'] += prompt_tokens
+        self.stats['max_tokens'] = max(self.stats['max_tokens'], prompt_tokens)
+        self.stats['history_messages'] += len(lines)
+        if index >= 0:
+            self.stats['truncated'] += 1
+        return prompt, lines
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get prompt size statistics."""
+        builds = self.stats['builds']
+        return {
+            'token_budget': self.token_budget,
+            'builds': builds,
+            'avg_tokens': round(self.stats['total_tokens'] / builds, 1) if builds else 0.0,
+            'max_tokens': self.stats['max_tokens'],
+            'avg_history_messages': round(self.stats['history_messages'] / builds, 1) if builds else 0.0,
+            'truncated': self.stats['truncated'],
+            'cached_system_prompts': len(self._system_prompts),
+            'cached_lines': len(self._lines)
+        }
+
+# Global prompt builder instance
+prompt_builder = PromptBuilder(token_budget=AI_CONFIG['prompt_token_budget'])
+register_metrics('prompt_builder', prompt_builder.get_metrics)
@@ -0,0 +1,196 @@
+import time
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Any, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SlidingWindowCounter:
+    """Counts events per key over a sliding time window with bounded memory.
+
+    Each key keeps a deque of monotonic timestamps capped at max_events, so a
+    flooding key never holds more than that. Keys are kept in LRU order: keys
+    whose newest event has left the window are dropped as they reach the
+    front, and the least recently active key is evicted when max_keys is hit.
+    """
+
+    def __init__(self, window: float, max_events: int, max_keys: int = 10000):
+        self.window = window
+        self.max_events = max_events
+        self.max_keys = max_keys
+        self._events: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self.evictions = 0
+
+    def hit(self, key: Hashable, now: Optional[float] = None) -> int:
+        """Record an event for key and return its count within the window."""
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.window
+
+        events = self._events.get(key)
+        if events is None:
+            events = deque(maxlen=self.max_events)
+            self._events[key] = events
+        else:
+            self._events.move_to_end(key)
+
+        while events and events[0] <= cutoff:
+            events.popleft()
+        events.append(now)
+
+        self._evict(cutoff)
+        return len(events)
+
+    def count(self, key: Hashable, now: Optional[float] = None) -> int:
+        """Get the number of events for key within the window."""
+        events = self._events.get(key)
+        if not events:
+            return 0
+        cutoff = (time.monotonic() if now is None else now) - self.window
+        return sum(1 for ts in events if ts > cutoff)
+
+    def _evict(self, cutoff: float):
+        """Drop idle keys from the LRU end, then enforce the key cap."""
+        while self._events:
+            oldest_key, oldest_events = next(iter(self._events.items()))
+            if oldest_events and oldest_events[-1] > cutoff:
+                break
+            del self._events[oldest_key]
+            self.evictions += 1
+
+        while len(self._events) > self.max_keys:
+            self._events.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get tracker size statistics."""
+        return {
+            'tracked_keys': len(self._events),
+            'max_keys': self.max_keys,
+            'evictions': self.evictions
+        }
+
+class TokenBucketLimiter:
+    """Per-key token buckets with bounded memory.
+
+    Each key holds up to capacity tokens that refill continuously over period
+    seconds. A bucket that has refilled completely is the same as no bucket,
+    so idle keys are dropped from the LRU end and max_keys caps the rest.
+    """
+
+    def __init__(self, capacity: float, period: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.max_keys = max_keys
+        # key -> [tokens, monotonic time of last update]
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+        self.evictions = 0
+        self.rejections = 0
+
+    def _refill(self, key: Hashable, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.capacity
+        bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        return bucket[0]
+
+    def remaining(self, key: Hashable, now: Optional[float] = None) -> int:
+        """Get the number of whole tokens key could spend right now."""
+        now = time.monotonic() if now is None else now
+        return int(self._refill(key, now))
+
+    def retry_after(self, key: Hashable, cost: float = 1, now: Optional[float] = None) -> float:
+        """Get the seconds until key has cost tokens available."""
+        now = time.monotonic() if now is None else now
+        missing = cost - self._refill(key, now)
+        return max(0.0, missing / self.rate)
+
+    def consume(self, key: Hashable, cost: float = 1, now: Optional[float] = None) -> bool:
+        """Spend cost tokens from key's bucket if it has them."""
+        now = time.monotonic() if now is None else now
+        tokens = self._refill(key, now)
+        if tokens < cost:
+            self.rejections += 1
+            return False
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [tokens - cost, now]
+        else:
+            bucket[0] = tokens - cost
+            self._buckets.move_to_end(key)
+        self._evict(now)
+        return True
+
+    def _evict(self, now: float):
+        """Drop refilled buckets from the LRU end, then enforce the key cap."""
+        while self._buckets:
+            oldest_key, (tokens, updated) = next(iter(self._buckets.items()))
+            if tokens + (now - updated) * self.rate < self.capacity:
+                break
+            del self._buckets[oldest_key]
+            self.evictions += 1
+
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get bucket size and rejection statistics."""
+        return {
+            'tracked_keys': len(self._buckets),
+            'max_keys': self.max_keys,
+            'evictions': self.evictions,
+            'rejections': self.rejections
+        }
+
+class QuotaLimiter:
+    """Layered token-bucket quotas: per user, per guild and global.
+
+    A request is admitted only if every applicable bucket has a token, and
+    then takes one from each, so a rejected request costs nothing.
+    """
+
+    def __init__(self, user_limit: int, guild_limit: int, global_limit: int,
+                 period: float, max_keys: int = 10000):
+        self.scopes = {
+            'user': TokenBucketLimiter(user_limit, period, max_keys),
+            'guild': TokenBucketLimiter(guild_limit, period, max_keys),
+            'global': TokenBucketLimiter(global_limit, period, 1)
+        }
+
+    def _keys(self, user_id: int, guild_id: Optional[int]) -> Dict[str, Hashable]:
+        keys = {'user': user_id, 'global': None}
+        if guild_id:
+            keys['guild'] = guild_id
+        return keys
+
+    def acquire(self, user_id: int, guild_id: Optional[int] = None,
+                now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """Take a token from each bucket; returns (exhausted scope, retry after) if any is empty."""
+        now = time.monotonic() if now is None else now
+        keys = self._keys(user_id, guild_id)
+        for scope, key in keys.items():
+            limiter = self.scopes[scope]
+            if limiter.remaining(key, now) < 1:
+                limiter.rejections += 1
+                return scope, limiter.retry_after(key, now=now)
+        for scope, key in keys.items():
+            self.scopes[scope].consume(key, now=now)
+        return None
+
+    def remaining(self, user_id: int, guild_id: Optional[int] = None) -> Dict[str, int]:
+        """Get remaining tokens for each applicable scope."""
+        now = time.monotonic()
+        return {scope: self.scopes[scope].remaining(key, now)
+                for scope, key in self._keys(user_id, guild_id).items()}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get per-scope bucket statistics."""
+        return {scope: limiter.get_metrics() for scope, limiter in self.scopes.items()}
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import re
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple, Union, Callable, Awaitable
+from config import AI_CONFIG
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = '!?.~ '
+
+def normalize_prompt(prompt: str) -> str:
+    """Fold case, whitespace and trailing punctuation so trivial variants share a key."""
+    return _WHITESPACE.sub(' ', prompt.lower()).strip().rstrip(_TRAILING_PUNCTUATION)
+
+class ResponseCache:
+    """TTL cache of AI responses with coalescing of identical in-flight requests.
+
+    Keys combine the normalized prompt, the server persona and a hash of the
+    last few context lines. Concurrent requests for the same key share one
+    generation; failures are never cached.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 1000, context_lines: int = 2):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.context_lines = context_lines
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[str, float]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def make_key(self, prompt: str, persona: str, context: List[str]) -> Tuple[str, str, str]:
+        """Build a cache key from the prompt, persona and recent context."""
+        # Trailing user lines are the message being answered (or double-sends of it)
+        end = len(context)
+        while end and context[end - 1].startswith("User: "):
+            end -= 1
+        recent = "\n".join(context[max(0, end - self.context_lines):end])
+        context_hash = hashlib.blake2b(recent.encode(), digest_size=8).hexdigest()
+        return (normalize_prompt(prompt), persona or '', context_hash)
+
+    def _get(self, key) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _store(self, key, future: asyncio.Future):
+        self._in_flight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._entries[key] = (future.result(), time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, key) -> Optional[Union[str, asyncio.Future]]:
+        """Get a cached response or an identical in-flight request's future."""
+        cached = self._get(key)
+        if cached is not None:
+            self.stats['hits'] += 1
+            return cached
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+        return future
+
+    def begin(self, key, future: Optional[asyncio.Future] = None) -> asyncio.Future:
+        """Register a request for key; its result is cached once the future completes.
+
+        Without a future, the caller resolves the returned one itself, e.g. at
+        the end of a streamed response.
+        """
+        self.stats['misses'] += 1
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        future.add_done_callback(lambda done: self._store(key, done))
+        return future
+
+    async def get_or_create(self, key, factory: Callable[[], Awaitable[str]]) -> str:
+        """Return a cached response, join an identical in-flight request, or start one."""
+        found = self.lookup(key)
+        if isinstance(found, str):
+            return found
+        future = found or self.begin(key, asyncio.ensure_future(factory()))
+        # Shielded so one caller being cancelled doesn't cancel the shared request
+        return await asyncio.shield(future)
+
+    def clear(self):
+        """Drop every cached response."""
+        self._entries.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get cache size and hit statistics."""
+        lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+        return {
+            'entries': len(self._entries),
+            'in_flight': len(self._in_flight),
+            'hit_rate': round((self.stats['hits'] + self.stats['coalesced']) / lookups, 3) if lookups else 0.0,
+            **self.stats
+        }
+
+# Global AI response cache instance
+response_cache = ResponseCache(
+    ttl=AI_CONFIG['response_cache_ttl'],
+    max_entries=AI_CONFIG['response_cache_size']
+)
+register_metrics('response_cache', response_cache.get_metrics)
@@ -0,0 +1,499 @@
+import json
+import copy
+import time
+import sqlite3
+import threading
+import logging
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+from utils.models import pack_profile, unpack_profile
+
+logger = logging.getLogger(__name__)
+
+# Key prefix used by key-value backends to store one profile per user
+USER_KEY_PREFIX = 'user_'
+# Key prefix for append-only log segments on key-value backends
+LOG_KEY_PREFIX = 'log_'
+
+# Leaderboard category -> (section path inside rpg_data, SQLite column)
+LEADERBOARD_FIELDS = {
+    'level': (('level',), 'level'),
+    'coins': (('coins',), 'coins'),
+    'xp': (('stats', 'total_xp_earned'), 'total_xp'),
+    'battles': (('stats', 'battles_won'), 'battles_won'),
+}
+
+_segment_lock = threading.Lock()
+_last_segment_id = 0
+
+def _next_segment_id() -> int:
+    """Get a strictly increasing id for a new log segment."""
+    global _last_segment_id
+    with _segment_lock:
+        # Wall-clock based so ids keep increasing across restarts
+        _last_segment_id = max(time.time_ns(), _last_segment_id + 1)
+        return _last_segment_id
+
+def get_leaderboard_value(user_data: Dict[str, Any], category: str) -> int:
+    """Extract the value a user is ranked by for a leaderboard category."""
+    path, _ = LEADERBOARD_FIELDS[category]
+    value = user_data.get('rpg_data', {})
+    for part in path:
+        value = value.get(part) if isinstance(value, dict) else None
+    if value is None:
+        return 1 if category == 'level' else 0
+    return value
+
+class Storage:
+    """Key-value storage interface shared by every storage backend.
+
+    Backends only need to implement the raw key operations; the user profile
+    helpers fall back to one key per user and can be overridden by backends
+    that keep profiles in a real table.
+    """
+
+    name = 'base'
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def prefix(self, prefix: str) -> Tuple[str, ...]:
+        raise NotImplementedError
+
+    def set_many(self, values: Dict[str, Any]) -> None:
+        """Set several keys at once."""
+        for key, value in values.items():
+            self.set(key, value)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.prefix('')
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self.delete(key)
+
+    # User profiles, stored in the packed form from utils.models
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        stored = self.get(f"{USER_KEY_PREFIX}{user_id}")
+        return unpack_profile(stored) if stored is not None else None
+
+    def set_user(self, user_id: str, data: Dict[str, Any]) -> None:
+        self.set(f"{USER_KEY_PREFIX}{user_id}", pack_profile(data))
+
+    def set_users(self, users: Dict[str, Dict[str, Any]]) -> None:
+        """Write several user profiles in one batch."""
+        self.set_many({f"{USER_KEY_PREFIX}{user_id}": pack_profile(data) for user_id, data in users.items()})
+
+    def delete_user(self, user_id: str) -> None:
+        self.delete(f"{USER_KEY_PREFIX}{user_id}")
+
+    def has_user(self, user_id: str) -> bool:
+        return f"{USER_KEY_PREFIX}{user_id}" in self
+
+    def user_ids(self) -> List[str]:
+        return [key[len(USER_KEY_PREFIX):] for key in self.prefix(USER_KEY_PREFIX)]
+
+    def count_users(self) -> int:
+        return len(self.prefix(USER_KEY_PREFIX))
+
+    def iter_users(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        for user_id in self.user_ids():
+            user_data = self.get_user(user_id)
+            if user_data:
+                yield user_id, user_data
+
+    def top_users(self, category: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the highest ranked users for a leaderboard category."""
+        leaderboard = [
+            {
+                'user_id': user_id,
+                'value': get_leaderboard_value(user_data, category),
+                'level': user_data.get('rpg_data', {}).get('level', 1)
+            }
+            for user_id, user_data in self.iter_users()
+        ]
+        leaderboard.sort(key=lambda x: x['value'], reverse=True)
+        return leaderboard[:limit]
+
+    def inactive_user_ids(self, cutoff: int) -> List[str]:
+        """Get users whose last_active epoch is before cutoff."""
+        return [
+            user_id for user_id, user_data in self.iter_users()
+            if isinstance(user_data.get('last_active'), int) and user_data['last_active'] < cutoff
+        ]
+
+    # Append-only logs of encoded records. Key-value backends write every
+    # append as its own time-ordered segment key, so appending never rewrites
+    # earlier records; compaction folds the segments back into one.
+    def _log_prefix(self, log_name: str) -> str:
+        return f"{LOG_KEY_PREFIX}{log_name}_"
+
+    def _log_segments(self, log_name: str) -> List[str]:
+        return sorted(self.prefix(self._log_prefix(log_name)))
+
+    def append_log(self, log_name: str, records: List[str]) -> None:
+        """Append encoded records to a log."""
+        if records:
+            # Zero-padded ids keep segment keys in append order
+            self.set(f"{self._log_prefix(log_name)}{_next_segment_id():020d}", "\n".join(records))
+
+    def read_log(self, log_name: str) -> List[str]:
+        """Read every record in a log, oldest first."""
+        records = []
+        for key in self._log_segments(log_name):
+            segment = self.get(key)
+            if segment:
+                records.extend(segment.split("\n"))
+        return records
+
+    def replace_log(self, log_name: str, records: List[str]) -> None:
+        """Replace a log's contents, used to compact it."""
+        old_segments = self._log_segments(log_name)
+        self.append_log(log_name, records)
+        for key in old_segments:
+            self.delete(key)
+
+    def close(self) -> None:
+        pass
+
+class MemoryStorage(Storage):
+    """In-process dictionary backend for tests and local benchmarks."""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            # Hand out copies so callers never mutate stored state in place
+            return copy.deepcopy(self._data[key])
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = copy.deepcopy(value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            del self._data[key]
+
+    def prefix(self, prefix: str) -> Tuple[str, ...]:
+        with self._lock:
+            return tuple(key for key in self._data if key.startswith(prefix))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+class ReplitStorage(Storage):
+    """Replit DB backend."""
+
+    name = 'replit'
+
+    def __init__(self):
+        from replit import db as replit_db
+        if replit_db is None:
+            raise RuntimeError("Replit DB is not configured")
+        self._db = replit_db
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # get_raw avoids replit's observed containers, which write back on every mutation
+        try:
+            return json.loads(self._db.get_raw(key))
+        except KeyError:
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        self._db[key] = value
+
+    def set_many(self, values: Dict[str, Any]) -> None:
+        if values:
+            self._db.set_bulk(values)
+
+    def delete(self, key: str) -> None:
+        del self._db[key]
+
+    def prefix(self, prefix: str) -> Tuple[str, ...]:
+        return tuple(self._db.prefix(prefix))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._db
+
+class SQLiteStorage(Storage):
+    """SQLite backend with an indexed users table for leaderboard queries."""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                level INTEGER NOT NULL DEFAULT 1,
+                coins INTEGER NOT NULL DEFAULT 0,
+                total_xp INTEGER NOT NULL DEFAULT 0,
+                battles_won INTEGER NOT NULL DEFAULT 0,
+                last_active INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_users_level ON users(level);
+            CREATE INDEX IF NOT EXISTS idx_users_coins ON users(coins);
+            CREATE INDEX IF NOT EXISTS idx_users_total_xp ON users(total_xp);
+            CREATE INDEX IF NOT EXISTS idx_users_battles_won ON users(battles_won);
+            CREATE TABLE IF NOT EXISTS logs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                log_name TEXT NOT NULL,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_logs_name ON logs(log_name, seq);
+            """
+        )
+        # Databases created before profiles stored epoch timestamps lack this column
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(users)")}
+        if 'last_active' not in columns:
+            self._conn.execute("ALTER TABLE users ADD COLUMN last_active INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_users_last_active ON users(last_active)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO kv (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value))
+            )
+
+    def set_many(self, values: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO kv (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    [(key, json.dumps(value)) for key, value in values.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def prefix(self, prefix: str) -> Tuple[str, ...]:
+        with self._lock:
+            if not prefix:
+                rows = self._conn.execute("SELECT key FROM kv").fetchall()
+            else:
+                # Range scan on the primary key instead of LIKE so the index is used
+                upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+                rows = self._conn.execute(
+                    "SELECT key FROM kv WHERE key >= ? AND key < ?", (prefix, upper)
+                ).fetchall()
+        return tuple(row[0] for row in rows)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM kv WHERE key = ?", (key,)).fetchone() is not None
+
+    # User profiles live in their own table with indexed ranking columns
+    def _user_row(self, user_id: str, data: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (
+            user_id,
+            json.dumps(pack_profile(data), separators=(',', ':')),
+            get_leaderboard_value(data, 'level'),
+            get_leaderboard_value(data, 'coins'),
+            get_leaderboard_value(data, 'xp'),
+            get_leaderboard_value(data, 'battles'),
+            data['last_active'] if isinstance(data.get('last_active'), int) else 0,
+        )
+
+    _UPSERT_USER = (
+        "INSERT INTO users (user_id, data, level, coins, total_xp, battles_won, last_active) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, level = excluded.level, "
+        "coins = excluded.coins, total_xp = excluded.total_xp, battles_won = excluded.battles_won, "
+        "last_active = excluded.last_active"
+    )
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return unpack_profile(json.loads(row[0])) if row else None
+
+    def set_user(self, user_id: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(self._UPSERT_USER, self._user_row(user_id, data))
+
+    def set_users(self, users: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    self._UPSERT_USER,
+                    [self._user_row(user_id, data) for user_id, data in users.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_user(self, user_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+    def has_user(self, user_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def user_ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT user_id FROM users")]
+
+    def count_users(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def iter_users(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, data FROM users").fetchall()
+        for user_id, data in rows:
+            yield user_id, unpack_profile(json.loads(data))
+
+    def top_users(self, category: str, limit: int = 10) -> List[Dict[str, Any]]:
+        _, column = LEADERBOARD_FIELDS[category]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT user_id, {column}, level FROM users ORDER BY {column} DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [{'user_id': user_id, 'value': value, 'level': level} for user_id, value, level in rows]
+
+    def inactive_user_ids(self, cutoff: int) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id FROM users WHERE last_active > 0 AND last_active < ?", (cutoff,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def append_log(self, log_name: str, records: List[str]) -> None:
+        if not records:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO logs (log_name, record) VALUES (?, ?)",
+                    [(log_name, record) for record in records]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def read_log(self, log_name: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM logs WHERE log_name = ? ORDER BY seq", (log_name,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def replace_log(self, log_name: str, records: List[str]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM logs WHERE log_name = ?", (log_name,))
+                self._conn.executemany(
+                    "INSERT INTO logs (log_name, record) VALUES (?, ?)",
+                    [(log_name, record) for record in records]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def create_storage(backend: str, **options) -> Storage:
+    """Create a storage backend by name."""
+    if backend == 'sqlite':
+        return SQLiteStorage(options.get('sqlite_path', 'bot_data.db'))
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'replit':
+        return ReplitStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+_storage: Optional[Storage] = None
+
+def get_storage() -> Storage:
+    """Get the configured storage backend, creating it on first use."""
+    global _storage
+    if _storage is None:
+        # Imported lazily because config.py itself reads and writes through storage
+        from config import DATABASE_CONFIG
+        _storage = create_storage(DATABASE_CONFIG['backend'], sqlite_path=DATABASE_CONFIG['sqlite_path'])
+        logger.info(f"Using {_storage.name} storage backend")
+    return _storage
+
+def set_storage(storage: Storage) -> None:
+    """Replace the active storage backend (used by tests and benchmarks)."""
+    global _storage
+    _storage = storage
+
+class _StorageProxy:
+    """Module-level handle that forwards to the configured backend."""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_storage(), name)
+
+    def __contains__(self, key: str) -> bool:
+        return key in get_storage()
+
+    def __getitem__(self, key: str) -> Any:
+        return get_storage()[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        get_storage()[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del get_storage()[key]
+
+# Drop-in replacement for `from replit import db`
+db = _StorageProxy()
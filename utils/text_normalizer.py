@@ -0,0 +1,20 @@
+import re
+
+# Precompiled once; these run on every message the bot reads
+MENTION_PATTERN = re.compile(r'<@!?\d+>')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Messages starting with any of these are treated as commands for some bot
+COMMAND_PREFIXES = ('$', '!', '?', '.', '/')
+
+def strip_mentions(text: str) -> str:
+    """Remove user mentions and surrounding whitespace."""
+    return MENTION_PATTERN.sub('', text).strip()
+
+def normalize_text(text: str) -> str:
+    """Lowercase text with user mentions removed and whitespace collapsed."""
+    return WHITESPACE_PATTERN.sub(' ', MENTION_PATTERN.sub('', text.lower())).strip()
+
+def looks_like_command(text: str) -> bool:
+    """Check whether text starts with a common bot command prefix."""
+    return text.startswith(COMMAND_PREFIXES)
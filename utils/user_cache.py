@@ -0,0 +1,201 @@
+import asyncio
+import copy
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Dict, Any, Optional, Callable
+from config import PERFORMANCE_CONFIG
+from utils.storage import db
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """LRU cache of user profiles with write-behind persistence.
+
+    Reads are served from memory. Changes only mark the profile dirty; a
+    background task writes dirty profiles back in batches, and dirty profiles
+    pushed out of the LRU are written immediately so nothing is lost.
+    Profiles whose batch is still being written stay cached until the write
+    finishes, so a reload can't pick up an older stored copy.
+    """
+
+    def __init__(self, max_size: int = 1000, flush_batch_size: int = 100):
+        self.max_size = max_size
+        self.flush_batch_size = flush_batch_size
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty = set()
+        # Profiles in a batch that flush() is writing; pinned in _entries until it finishes
+        self._in_flight = set()
+        self._lock = threading.RLock()
+        # Serializes flushes so an older snapshot can't land after a newer one
+        self._flush_lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'flushes': 0,
+            'profiles_flushed': 0,
+            'flush_errors': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0
+        }
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get the cached profile, loading it from storage on a miss.
+
+        The returned dict is owned by the cache; use mutate() to change it.
+        """
+        with self._lock:
+            data = self._entries.get(user_id)
+            if data is not None:
+                self._entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return data
+            self.stats['misses'] += 1
+
+        data = db.get_user(user_id)
+        if data is None:
+            return None
+
+        with self._lock:
+            # Another caller may have loaded or written it meanwhile
+            if user_id in self._entries:
+                return self._entries[user_id]
+            self._entries[user_id] = data
+            self._evict()
+            return data
+
+    def is_cached(self, user_id: str) -> bool:
+        """Check whether a profile is currently held in memory."""
+        return user_id in self._entries
+
+    def put(self, user_id: str, data: Dict[str, Any], dirty: bool = True):
+        """Store a profile, marking it for the next flush."""
+        with self._lock:
+            self._entries[user_id] = data
+            self._entries.move_to_end(user_id)
+            if dirty:
+                self._dirty.add(user_id)
+            self._evict()
+
+    def mutate(self, user_id: str, func: Callable[[Dict[str, Any]], None]) -> bool:
+        """Apply func to a profile in place and mark it dirty."""
+        while True:
+            if self.get(user_id) is None:
+                return False
+            with self._lock:
+                # Re-read under the lock: the profile may have been evicted since get()
+                data = self._entries.get(user_id)
+                if data is None:
+                    continue
+                func(data)
+                self._dirty.add(user_id)
+                return True
+
+    def delete(self, user_id: str):
+        """Remove a profile from the cache and from storage."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._dirty.discard(user_id)
+        db.delete_user(user_id)
+
+    def _evict(self):
+        """Drop least recently used profiles above the size limit."""
+        skipped = 0
+        while len(self._entries) > self.max_size and skipped < len(self._entries):
+            user_id = next(iter(self._entries))
+            if user_id in self._in_flight:
+                self._entries.move_to_end(user_id)
+                skipped += 1
+                continue
+            data = self._entries.pop(user_id)
+            if user_id in self._dirty:
+                try:
+                    db.set_user(user_id, data)
+                except Exception as e:
+                    logger.error(f"Error writing evicted profile {user_id}: {e}")
+                    self.stats['flush_errors'] += 1
+                    # Keep it cached and dirty rather than lose the changes
+                    self._entries[user_id] = data
+                    return
+                self._dirty.discard(user_id)
+            self.stats['evictions'] += 1
+
+    def flush(self, max_items: Optional[int] = None) -> int:
+        """Write up to max_items dirty profiles to storage in one batch."""
+        limit = max_items or self.flush_batch_size
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                batch_ids = [user_id for _, user_id in zip(range(limit), self._dirty)]
+                batch = {}
+                for user_id in batch_ids:
+                    self._dirty.discard(user_id)
+                    if user_id in self._entries:
+                        batch[user_id] = copy.deepcopy(self._entries[user_id])
+                self._in_flight.update(batch)
+
+            start = time.perf_counter()
+            try:
+                db.set_users(batch)
+            except Exception as e:
+                logger.error(f"Error flushing {len(batch)} user profiles: {e}")
+                with self._lock:
+                    self.stats['flush_errors'] += 1
+                    self._in_flight.clear()
+                    # Pinned profiles are all still cached (unless deleted); retry them next flush
+                    self._dirty.update(user_id for user_id in batch if user_id in self._entries)
+                    self._evict()
+                return 0
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._in_flight.clear()
+                self._evict()
+
+        with self._lock:
+            self.stats['flushes'] += 1
+            self.stats['profiles_flushed'] += len(batch)
+            self.stats['last_flush_ms'] = round(elapsed_ms, 2)
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], round(elapsed_ms, 2))
+        return len(batch)
+
+    def flush_all(self) -> int:
+        """Flush every dirty profile."""
+        total = 0
+        while self._dirty:
+            flushed = self.flush()
+            if not flushed:
+                break
+            total += flushed
+        return total
+
+    async def run_flush_loop(self, interval: float, executor: Optional[Executor] = None):
+        """Periodically flush dirty profiles off the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(executor, self.flush_all)
+            except Exception as e:
+                logger.error(f"Error in user cache flush loop: {e}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get cache and flush statistics."""
+        with self._lock:
+            return {
+                'cached_profiles': len(self._entries),
+                'dirty_backlog': len(self._dirty),
+                **self.stats
+            }
+
+# Global user cache instance
+user_cache = UserCache(
+    max_size=PERFORMANCE_CONFIG['cache_size'],
+    flush_batch_size=PERFORMANCE_CONFIG['flush_batch_size']
+)
+register_metrics('user_cache', user_cache.get_metrics)
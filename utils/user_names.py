@@ -0,0 +1,71 @@
+import asyncio
+import time
+import logging
+from typing import Dict, Iterable, Tuple
+import discord
+from config import PERFORMANCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class DisplayNameResolver:
+    """Resolves user ids to display names with as few REST calls as possible.
+
+    Names come from the client's user cache when available; the rest are
+    fetched concurrently behind a semaphore. Every result, including unknown
+    users, is memoized for ttl seconds.
+    """
+
+    def __init__(self, ttl: float = 600, max_concurrency: int = 5, unknown_name: str = "Unknown User"):
+        self.ttl = ttl
+        self.unknown_name = unknown_name
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._names: Dict[int, Tuple[str, float]] = {}
+
+    def _remember(self, user_id: int, name: str) -> str:
+        self._names[user_id] = (name, time.monotonic() + self.ttl)
+        return name
+
+    async def _fetch(self, bot, user_id: int) -> str:
+        async with self._semaphore:
+            try:
+                user = await bot.fetch_user(user_id)
+                return self._remember(user_id, user.display_name)
+            except discord.NotFound:
+                return self._remember(user_id, self.unknown_name)
+            except Exception as e:
+                # Transient failure; don't memoize so the next call retries
+                logger.error(f"Error fetching user {user_id}: {e}")
+                return self.unknown_name
+
+    async def resolve(self, bot, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Get display names for user_ids."""
+        now = time.monotonic()
+        names = {}
+        missing = []
+
+        for user_id in user_ids:
+            cached = self._names.get(user_id)
+            if cached and cached[1] > now:
+                names[user_id] = cached[0]
+                continue
+            user = bot.get_user(user_id)
+            if user:
+                names[user_id] = self._remember(user_id, user.display_name)
+            else:
+                missing.append(user_id)
+
+        if missing:
+            fetched = await asyncio.gather(*(self._fetch(bot, user_id) for user_id in missing))
+            names.update(zip(missing, fetched))
+
+        # Drop expired entries so the memo doesn't grow without bound
+        if len(self._names) > PERFORMANCE_CONFIG['cache_size']:
+            self._names = {uid: entry for uid, entry in self._names.items() if entry[1] > now}
+
+        return names
+
+# Global display name resolver instance
+name_resolver = DisplayNameResolver(
+    ttl=PERFORMANCE_CONFIG['name_cache_ttl'],
+    max_concurrency=PERFORMANCE_CONFIG['name_fetch_concurrency']
+)
@@ -4,6 +4,7 @@ import logging
 import psutil
 import os
 from datetime import datetime
+from utils.metrics import collect_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -382,6 +383,7 @@ def metrics():
                     "admin": True
                 }
             },
+            "components": collect_metrics(),
             "timestamp": datetime.now().isoformat()
         }
         